@@ -2,7 +2,7 @@
 import logging
 import json
 import httpx
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, AsyncIterator, List, Optional
 import asyncio
 
 from app.config import DEEPSEEK_API_KEY, DEEPSEEK_API_URL
@@ -40,7 +40,7 @@ async def call_deepseek_api(messages: List[Dict[str, str]]) -> Dict[str, Any]:
                 # 尝试解析 JSON，无论状态码如何，以便记录内容
                 try:
                     result = response.json()
-                    logger.info(f"DeepSeek API 响应内容 (部分): {str(result)[:500]}") # 只记录前500字符
+                    logger.debug("DeepSeek API 响应内容: %s", result) # 过长的内容由日志配置截断
                 except json.JSONDecodeError as json_err:
                     logger.error(f"DeepSeek API 响应 JSON 解析失败: {json_err}")
                     logger.error(f"DeepSeek API 原始响应文本 (部分): {response.text[:500]}")
@@ -60,7 +60,7 @@ async def call_deepseek_api(messages: List[Dict[str, str]]) -> Dict[str, Any]:
                         "content": result["choices"][0]["message"]["content"]
                     }
                 else:
-                    logger.error(f"DeepSeek API 响应格式不符合预期: {result}")
+                    logger.error("DeepSeek API 响应格式不符合预期: %s", result)
                     return {
                         "success": False,
                         "error": "API响应格式不符合预期",
@@ -154,25 +154,13 @@ async def analyze_user_profile(user_profile: Dict[str, Any]) -> Dict[str, Any]:
         }
 
 
-async def analyze_wrong_answers(user_profile: Dict[str, Any], exam_ids: list) -> Dict[str, Any]:
-    """分析错题"""
-    logger.info(f"分析错题: {user_profile.get('name', '未知用户')}, 试卷ID: {exam_ids}")
-    
-    # 获取错题列表
-    false_ids = user_profile.get("false_id", "")
-    if not false_ids:
-        logger.warning(f"用户没有错题记录: {user_profile.get('name', '未知用户')}")
-        return {
-            "success": True,
-            "analysis": "没有发现错题记录，无需分析。"
-        }
-    
-    logger.info(f"原始错题ID: {false_ids}")
-    
-    # 解析错题ID格式，支持多种格式
-    # 1. "1:2,1:4" 表示试卷1的第2题和第4题错误
-    # 2. "1-2,1-3" 表示试卷1的第2题和第3题错误
-    # 3. "1,2,3" 表示第1题、第2题和第3题错误(默认为试卷1)
+def parse_wrong_answer_ids(false_ids: str, exam_ids: list) -> List[Dict[str, int]]:
+    """
+    解析错题ID，支持多种格式
+    1. "1:2,1:4" 表示试卷1的第2题和第4题错误
+    2. "1-2,1-3" 表示试卷1的第2题和第3题错误
+    3. "1,2,3" 表示第1题、第2题和第3题错误(默认为试卷1)
+    """
     wrong_answers = []
     try:
         for item in false_ids.split(","):
@@ -192,6 +180,24 @@ async def analyze_wrong_answers(user_profile: Dict[str, Any], exam_ids: list) ->
                     logger.warning(f"无法解析错题ID: {item}")
     except Exception as e:
         logger.error(f"解析错题ID失败: {e}")
+    return wrong_answers
+
+
+async def analyze_wrong_answers(user_profile: Dict[str, Any], exam_ids: list) -> Dict[str, Any]:
+    """分析错题"""
+    logger.info(f"分析错题: {user_profile.get('name', '未知用户')}, 试卷ID: {exam_ids}")
+    
+    # 获取错题列表
+    false_ids = user_profile.get("false_id", "")
+    if not false_ids:
+        logger.warning(f"用户没有错题记录: {user_profile.get('name', '未知用户')}")
+        return {
+            "success": True,
+            "analysis": "没有发现错题记录，无需分析。"
+        }
+    
+    logger.info(f"原始错题ID: {false_ids}")
+    wrong_answers = parse_wrong_answer_ids(false_ids, exam_ids)
     
     if not wrong_answers:
         logger.warning(f"无法解析的错题格式，原始数据: {false_ids}")
@@ -366,11 +372,8 @@ async def suggest_reading_strategies(user_profile: Dict[str, Any]) -> Dict[str,
     logger.info(f"推荐阅读策略: {user_profile.get('name', '未知用户')}")
     
     # 获取用户的阅读策略评分
-    strategies_score = user_profile.get("post_strategies_score", "0")
-    try:
-        score = int(strategies_score)
-    except ValueError:
-        score = 0
+    strategies_score = user_profile.get("post_strategies_score") or 0
+    score = strategies_score if isinstance(strategies_score, (int, float)) else 0
     
     # 构建系统提示和用户消息
     system_prompt = """你是一个专业的英语阅读教育专家。请根据学生的英语水平和阅读策略评分，推荐3-5个最适合该学生的阅读策略，帮助他们提高阅读理解能力。对于每个策略，详细解释其定义、应用方法和练习建议。使用markdown格式，确保建议专业、实用且具体。"""
@@ -422,20 +425,16 @@ async def generate_final_summary(user_profile: Dict[str, Any]) -> Dict[str, Any]
     logger.info(f"生成学习总结: {user_profile.get('name', '未知用户')}")
     
     # 获取用户的前后测成绩
-    post_score = user_profile.get("post_score", "0")
-    post_strategies_score = user_profile.get("post_strategies_score", "0")
-    after_score = user_profile.get("after_score", "0")
-    after_strategies_score = user_profile.get("after_strategies_score", "0")
+    post_score = user_profile.get("post_score") or 0
+    post_strategies_score = user_profile.get("post_strategies_score") or 0
+    after_score = user_profile.get("after_score") or 0
+    after_strategies_score = user_profile.get("after_strategies_score") or 0
     
     try:
-        post_score_num = float(post_score)
-        post_strategies_score_num = float(post_strategies_score)
-        after_score_num = float(after_score)
-        after_strategies_score_num = float(after_strategies_score)
-        
-        score_improvement = (after_score_num - post_score_num) / post_score_num * 100 if post_score_num > 0 else 0
-        strategies_improvement = (after_strategies_score_num - post_strategies_score_num) / post_strategies_score_num * 100 if post_strategies_score_num > 0 else 0
-    except ValueError:
+        score_improvement = (after_score - post_score) / post_score * 100 if post_score > 0 else 0
+        strategies_improvement = (after_strategies_score - post_strategies_score) / post_strategies_score * 100 if post_strategies_score > 0 else 0
+    except TypeError:
+        # 旧数据中可能残留非数值分数
         score_improvement = 0
         strategies_improvement = 0
     
@@ -484,11 +483,67 @@ async def generate_final_summary(user_profile: Dict[str, Any]) -> Dict[str, Any]
         }
 
 
-async def process_user_message(user_profile: Dict[str, Any], message: str) -> Dict[str, Any]:
-    """处理用户消息"""
-    logger.info(f"处理用户消息: {user_profile.get('name', '未知用户')}, 消息: {message}")
-    
-    # 构建系统提示和历史消息
+class AIStreamError(Exception):
+    """流式调用失败，fallback_content 为可以展示给学生的提示"""
+
+    def __init__(self, message: str, fallback_content: str = "很抱歉，AI服务暂时无法响应，请稍后再试。"):
+        super().__init__(message)
+        self.fallback_content = fallback_content
+
+
+async def stream_deepseek_api(messages: List[Dict[str, str]],
+                              client: Optional[httpx.AsyncClient] = None) -> AsyncIterator[str]:
+    """
+    以流式方式调用DeepseekAPI，逐段产出回复内容
+
+    client 可由调用方复用（如一个WebSocket连接内的多次对话）；
+    调用方取消迭代时会关闭上游连接，DeepSeek停止生成。
+    """
+    payload = {
+        "model": "deepseek-chat",
+        "messages": messages,
+        "temperature": 0.7,
+        "max_tokens": 2000,
+        "stream": True
+    }
+    own_client = client is None
+    if own_client:
+        client = httpx.AsyncClient(timeout=120.0)
+    try:
+        logger.info(f"向 DeepSeek API 发送流式请求: {DEEPSEEK_API_URL}，模型: {payload['model']}")
+        async with client.stream("POST", DEEPSEEK_API_URL, headers=HEADERS, json=payload) as response:
+            if response.status_code >= 400:
+                body = (await response.aread()).decode("utf-8", "replace")
+                logger.error(f"DeepSeek API 流式请求失败: {response.status_code} {body[:500]}")
+                raise AIStreamError(f"API请求失败: {response.status_code}",
+                                    "很抱歉，AI服务暂时返回了错误，请稍后再试。")
+            async for line in response.aiter_lines():
+                if not line.startswith("data:"):
+                    continue
+                data = line[5:].strip()
+                if data == "[DONE]":
+                    break
+                try:
+                    chunk = json.loads(data)
+                    delta = chunk["choices"][0].get("delta", {}).get("content")
+                except (json.JSONDecodeError, KeyError, IndexError) as e:
+                    logger.warning("DeepSeek API 流式数据无法解析: %s (%s)", data, e)
+                    continue
+                if delta:
+                    yield delta
+    except httpx.TimeoutException as e:
+        logger.error(f"DeepSeek API 流式请求超时: {e}")
+        raise AIStreamError(f"API请求超时: {e}") from e
+    except httpx.RequestError as e:
+        logger.error(f"DeepSeek API 流式请求发生错误 (RequestError): {e}")
+        raise AIStreamError(f"API请求发生错误: {e}", "很抱歉，与AI服务的连接出现问题，请稍后再试。") from e
+    finally:
+        if own_client:
+            await client.aclose()
+
+
+def build_chat_context(user_profile: Dict[str, Any]) -> List[Dict[str, str]]:
+    """构建对话的系统提示和学生背景，每次对话都放在消息列表最前面"""
     system_prompt = """你是一个专业的英语阅读教育助手，专注于帮助学生提高英语阅读能力。请根据学生的消息，提供专业、有针对性的回答。你的回答应该简洁明了，具有实用性和教育价值。如果学生提问不清晰，请礼貌地引导他们提出更具体的问题。"""
     
     # 构建用户背景信息
@@ -501,12 +556,15 @@ async def process_user_message(user_profile: Dict[str, Any], message: str) -> Di
     - 前测成绩: {user_profile.get('post_score', 'N/A')}/100
     - 阅读策略评分: {user_profile.get('post_strategies_score', 'N/A')}/75
     """
-    
-    messages = [
-        {"role": "system", "content": system_prompt},
-        {"role": "user", "content": f"{user_background}\n\n学生消息: {message}"}
-    ]
-    
+    return [{"role": "system", "content": f"{system_prompt}\n{user_background}"}]
+
+
+async def process_user_message(user_profile: Dict[str, Any], message: str) -> Dict[str, Any]:
+    """处理用户消息"""
+    logger.info("处理用户消息: %s, 消息: %s", user_profile.get('name', '未知用户'), message)
+
+    messages = build_chat_context(user_profile) + [{"role": "user", "content": f"学生消息: {message}"}]
+
     # 调用API
     response = await call_deepseek_api(messages)
     
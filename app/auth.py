@@ -0,0 +1,26 @@
+"""管理和教师接口的令牌校验"""
+import hmac
+import logging
+from typing import Optional
+
+from fastapi import Header, HTTPException
+
+from app.config import ADMIN_TOKEN
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+ADMIN_TOKEN_HEADER = "X-Admin-Token"
+
+
+def require_admin_token(x_admin_token: Optional[str] = Header(None, alias=ADMIN_TOKEN_HEADER)):
+    """
+    路由依赖：请求头 X-Admin-Token 须与 PERSS_ADMIN_TOKEN 一致
+
+    未配置令牌时接口关闭（403），令牌缺失或错误时返回401。
+    """
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="未配置 PERSS_ADMIN_TOKEN，管理接口已关闭")
+    if not x_admin_token or not hmac.compare_digest(x_admin_token.encode("utf-8"), ADMIN_TOKEN.encode("utf-8")):
+        logger.warning("管理令牌无效，拒绝访问")
+        raise HTTPException(status_code=401, detail=f"需要有效的 {ADMIN_TOKEN_HEADER} 请求头")
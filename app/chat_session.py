@@ -0,0 +1,217 @@
+"""
+AI对话的WebSocket会话
+
+一个连接对应一个学生：画像和对话上下文只在连接时加载一次，之后每条消息
+只追加最近的对话记录。回复逐段推送，生成过程中可以取消。
+
+消息格式（JSON文本帧）：
+    客户端 -> 服务器: {"type": "message", "id": "...", "text": "..."}
+                      {"type": "cancel", "id": "..."}
+                      {"type": "ping"} / {"type": "pong"}
+    服务器 -> 客户端: ready, start, delta, done, cancelled, error, ping, pong
+"""
+import asyncio
+import json
+import logging
+import time
+from collections import deque
+from typing import Any, Dict, List, Optional, Set
+
+import httpx
+from fastapi import WebSocket, WebSocketDisconnect
+
+from app import ai_service
+from app.config import (
+    CHAT_WS_HEARTBEAT_SECONDS,
+    CHAT_WS_IDLE_TIMEOUT_SECONDS,
+    CHAT_HISTORY_MAX_MESSAGES,
+    CHAT_MAX_MESSAGE_LENGTH,
+)
+from app.database import get_user_profile
+from app.rate_limit import retry_after_seconds
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+# 当前进程中打开的对话连接，停止服务时等待它们进行中的回复
+_connections: Set["ChatConnection"] = set()
+# 服务正在停止，不再开始新的回复
+_draining = False
+
+
+class ChatSession:
+    """一个学生的对话上下文"""
+
+    def __init__(self, user_profile: Dict[str, Any], max_history: int = CHAT_HISTORY_MAX_MESSAGES):
+        self.context = ai_service.build_chat_context(user_profile)
+        self.history: "deque[Dict[str, str]]" = deque(maxlen=max_history)
+
+    def messages_for(self, text: str) -> List[Dict[str, str]]:
+        """本次调用AI的消息列表：系统提示、最近的对话和新消息"""
+        return self.context + list(self.history) + [{"role": "user", "content": f"学生消息: {text}"}]
+
+    def record(self, text: str, reply: str):
+        """记录完成的一轮对话，取消或失败的不记录"""
+        self.history.append({"role": "user", "content": f"学生消息: {text}"})
+        self.history.append({"role": "assistant", "content": reply})
+
+
+class ChatConnection:
+    """处理一个WebSocket连接：接收消息、推送回复、心跳和取消"""
+
+    def __init__(self, websocket: WebSocket, name: str):
+        self.websocket = websocket
+        self.name = name
+        self.session: Optional[ChatSession] = None
+        self.client: Optional[httpx.AsyncClient] = None
+        self._send_lock = asyncio.Lock()
+        self._generation: Optional[asyncio.Task] = None
+        self._generation_id: Optional[str] = None
+        self._last_seen = time.monotonic()
+
+    async def send(self, frame_type: str, **fields):
+        """发送一帧，回复推送和心跳可能同时发送，需要加锁"""
+        async with self._send_lock:
+            await self.websocket.send_text(json.dumps({"type": frame_type, **fields}, ensure_ascii=False))
+
+    async def run(self):
+        """连接的主循环，客户端断开或空闲超时后返回"""
+        await self.websocket.accept()
+        try:
+            user_profile = get_user_profile(self.name)
+        except Exception as e:
+            logger.error(f"获取用户{self.name}信息失败: {e}", exc_info=True)
+            user_profile = None
+        self.session = ChatSession(user_profile or {"name": self.name})
+        logger.info(f"用户{self.name}建立对话连接")
+
+        # 一个连接内的多次对话复用同一个到DeepSeek的HTTP连接
+        async with httpx.AsyncClient(timeout=120.0) as client:
+            self.client = client
+            _connections.add(self)
+            try:
+                await self.send("ready", name=self.name)
+                await self._receive_loop()
+            except WebSocketDisconnect:
+                pass
+            finally:
+                _connections.discard(self)
+                await self._cancel_generation()
+        logger.info(f"用户{self.name}的对话连接已关闭")
+
+    async def _receive_loop(self):
+        while True:
+            try:
+                text = await asyncio.wait_for(self.websocket.receive_text(), timeout=CHAT_WS_HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                if time.monotonic() - self._last_seen > CHAT_WS_IDLE_TIMEOUT_SECONDS:
+                    logger.info(f"用户{self.name}的对话连接无响应，断开连接")
+                    await self.websocket.close(code=1001)
+                    return
+                await self.send("ping")
+                continue
+
+            self._last_seen = time.monotonic()
+            try:
+                frame = json.loads(text)
+                frame_type = frame.get("type")
+            except (ValueError, AttributeError):
+                await self.send("error", message="消息格式错误")
+                continue
+
+            if frame_type == "message":
+                await self._start_generation(str(frame.get("id") or ""), frame.get("text"))
+            elif frame_type == "cancel":
+                await self._cancel_generation(notify=True)
+            elif frame_type == "ping":
+                await self.send("pong")
+            elif frame_type != "pong":
+                await self.send("error", message=f"未知的消息类型: {frame_type}")
+
+    async def _start_generation(self, message_id: str, text: Any):
+        if not isinstance(text, str) or not text.strip():
+            await self.send("error", id=message_id, message="消息不能为空")
+            return
+        if len(text) > CHAT_MAX_MESSAGE_LENGTH:
+            await self.send("error", id=message_id, message=f"消息不能超过{CHAT_MAX_MESSAGE_LENGTH}个字符")
+            return
+        if self._generation is not None and not self._generation.done():
+            await self.send("error", id=message_id, message="上一条消息还在回复中，请稍候或先取消")
+            return
+        if _draining:
+            await self.send("error", id=message_id, message="服务器正在重启，请稍后重新连接")
+            return
+        retry_after = retry_after_seconds(self.websocket, "chat", self.name)
+        if retry_after:
+            await self.send("error", id=message_id, message=f"请求过于频繁，请{retry_after}秒后再试",
+                            retry_after=retry_after)
+            return
+
+        logger.info("用户%s发送消息: %s", self.name, text)
+        self._generation_id = message_id
+        self._generation = asyncio.create_task(self._generate(message_id, text.strip()))
+
+    async def _generate(self, message_id: str, text: str):
+        """调用AI并逐段推送回复"""
+        started = time.perf_counter()
+        parts: List[str] = []
+        try:
+            await self.send("start", id=message_id)
+            async for delta in ai_service.stream_deepseek_api(self.session.messages_for(text), client=self.client):
+                parts.append(delta)
+                await self.send("delta", id=message_id, text=delta)
+            reply = "".join(parts)
+            if not reply:
+                await self.send("error", id=message_id, message="抱歉，AI没有返回内容，请稍后再试。")
+                return
+            self.session.record(text, reply)
+            await self.send("done", id=message_id, text=reply)
+            logger.info(f"用户{self.name}的回复完成: {len(reply)}字符，耗时 {time.perf_counter() - started:.1f}s")
+        except ai_service.AIStreamError as e:
+            await self.send("error", id=message_id, message=e.fallback_content)
+        except (WebSocketDisconnect, RuntimeError) as e:
+            # 推送过程中客户端断开
+            logger.debug("推送回复时连接已关闭: %s", e)
+        except Exception as e:
+            logger.error(f"用户{self.name}的回复生成失败: {e}", exc_info=True)
+            try:
+                await self.send("error", id=message_id, message="抱歉，生成回复时出错，请稍后再试。")
+            except (WebSocketDisconnect, RuntimeError):
+                pass
+
+    async def _cancel_generation(self, notify: bool = False):
+        """取消进行中的回复，上游请求随之关闭"""
+        task, message_id = self._generation, self._generation_id
+        self._generation = self._generation_id = None
+        if task is None or task.done():
+            return
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+        logger.info(f"用户{self.name}取消了回复")
+        if notify:
+            await self.send("cancelled", id=message_id)
+
+
+async def drain_chat_connections(timeout: Optional[float]) -> int:
+    """
+    停止服务前等待进行中的回复推送完，返回等待的回复数
+
+    调用后不再开始新的回复；超过 timeout 秒仍未完成的回复被取消。
+    """
+    global _draining
+    _draining = True
+    tasks = [connection._generation for connection in list(_connections)
+             if connection._generation is not None and not connection._generation.done()]
+    if not tasks:
+        return 0
+    logger.info(f"等待 {len(tasks)} 个进行中的AI回复完成，最多 {timeout} 秒")
+    _, pending = await asyncio.wait(tasks, timeout=timeout)
+    if pending:
+        logger.warning(f"{len(pending)} 个AI回复未在 {timeout} 秒内完成，已取消")
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+    return len(tasks)
@@ -0,0 +1,349 @@
+"""
+前后测研究统计：一次查询把整个群体的成绩读入NumPy数组，向量化计算
+
+- 各项成绩的分布（人数、均值、标准差、四分位数、分数段）
+- 前后测的成对差值、Cohen's d、配对t检验和Wilcoxon符号秩检验
+- 按年级、专业、性别的分组结果
+
+t分布和Wilcoxon的p值在本模块内计算（正则化不完全贝塔函数、精确分布/正态近似），不依赖SciPy。
+"""
+import logging
+import math
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.config import STATS_MIN_GROUP_SIZE
+from app.database import COHORT_METRICS, get_db_connection
+from app.export import parse_date_bound
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+# 成绩指标 -> 用户画像列，分数段宽度与班级汇总表一致
+SCORE_COLUMNS = {
+    "pre_test": "post_score",
+    "post_test": "after_score",
+    "pre_strategy": "post_strategies_score",
+    "post_strategy": "after_strategies_score",
+}
+# 成对比较：名称 -> (前测指标, 后测指标)
+PAIRED_METRICS = {
+    "test": ("pre_test", "post_test"),
+    "strategy": ("pre_strategy", "post_strategy"),
+}
+# 可用于分组的画像列
+SUBGROUP_COLUMNS = ("grade", "major", "gender")
+
+# 置信水平
+CONFIDENCE = 0.95
+# 非零差值不超过该人数且没有并列时，Wilcoxon检验使用精确分布
+WILCOXON_EXACT_MAX = 50
+
+
+class CohortAnalysisError(ValueError):
+    """统计参数无效"""
+
+
+class Cohort:
+    """一个群体的成绩数组（缺失为NaN）和分组列的整数编码"""
+
+    def __init__(self, scores: Dict[str, np.ndarray], groups: Dict[str, Tuple[np.ndarray, List[Optional[str]]]]):
+        self.scores = scores
+        # 分组列 -> (每个学生的类别编号, 类别值列表)
+        self.groups = groups
+
+    def __len__(self) -> int:
+        return len(next(iter(self.scores.values())))
+
+    def subset(self, index: np.ndarray) -> "Cohort":
+        return Cohort({name: values[index] for name, values in self.scores.items()}, {})
+
+
+def load_cohort(grade: Optional[str] = None, major: Optional[str] = None, gender: Optional[str] = None,
+                since: Optional[str] = None, until: Optional[str] = None,
+                by: Sequence[str] = SUBGROUP_COLUMNS) -> Cohort:
+    """用一次查询读取符合条件的学生成绩和分组列"""
+    unknown = [column for column in by if column not in SUBGROUP_COLUMNS]
+    if unknown:
+        raise CohortAnalysisError(f"不支持的分组: {', '.join(unknown)}，可选 {', '.join(SUBGROUP_COLUMNS)}")
+
+    conditions = []
+    params: List[Any] = []
+    for column, value in (("grade", grade), ("major", major), ("gender", gender)):
+        if value:
+            conditions.append(f"{column} = ?")
+            params.append(value)
+    since_bound = parse_date_bound(since)
+    if since_bound:
+        conditions.append("created_at >= ?")
+        params.append(since_bound)
+    until_bound = parse_date_bound(until, upper=True)
+    if until_bound:
+        # 只给日期时上界为次日零点，因此用严格小于
+        conditions.append("created_at < ?" if len(until) == 10 else "created_at <= ?")
+        params.append(until_bound)
+
+    columns = ", ".join(list(SCORE_COLUMNS.values()) + list(by))
+    where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+
+    conn = get_db_connection()
+    conn.row_factory = None  # 只需要元组，省去sqlite3.Row的开销
+    try:
+        rows = conn.execute(f"SELECT {columns} FROM User_Profile{where}", params).fetchall()
+    finally:
+        conn.close()
+
+    width = len(SCORE_COLUMNS)
+    if not rows:
+        matrix = np.empty((0, width + len(by)), dtype=object)
+    else:
+        # 整批转换为二维数组，成绩列中的 None 转为 NaN
+        matrix = np.array(rows, dtype=np.float64 if not by else object)
+    scores = {name: np.ascontiguousarray(matrix[:, i], dtype=np.float64) for i, name in enumerate(SCORE_COLUMNS)}
+
+    groups = {}
+    for offset, column in enumerate(by, start=width):
+        raw = matrix[:, offset].tolist()
+        # 类别值排序，缺失值排在最后
+        values = sorted(dict.fromkeys(raw), key=lambda value: (value is None, value or ""))
+        lookup = {value: code for code, value in enumerate(values)}
+        groups[column] = (np.fromiter(map(lookup.__getitem__, raw), dtype=np.int64, count=len(raw)), values)
+    return Cohort(scores, groups)
+
+
+def _number(value: float, digits: int = 4) -> Optional[float]:
+    """转换为可JSON序列化的数值，NaN和无穷大为 None"""
+    value = float(value)
+    return round(value, digits) if math.isfinite(value) else None
+
+
+def _betacf(a: float, b: float, x: float) -> float:
+    """不完全贝塔函数的连分式（修正Lentz算法）"""
+    tiny = 1e-300
+    qab, qap, qam = a + b, a + 1.0, a - 1.0
+    c = 1.0
+    d = 1.0 - qab * x / qap
+    d = 1.0 / (d if abs(d) > tiny else tiny)
+    h = d
+    for m in range(1, 10000):
+        m2 = 2 * m
+        for aa in (m * (b - m) * x / ((qam + m2) * (a + m2)),
+                   -(a + m) * (qab + m) * x / ((a + m2) * (qap + m2))):
+            d = 1.0 + aa * d
+            d = 1.0 / (d if abs(d) > tiny else tiny)
+            c = 1.0 + aa / c
+            c = c if abs(c) > tiny else tiny
+            delta = d * c
+            h *= delta
+        if abs(delta - 1.0) < 1e-14:
+            break
+    return h
+
+
+def regularized_incomplete_beta(a: float, b: float, x: float) -> float:
+    """正则化不完全贝塔函数 I_x(a, b)"""
+    if x <= 0.0:
+        return 0.0
+    if x >= 1.0:
+        return 1.0
+    log_front = math.lgamma(a + b) - math.lgamma(a) - math.lgamma(b) + a * math.log(x) + b * math.log1p(-x)
+    # 在收敛较快的一侧展开连分式
+    if x < (a + 1.0) / (a + b + 2.0):
+        return math.exp(log_front) * _betacf(a, b, x) / a
+    return 1.0 - math.exp(log_front) * _betacf(b, a, 1.0 - x) / b
+
+
+def t_two_sided_p(t: float, df: float) -> float:
+    """自由度为 df 的t分布的双侧p值"""
+    if not math.isfinite(t):
+        return 0.0 if math.isinf(t) else math.nan
+    return regularized_incomplete_beta(df / 2.0, 0.5, df / (df + t * t))
+
+
+def t_critical(df: float, confidence: float = CONFIDENCE) -> float:
+    """
+    双侧置信区间的t临界值
+
+    双侧p值在 t>0 上单调递减且为凸函数，从 t=0 开始用牛顿法逼近，迭代点单调增加，不会越过解。
+    """
+    alpha = 1.0 - confidence
+    log_density = math.lgamma((df + 1.0) / 2.0) - math.lgamma(df / 2.0) - 0.5 * math.log(df * math.pi)
+    t = 0.0
+    for _ in range(100):
+        density = math.exp(log_density - (df + 1.0) / 2.0 * math.log1p(t * t / df))
+        step = (t_two_sided_p(t, df) - alpha) / (2.0 * density)
+        t += step
+        if step < 1e-10 * max(t, 1.0):
+            break
+    return t
+
+
+def _normal_two_sided_p(z: float) -> float:
+    return math.erfc(abs(z) / math.sqrt(2.0))
+
+
+def describe(values: np.ndarray, metric: str) -> Dict[str, Any]:
+    """一项成绩的分布，缺失值（NaN）不计入"""
+    values = values[~np.isnan(values)]
+    n = len(values)
+    result: Dict[str, Any] = {"n": n, "mean": None, "sd": None, "min": None, "q1": None, "median": None,
+                              "q3": None, "max": None, "histogram": []}
+    if not n:
+        return result
+    q1, median, q3 = np.percentile(values, [25, 50, 75])
+    result.update(mean=_number(values.mean()), sd=_number(values.std(ddof=1)) if n > 1 else None,
+                  min=_number(values.min()), q1=_number(q1), median=_number(median), q3=_number(q3),
+                  max=_number(values.max()))
+
+    width = COHORT_METRICS[metric][1]
+    buckets = np.floor(values / width).astype(np.int64)
+    first = int(buckets.min())
+    counts = np.bincount(buckets - first)
+    result["histogram"] = [{"from": (first + i) * width, "to": (first + i + 1) * width, "count": int(count)}
+                           for i, count in enumerate(counts) if count]
+    return result
+
+
+def _average_ranks(values: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """升序秩（并列取平均秩）以及各组并列的个数"""
+    order = np.argsort(values, kind="mergesort")
+    sorted_values = values[order]
+    starts = np.flatnonzero(np.r_[True, sorted_values[1:] != sorted_values[:-1]])
+    counts = np.diff(np.r_[starts, len(values)])
+    # 并列组的平均秩 = 组内第一个秩 + (个数 - 1) / 2
+    group_ranks = starts + 1 + (counts - 1) / 2.0
+    ranks = np.empty(len(values), dtype=np.float64)
+    ranks[order] = np.repeat(group_ranks, counts)
+    return ranks, counts
+
+
+def _wilcoxon_exact_p(w_plus: float, n: int) -> float:
+    """无并列时符号秩统计量的精确双侧p值：逐个加入秩 k，累加各个秩和出现的次数"""
+    max_sum = n * (n + 1) // 2
+    counts = np.zeros(max_sum + 1, dtype=np.float64)
+    counts[0] = 1.0
+    for k in range(1, n + 1):
+        counts[k:] = counts[k:] + counts[:-k]
+    cdf = np.cumsum(counts) / 2.0 ** n
+    w = int(round(w_plus))
+    lower = cdf[w]
+    upper = 1.0 - (cdf[w - 1] if w > 0 else 0.0)
+    return min(1.0, 2.0 * min(lower, upper))
+
+
+def wilcoxon_signed_rank(differences: np.ndarray) -> Dict[str, Any]:
+    """
+    Wilcoxon符号秩检验（双侧），差值为0的学生不计入
+
+    非零差值不超过 WILCOXON_EXACT_MAX 个且没有并列时用精确分布，否则用带并列校正的正态近似。
+    效应量 r = z / sqrt(n)。
+    """
+    nonzero = differences[differences != 0]
+    n = len(nonzero)
+    result: Dict[str, Any] = {"n": n, "w_plus": None, "w_minus": None, "z": None, "p": None, "r": None,
+                              "method": None}
+    if not n:
+        return result
+    ranks, ties = _average_ranks(np.abs(nonzero))
+    w_plus = float(ranks[nonzero > 0].sum())
+    w_minus = n * (n + 1) / 2.0 - w_plus
+    mean = n * (n + 1) / 4.0
+    variance = n * (n + 1) * (2 * n + 1) / 24.0 - float(((ties ** 3) - ties).sum()) / 48.0
+    z = (w_plus - mean) / math.sqrt(variance) if variance > 0 else math.nan
+    if n <= WILCOXON_EXACT_MAX and (ties == 1).all():
+        p, method = _wilcoxon_exact_p(w_plus, n), "exact"
+    else:
+        p, method = (_normal_two_sided_p(z) if math.isfinite(z) else math.nan), "normal"
+    result.update(w_plus=_number(w_plus), w_minus=_number(w_minus), z=_number(z), p=_number(p, 6),
+                  r=_number(z / math.sqrt(n)), method=method)
+    return result
+
+
+def paired_comparison(pre: np.ndarray, post: np.ndarray) -> Dict[str, Any]:
+    """
+    前后测成对比较，只计入两次都有成绩的学生
+
+    Cohen's d 给出两种：d_z 为差值均值除以差值标准差（与配对t检验对应），
+    d_av 为差值均值除以前后测标准差的平均（便于与独立样本研究比较）。
+    """
+    both = ~(np.isnan(pre) | np.isnan(post))
+    pre, post = pre[both], post[both]
+    differences = post - pre
+    n = len(differences)
+    result: Dict[str, Any] = {
+        "n": n, "pre_mean": None, "post_mean": None, "mean_difference": None, "sd_difference": None,
+        "improved": int((differences > 0).sum()), "unchanged": int((differences == 0).sum()),
+        "declined": int((differences < 0).sum()),
+        "cohens_dz": None, "cohens_d_av": None,
+        "t_test": {"t": None, "df": None, "p": None, "ci_low": None, "ci_high": None},
+        "wilcoxon": wilcoxon_signed_rank(differences),
+    }
+    if not n:
+        return result
+    mean_difference = float(differences.mean())
+    result.update(pre_mean=_number(pre.mean()), post_mean=_number(post.mean()),
+                  mean_difference=_number(mean_difference))
+    if n < 2:
+        return result
+
+    sd_difference = float(differences.std(ddof=1))
+    sd_average = math.sqrt((float(pre.var(ddof=1)) + float(post.var(ddof=1))) / 2.0)
+    result.update(
+        sd_difference=_number(sd_difference),
+        cohens_dz=_number(mean_difference / sd_difference) if sd_difference > 0 else None,
+        cohens_d_av=_number(mean_difference / sd_average) if sd_average > 0 else None,
+    )
+    df = n - 1
+    if sd_difference > 0:
+        standard_error = sd_difference / math.sqrt(n)
+        t = mean_difference / standard_error
+        margin = t_critical(df) * standard_error
+        result["t_test"] = {"t": _number(t), "df": df, "p": _number(t_two_sided_p(t, df), 6),
+                            "ci_low": _number(mean_difference - margin), "ci_high": _number(mean_difference + margin)}
+    else:
+        result["t_test"]["df"] = df
+    return result
+
+
+def _summarize(cohort: Cohort) -> Dict[str, Any]:
+    return {
+        "students": len(cohort),
+        "distributions": {metric: describe(cohort.scores[metric], metric) for metric in SCORE_COLUMNS},
+        "paired": {name: paired_comparison(cohort.scores[pre], cohort.scores[post])
+                   for name, (pre, post) in PAIRED_METRICS.items()},
+    }
+
+
+def analyze_cohort(grade: Optional[str] = None, major: Optional[str] = None, gender: Optional[str] = None,
+                   since: Optional[str] = None, until: Optional[str] = None,
+                   by: Sequence[str] = SUBGROUP_COLUMNS,
+                   min_group_size: int = STATS_MIN_GROUP_SIZE) -> Dict[str, Any]:
+    """
+    统计符合条件的全部学生，并按 by 中的各列分别分组统计
+
+    人数少于 min_group_size 的群体和分组只给出人数，避免小组结果被误读或暴露个人成绩。
+    """
+    cohort = load_cohort(grade=grade, major=major, gender=gender, since=since, until=until, by=by)
+    # 筛选条件本身也可能只剩几名学生
+    result = _summarize(cohort) if len(cohort) >= min_group_size else {"students": len(cohort)}
+    result["filters"] = {"grade": grade, "major": major, "gender": gender, "since": since, "until": until}
+
+    subgroups: Dict[str, List[Dict[str, Any]]] = {}
+    for column, (codes, values) in cohort.groups.items():
+        # 稳定排序后按类别切片，各组保持原来的学生顺序
+        order = np.argsort(codes, kind="stable")
+        ends = np.cumsum(np.bincount(codes, minlength=len(values)))
+        entries = []
+        for code, value in enumerate(values):
+            index = order[ends[code - 1] if code else 0:ends[code]]
+            if len(index) >= min_group_size:
+                entry = _summarize(cohort.subset(index))
+            else:
+                entry = {"students": len(index)}
+            entries.append({"value": value, **entry})
+        subgroups[column] = entries
+    result["subgroups"] = subgroups
+    logger.info(f"群体统计: grade={grade}, major={major}, gender={gender}, since={since}, until={until}，"
+                f"{len(cohort)}名学生，分组 {', '.join(by) or '无'}")
+    return result
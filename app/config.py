@@ -6,16 +6,155 @@ from pathlib import Path
 BASE_DIR = Path(__file__).resolve().parent.parent
 
 # API 配置
-DEEPSEEK_API_KEY = "put your API here"
-DEEPSEEK_API_URL = "https://api.deepseek.com/v1/chat/completions"
+DEEPSEEK_API_KEY = os.getenv("PERSS_DEEPSEEK_API_KEY", "put your API here")
+# 压测时指向本地模拟服务（mock_ai_server.py）
+DEEPSEEK_API_URL = os.getenv("PERSS_DEEPSEEK_API_URL", "https://api.deepseek.com/v1/chat/completions")
 
 # 数据库配置
 # 使用Path对象确保跨平台路径兼容性
-DATABASE_PATH = str(BASE_DIR / "PERSS_DB.sqlite")
+# 压测等场景可用 PERSS_DATABASE_PATH 指向临时副本
+DATABASE_PATH = os.getenv("PERSS_DATABASE_PATH", str(BASE_DIR / "PERSS_DB.sqlite"))
 
 # 如果数据库目录不存在，则创建
 os.makedirs(os.path.dirname(DATABASE_PATH), exist_ok=True)
 
+# HTTP缓存配置
+# 内容版本在进程内缓存的秒数，缓存期内的条件请求直接返回304，不访问数据库
+CONTENT_VERSION_TTL_SECONDS = 2.0
+# 系统介绍、量表等公开内容：可由浏览器和代理缓存，过期后重新校验
+CONTENT_CACHE_CONTROL = "public, max-age=60, must-revalidate"
+# 试卷不含参考答案，与其他公开内容相同
+EXAM_CACHE_CONTROL = CONTENT_CACHE_CONTROL
+# 启动内容：每次使用前都要重新校验
+BOOTSTRAP_CACHE_CONTROL = "no-cache"
+# 用户画像和AI分析：仅浏览器缓存，短时间内有效，画像变化后校验失败
+PROFILE_CACHE_CONTROL = "private, no-cache"
+ANALYSIS_CACHE_CONTROL = "private, max-age=30, must-revalidate"
+
+# 启动接口 /api/bootstrap 返回的前测试卷ID
+BOOTSTRAP_EXAM_IDS = (1, 2)
+
+# 写入组提交配置
+# 开启后，短时间内到达的成绩提交合并为一次事务提交，减少fsync次数
+WRITE_BATCHING_ENABLED = os.getenv("PERSS_WRITE_BATCHING", "1").lower() not in ("0", "false", "no")
+# 每组最多合并的写操作数
+WRITE_BATCH_MAX_ITEMS = int(os.getenv("PERSS_WRITE_BATCH_MAX_ITEMS", "64"))
+# 第一条写操作到达后最多等待的毫秒数
+WRITE_BATCH_MAX_DELAY_MS = float(os.getenv("PERSS_WRITE_BATCH_MAX_DELAY_MS", "5"))
+
+# 数据库维护配置
+# 是否在应用进程内运行后台维护任务（WAL检查点、PRAGMA optimize、增量清理）
+MAINTENANCE_ENABLED = os.getenv("PERSS_MAINTENANCE", "1").lower() not in ("0", "false", "no")
+# 检查间隔（秒）
+MAINTENANCE_INTERVAL_SECONDS = float(os.getenv("PERSS_MAINTENANCE_INTERVAL", "30"))
+# 请求繁忙时推迟维护的最长间隔（秒）
+MAINTENANCE_MAX_BACKOFF_SECONDS = 600
+# 进行中的请求数或每秒请求数达到该值时视为繁忙
+MAINTENANCE_BUSY_IN_FLIGHT = 4
+MAINTENANCE_BUSY_REQUESTS_PER_SECOND = 20.0
+# WAL超过该大小时执行 PASSIVE 检查点
+WAL_CHECKPOINT_BYTES = 1 * 1024 * 1024
+# WAL超过该大小且空闲时执行 TRUNCATE 检查点
+WAL_TRUNCATE_BYTES = 4 * 1024 * 1024
+# WAL非空时，距上次检查点超过该时间（秒）也执行一次
+WAL_CHECKPOINT_MAX_AGE_SECONDS = 300
+# PRAGMA optimize 的执行间隔（秒）
+OPTIMIZE_INTERVAL_SECONDS = 3600
+# 增量清理（需要数据库为 auto_vacuum=INCREMENTAL）
+INCREMENTAL_VACUUM_ENABLED = os.getenv("PERSS_INCREMENTAL_VACUUM", "0").lower() in ("1", "true", "yes")
+INCREMENTAL_VACUUM_MIN_FREE_PAGES = 256
+INCREMENTAL_VACUUM_PAGES = 512
+
+# 阅卷配置
+# 每题分值，与前端显示一致
+EXAM_QUESTION_POINTS = 10
+# 主观题：作答与参考答案的词集合相似度（Dice系数）达到该值判为正确
+GRADING_SIMILARITY_THRESHOLD = float(os.getenv("PERSS_GRADING_SIMILARITY", "0.7"))
+# 选择题：作答未写选项字母时，与某个选项原文的相似度达到该值视为选择了该选项
+GRADING_OPTION_THRESHOLD = float(os.getenv("PERSS_GRADING_OPTION_SIMILARITY", "0.8"))
+
+# 研究统计配置
+# 人数少于该值的群体和分组只给出人数，不返回成绩统计，避免从小组结果推出个人成绩
+STATS_MIN_GROUP_SIZE = max(1, int(os.getenv("PERSS_STATS_MIN_GROUP_SIZE", "5")))
+
+# 提交接口的幂等键配置
+# 带 Idempotency-Key 头的提交（画像、试卷、策略问卷），首次成功的响应保存该秒数，
+# 期间相同的键直接返回保存的响应，不再修改画像
+IDEMPOTENCY_TTL_SECONDS = float(os.getenv("PERSS_IDEMPOTENCY_TTL", str(24 * 3600)))
+IDEMPOTENCY_KEY_MAX_LENGTH = 255
+# 维护任务清理过期幂等键的间隔（秒）
+IDEMPOTENCY_PURGE_INTERVAL_SECONDS = 600
+
+# AI接口限流配置
+# 令牌桶：(容量, 周期秒数)，即一个周期内最多请求的次数，令牌按 容量/周期 的速度匀速补充
+# 按学生姓名和客户端IP各有一个桶，两个桶都有令牌时才放行。
+# 机房和宿舍的学生常共用一个出口IP，所以IP桶比学生桶宽松得多，只用来挡住不带姓名的刷接口行为
+RATE_LIMIT_ENABLED = os.getenv("PERSS_RATE_LIMIT", "1").lower() not in ("0", "false", "no")
+RATE_LIMITS = {
+    # AI对话
+    "chat": {"user": (10, 60), "ip": (120, 60)},
+    # 画像分析、错题分析、策略推荐、学习总结
+    "analysis": {"user": (6, 300), "ip": (60, 60)},
+}
+# 限流状态的存储：memory 为进程内；sqlite 在多个worker进程间共享
+RATE_LIMIT_BACKEND = os.getenv("PERSS_RATE_LIMIT_BACKEND", "memory")
+RATE_LIMIT_DB_PATH = os.getenv("PERSS_RATE_LIMIT_DB", str(BASE_DIR / "rate_limit.sqlite"))
+# 位于反向代理之后时，按 X-Forwarded-For 的第一个地址识别客户端
+RATE_LIMIT_TRUST_PROXY = os.getenv("PERSS_TRUST_PROXY", "0").lower() in ("1", "true", "yes")
+
+# AI对话WebSocket配置
+# 服务器发送心跳的间隔（秒）；超过空闲超时仍未收到客户端任何消息时断开连接
+CHAT_WS_HEARTBEAT_SECONDS = 20.0
+CHAT_WS_IDLE_TIMEOUT_SECONDS = 60.0
+# 每次对话带上的最近消息条数（学生和AI各算一条）
+CHAT_HISTORY_MAX_MESSAGES = 12
+# 单条学生消息的最大字符数
+CHAT_MAX_MESSAGE_LENGTH = 2000
+
+# 日志配置
+LOG_LEVEL = os.getenv("PERSS_LOG_LEVEL", "INFO").upper()
+# text 或 json（每行一条JSON，便于日志系统采集）
+LOG_FORMAT = os.getenv("PERSS_LOG_FORMAT", "text")
+# 同时写入的日志文件，为空时只输出到终端
+LOG_FILE = os.getenv("PERSS_LOG_FILE") or None
+# 单条日志消息和每个参数的最大字符数
+LOG_MAX_MESSAGE_LENGTH = int(os.getenv("PERSS_LOG_MAX_LENGTH", "2000"))
+# 高频日志的抽样比例（日志器名称 -> 保留比例），只作用于 WARNING 以下的日志
+LOG_SAMPLE_RATES = {
+    "app.write_batcher": 0.01,
+    "app.maintenance": 0.1,
+}
+
+# 管理和教师接口（数据库维护、教师看板、批量阅卷等）的访问令牌，请求需带 X-Admin-Token 头；
+# 为空时这些接口一律拒绝访问
+ADMIN_TOKEN = os.getenv("PERSS_ADMIN_TOKEN", "")
+
+# 单请求性能剖析配置
+# 请求带 X-Profile-Token 头（或 profile_token 查询参数）且与该值一致时，对这一个请求采样剖析；
+# 为空时不安装剖析中间件
+PROFILE_TOKEN = os.getenv("PERSS_PROFILE_TOKEN", "")
+# 剖析结果（speedscope JSON 或 collapsed 折叠栈）的保存目录
+PROFILE_DIR = os.getenv("PERSS_PROFILE_DIR", str(BASE_DIR / "profiles"))
+# 采样间隔（秒）
+PROFILE_SAMPLE_INTERVAL = float(os.getenv("PERSS_PROFILE_INTERVAL", "0.002"))
+
+# 生产模式配置（python run.py --prod）
+SERVER_HOST = os.getenv("PERSS_HOST", "0.0.0.0")
+SERVER_PORT = int(os.getenv("PERSS_PORT", "8000"))
+# worker进程数，默认等于CPU核数
+SERVER_WORKERS = int(os.getenv("PERSS_WORKERS", "0")) or (os.cpu_count() or 1)
+# 收到停止信号后等待进行中的请求（包括AI调用）完成的最长秒数，超时后强制取消
+SHUTDOWN_TIMEOUT_SECONDS = float(os.getenv("PERSS_SHUTDOWN_TIMEOUT", "60"))
+# 存在构建好的前端（frontend/dist）时由后端直接提供，设为0则只提供API
+SERVE_FRONTEND = os.getenv("PERSS_SERVE_FRONTEND", "1").lower() not in ("0", "false", "no")
+FRONTEND_DIST_DIR = os.getenv("PERSS_FRONTEND_DIST", str(BASE_DIR / "frontend" / "dist"))
+# 文件名带内容哈希的资源内容永不变化，可以长期缓存
+FRONTEND_ASSET_CACHE_CONTROL = "public, max-age=31536000, immutable"
+# index.html 引用当前版本的资源文件名，每次都要重新校验
+FRONTEND_INDEX_CACHE_CONTROL = "no-cache"
+# 其他文件（favicon等）
+FRONTEND_FILE_CACHE_CONTROL = "public, max-age=3600"
+
 # CORS 设置
 CORS_ORIGINS = [
     "http://localhost:8080",  # Vue开发服务器默认端口
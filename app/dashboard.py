@@ -0,0 +1,206 @@
+"""教师端看板：学生名单（键集分页）和按班级（年级+专业）汇总的完成情况、平均分和高频错题"""
+import base64
+import json
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.database import COHORT_METRICS, COMPLETION_STAGES, STAGE_SQL, get_db_connection
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+# 每个班级返回的高频错题数
+DEFAULT_TOP_QUESTIONS = 5
+MAX_TOP_QUESTIONS = 20
+
+# 名单排序方式：按id（默认，最早注册在前）或按分数从高到低；按分数排序时只列出有该分数的学生
+ROSTER_SORTS = ("id", "post_score", "after_score")
+
+ROSTER_COLUMNS = (
+    "id, name, grade, major, gender, post_score, after_score, post_strategies_score, after_strategies_score, "
+    f"updated_at, {STAGE_SQL} AS stage"
+)
+
+
+class DashboardError(ValueError):
+    """看板查询参数无效"""
+
+
+def encode_cursor(*key: Any) -> str:
+    """把最后一条记录的排序键编码为游标"""
+    raw = json.dumps(list(key), separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, sort: str) -> Tuple[int, ...]:
+    """解析游标，格式无效或与排序方式不符时抛出 DashboardError"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        key = tuple(int(value) for value in json.loads(raw))
+    except (ValueError, TypeError):
+        raise DashboardError("游标无效")
+    if len(key) != (1 if sort == "id" else 2):
+        raise DashboardError("游标与排序方式不符")
+    return key
+
+
+def _class_filter(grade: Optional[str], major: Optional[str], params: Dict[str, Any]) -> List[str]:
+    """年级、专业筛选条件"""
+    conditions = []
+    if grade:
+        conditions.append("grade = :grade")
+        params["grade"] = grade
+    if major:
+        conditions.append("major = :major")
+        params["major"] = major
+    return conditions
+
+
+def list_students(grade: Optional[str] = None, major: Optional[str] = None, stage: Optional[str] = None,
+                  sort: str = "id", limit: int = DEFAULT_PAGE_SIZE, cursor: Optional[str] = None) -> Dict[str, Any]:
+    """
+    按条件列出学生，每页 limit 条
+
+    使用键集分页：下一页从上一页最后一条的排序键之后开始，通过索引直接定位，
+    翻到第几页耗时都相同，翻页期间新注册的学生也不会造成重复或遗漏。
+    """
+    if sort not in ROSTER_SORTS:
+        raise DashboardError(f"不支持的排序方式: {sort}")
+    if stage is not None and stage not in COMPLETION_STAGES:
+        raise DashboardError(f"不支持的学习进度: {stage}")
+
+    params: Dict[str, Any] = {"limit": limit + 1}
+    conditions = _class_filter(grade, major, params)
+    if stage is not None:
+        conditions.append(f"{STAGE_SQL} = :stage")
+        params["stage"] = COMPLETION_STAGES.index(stage)
+
+    if sort == "id":
+        order = "id"
+        if cursor:
+            (params["after_id"],) = decode_cursor(cursor, sort)
+            conditions.append("id > :after_id")
+    else:
+        # 分数相同时按id降序，与分数索引的反向扫描顺序一致
+        order = f"{sort} DESC, id DESC"
+        conditions.append(f"{sort} IS NOT NULL")
+        if cursor:
+            params["after_score"], params["after_id"] = decode_cursor(cursor, sort)
+            conditions.append(f"({sort} < :after_score OR ({sort} = :after_score AND id < :after_id))")
+
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    conn = get_db_connection()
+    try:
+        rows = conn.execute(f"SELECT {ROSTER_COLUMNS} FROM User_Profile {where} ORDER BY {order} LIMIT :limit",
+                            params).fetchall()
+    finally:
+        conn.close()
+
+    students = []
+    for row in rows[:limit]:
+        student = {key: row[key] for key in row.keys()}
+        student["stage"] = COMPLETION_STAGES[row["stage"]]
+        students.append(student)
+
+    next_cursor = None
+    if len(rows) > limit:
+        last = students[-1]
+        next_cursor = encode_cursor(last["id"]) if sort == "id" else encode_cursor(last[sort], last["id"])
+    return {"students": students, "next_cursor": next_cursor}
+
+
+def _round(value: Optional[float]) -> Optional[float]:
+    return round(value, 2) if value is not None else None
+
+
+def _describe(n: int, total: int, total_sq: int) -> Dict[str, Optional[float]]:
+    """由人数、总和、平方和得到平均分和样本标准差"""
+    if not n:
+        return {"mean": None, "stdev": None}
+    mean = total / n
+    stdev = (max(total_sq - total * mean, 0) / (n - 1)) ** 0.5 if n > 1 else None
+    return {"mean": _round(mean), "stdev": _round(stdev)}
+
+
+def class_summaries(grade: Optional[str] = None, major: Optional[str] = None,
+                    top_questions: int = DEFAULT_TOP_QUESTIONS) -> Dict[str, Any]:
+    """
+    按班级（年级+专业）汇总：各阶段完成人数、前后测和策略量表的平均分、标准差和分数段分布、错误人数最多的题目
+
+    数据来自由触发器增量维护的 cohort_stats、cohort_histogram 和 cohort_misses 汇总表，
+    每个班级只读取固定数量的汇总行，与学生人数无关。
+    """
+    params: Dict[str, Any] = {"top": top_questions}
+    conditions = _class_filter(grade, major, params)
+    where = f"AND {' AND '.join(conditions)}" if conditions else ""
+
+    conn = get_db_connection()
+    try:
+        stats = conn.execute(f"""
+            SELECT grade, major, metric, n, total, total_sq FROM cohort_stats
+            WHERE n != 0 {where} ORDER BY grade, major
+        """, params).fetchall()
+        buckets = conn.execute(f"""
+            SELECT grade, major, metric, bucket, count FROM cohort_histogram
+            WHERE count != 0 {where} ORDER BY grade, major, metric, bucket
+        """, params).fetchall()
+        missed = conn.execute(f"""
+            SELECT grade, major, exam_id, question_num, misses FROM (
+                SELECT grade, major, exam_id, question_num, misses,
+                       ROW_NUMBER() OVER (PARTITION BY grade, major
+                                          ORDER BY misses DESC, exam_id, question_num) AS rank
+                FROM cohort_misses WHERE misses > 0 {where}
+            ) WHERE rank <= :top
+            ORDER BY grade, major, rank
+        """, params).fetchall()
+    finally:
+        conn.close()
+
+    metrics: Dict[Tuple[str, str], Dict[str, Any]] = {}
+    for row in stats:
+        metrics.setdefault((row["grade"], row["major"]), {})[row["metric"]] = row
+    histograms: Dict[Tuple[str, str], Dict[str, List[Dict[str, int]]]] = {}
+    for row in buckets:
+        width = COHORT_METRICS[row["metric"]][1]
+        histograms.setdefault((row["grade"], row["major"]), {}).setdefault(row["metric"], []).append(
+            {"from": row["bucket"] * width, "to": (row["bucket"] + 1) * width, "count": row["count"]})
+    most_missed: Dict[Tuple[str, str], List[Dict[str, Any]]] = {}
+    for row in missed:
+        most_missed.setdefault((row["grade"], row["major"]), []).append(
+            {"exam_id": row["exam_id"], "question_num": row["question_num"], "misses": row["misses"]})
+
+    classes = []
+    for key, rows in metrics.items():
+        if "students" not in rows:
+            continue
+        # 没有任何学生有取值的指标不在汇总表中
+        count = {metric: rows[metric]["n"] if metric in rows else 0 for metric in COHORT_METRICS}
+        pre_test = count["pre_test"]
+        questions = most_missed.get(key, [])
+        for question in questions:
+            # 错误率以完成能力前测的人数为分母
+            question["miss_rate"] = _round(question["misses"] / pre_test) if pre_test else None
+        descriptives = {metric: _describe(count[metric], rows[metric]["total"], rows[metric]["total_sq"])
+                        if metric in rows else _describe(0, 0, 0)
+                        for metric, (_, width) in COHORT_METRICS.items() if width}
+        classes.append({
+            "grade": key[0] or None,
+            "major": key[1] or None,
+            "students": count["students"],
+            "completion": {
+                "profile": count["students"],
+                "pre_test": pre_test,
+                "pre_strategy": count["pre_strategy"],
+                "post_test": count["post_test"],
+                "post_strategy": count["post_strategy"],
+                "completed": count["completed"],
+            },
+            "means": {metric: values["mean"] for metric, values in descriptives.items()},
+            "stdevs": {metric: values["stdev"] for metric, values in descriptives.items()},
+            "histograms": histograms.get(key, {}),
+            "most_missed": questions,
+        })
+    logger.info(f"班级汇总: grade={grade}, major={major}，{len(classes)}个班级")
+    return {"classes": classes}
@@ -2,19 +2,20 @@
 import logging
 import sqlite3
 import os
-from typing import List, Dict, Any, Union, Optional, Tuple
+from typing import List, Dict, Any, Union, Optional, Tuple, Callable
 
 from app.config import DATABASE_PATH, DEBUG
+from app.utils import to_int_score, to_real_score
 
 # 配置日志
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
 _DB_INITIALIZED_THIS_RUN = False
+_DB_MIGRATED_THIS_RUN = False
 
-def get_db_connection():
+def get_db_connection(check_same_thread: bool = True):
     """获取数据库连接"""
-    global _DB_INITIALIZED_THIS_RUN
+    global _DB_INITIALIZED_THIS_RUN, _DB_MIGRATED_THIS_RUN
     try:
         # 确保数据库目录存在
         db_dir = os.path.dirname(DATABASE_PATH)
@@ -22,7 +23,7 @@ def get_db_connection():
             
         db_exists = os.path.exists(DATABASE_PATH)
         
-        conn = sqlite3.connect(DATABASE_PATH)
+        conn = sqlite3.connect(DATABASE_PATH, check_same_thread=check_same_thread)
         conn.row_factory = sqlite3.Row  # 返回字典形式的结果
         
         # 如果数据库未在此次运行中初始化过，并且（数据库文件不存在 或 DEBUG模式为True）
@@ -35,6 +36,11 @@ def get_db_connection():
             logger.debug("数据库已在此次运行中初始化过，跳过。")
         elif db_exists and not DEBUG:
             logger.debug("数据库已存在且非 DEBUG 模式，跳过初始化。")
+
+        # 每个进程只检查一次结构迁移
+        if not _DB_MIGRATED_THIS_RUN:
+            _migrate_database(conn)
+            _DB_MIGRATED_THIS_RUN = True
             
         return conn
     except sqlite3.Error as e:
@@ -42,6 +48,487 @@ def get_db_connection():
         raise
 
 
+# 内容表结构（自评量表、策略量表、试卷、认知策略），初始化和批量导入共用
+CONTENT_TABLES = {
+    "self_rate": '''
+        CREATE TABLE IF NOT EXISTS self_rate (
+            id INTEGER PRIMARY KEY,
+            content TEXT NOT NULL
+        )
+    ''',
+    "Strategies": '''
+        CREATE TABLE IF NOT EXISTS Strategies (
+            id INTEGER PRIMARY KEY,
+            content TEXT NOT NULL
+        )
+    ''',
+    "exam": '''
+        CREATE TABLE IF NOT EXISTS exam (
+            id INTEGER PRIMARY KEY,
+            content TEXT,
+            t1 TEXT,
+            a1 TEXT,
+            t2 TEXT,
+            a2 TEXT,
+            t3 TEXT,
+            a3 TEXT,
+            t4 TEXT,
+            a4 TEXT,
+            t5 TEXT,
+            a5 TEXT
+        )
+    ''',
+    "CognitiveStrategies": '''
+        CREATE TABLE IF NOT EXISTS CognitiveStrategies (
+            id INTEGER PRIMARY KEY,
+            content TEXT,
+            detail TEXT
+        )
+    ''',
+}
+
+
+# 全文检索索引（FTS5）：表名 -> (建表语句, 同步触发器, 重建语句)
+# 试卷索引文章和题干（不含答案），单独保存内容，rowid 与 exam.id 一致；
+# 策略表使用外部内容表，索引只保存词项，片段从原表读取
+_EXAM_QUESTIONS_SQL = " || char(10) || ".join(f"coalesce({{row}}.t{i}, '')" for i in range(1, 6))
+SEARCH_INDEXES = {
+    "exam_fts": (
+        "CREATE VIRTUAL TABLE IF NOT EXISTS exam_fts USING fts5("
+        "content, questions, tokenize = 'porter unicode61 remove_diacritics 2')",
+        [
+            f"""CREATE TRIGGER IF NOT EXISTS exam_fts_ai AFTER INSERT ON exam BEGIN
+                INSERT INTO exam_fts (rowid, content, questions)
+                VALUES (new.id, new.content, {_EXAM_QUESTIONS_SQL.format(row="new")});
+            END""",
+            """CREATE TRIGGER IF NOT EXISTS exam_fts_ad AFTER DELETE ON exam BEGIN
+                DELETE FROM exam_fts WHERE rowid = old.id;
+            END""",
+            f"""CREATE TRIGGER IF NOT EXISTS exam_fts_au AFTER UPDATE ON exam BEGIN
+                DELETE FROM exam_fts WHERE rowid = old.id;
+                INSERT INTO exam_fts (rowid, content, questions)
+                VALUES (new.id, new.content, {_EXAM_QUESTIONS_SQL.format(row="new")});
+            END""",
+        ],
+        [
+            "DELETE FROM exam_fts",
+            f"INSERT INTO exam_fts (rowid, content, questions) "
+            f"SELECT id, content, {_EXAM_QUESTIONS_SQL.format(row='exam')} FROM exam",
+        ],
+    ),
+    "strategy_fts": (
+        "CREATE VIRTUAL TABLE IF NOT EXISTS strategy_fts USING fts5("
+        "content, content = 'Strategies', content_rowid = 'id', "
+        "tokenize = 'porter unicode61 remove_diacritics 2')",
+        [
+            """CREATE TRIGGER IF NOT EXISTS strategy_fts_ai AFTER INSERT ON Strategies BEGIN
+                INSERT INTO strategy_fts (rowid, content) VALUES (new.id, new.content);
+            END""",
+            """CREATE TRIGGER IF NOT EXISTS strategy_fts_ad AFTER DELETE ON Strategies BEGIN
+                INSERT INTO strategy_fts (strategy_fts, rowid, content) VALUES ('delete', old.id, old.content);
+            END""",
+            """CREATE TRIGGER IF NOT EXISTS strategy_fts_au AFTER UPDATE ON Strategies BEGIN
+                INSERT INTO strategy_fts (strategy_fts, rowid, content) VALUES ('delete', old.id, old.content);
+                INSERT INTO strategy_fts (rowid, content) VALUES (new.id, new.content);
+            END""",
+        ],
+        ["INSERT INTO strategy_fts (strategy_fts) VALUES ('rebuild')"],
+    ),
+    "cognitive_strategy_fts": (
+        "CREATE VIRTUAL TABLE IF NOT EXISTS cognitive_strategy_fts USING fts5("
+        "content, detail, content = 'CognitiveStrategies', content_rowid = 'id', "
+        "tokenize = 'porter unicode61 remove_diacritics 2')",
+        [
+            """CREATE TRIGGER IF NOT EXISTS cognitive_strategy_fts_ai AFTER INSERT ON CognitiveStrategies BEGIN
+                INSERT INTO cognitive_strategy_fts (rowid, content, detail) VALUES (new.id, new.content, new.detail);
+            END""",
+            """CREATE TRIGGER IF NOT EXISTS cognitive_strategy_fts_ad AFTER DELETE ON CognitiveStrategies BEGIN
+                INSERT INTO cognitive_strategy_fts (cognitive_strategy_fts, rowid, content, detail)
+                VALUES ('delete', old.id, old.content, old.detail);
+            END""",
+            """CREATE TRIGGER IF NOT EXISTS cognitive_strategy_fts_au AFTER UPDATE ON CognitiveStrategies BEGIN
+                INSERT INTO cognitive_strategy_fts (cognitive_strategy_fts, rowid, content, detail)
+                VALUES ('delete', old.id, old.content, old.detail);
+                INSERT INTO cognitive_strategy_fts (rowid, content, detail) VALUES (new.id, new.content, new.detail);
+            END""",
+        ],
+        ["INSERT INTO cognitive_strategy_fts (cognitive_strategy_fts) VALUES ('rebuild')"],
+    ),
+}
+
+
+# 内容版本：任何静态内容表发生变化时由触发器递增，用作缓存校验值
+CONTENT_META_TABLE = '''
+        CREATE TABLE IF NOT EXISTS content_meta (
+            key TEXT PRIMARY KEY,
+            version INTEGER NOT NULL
+        )
+'''
+CONTENT_VERSIONED_TABLES = ("introduction", "self_rate", "Strategies", "exam", "CognitiveStrategies")
+
+
+# 学习行为事件表：只追加不修改，时间为毫秒级Unix时间戳
+# 常用字段单独成列，其余内容以JSON保存在 data 中
+EVENTS_TABLE = '''
+        CREATE TABLE IF NOT EXISTS events (
+            id INTEGER PRIMARY KEY,
+            ts INTEGER NOT NULL,
+            received_at INTEGER NOT NULL,
+            name TEXT,
+            session TEXT,
+            type TEXT NOT NULL,
+            page TEXT,
+            item TEXT,
+            value REAL,
+            data TEXT
+        )
+'''
+EVENT_COLUMNS = ["ts", "received_at", "name", "session", "type", "page", "item", "value", "data"]
+
+
+# 提交接口的幂等键：同一接口同一键的首次响应，保存 IDEMPOTENCY_TTL_SECONDS 秒
+IDEMPOTENCY_TABLE = '''
+        CREATE TABLE IF NOT EXISTS idempotency_keys (
+            endpoint TEXT NOT NULL,
+            key TEXT NOT NULL,
+            request_hash TEXT NOT NULL,
+            response TEXT NOT NULL,
+            created_at REAL NOT NULL,
+            PRIMARY KEY (endpoint, key)
+        ) WITHOUT ROWID
+'''
+
+
+# 用户画像表结构，分数列使用数值类型，便于SQL排序和聚合
+USER_PROFILE_TABLE = '''
+        CREATE TABLE IF NOT EXISTS {table} (
+            id INTEGER PRIMARY KEY,
+            name TEXT NOT NULL UNIQUE,
+            grade TEXT,
+            major TEXT,
+            gender TEXT,
+            post_score INTEGER,
+            after_score INTEGER,
+            false_id TEXT,
+            post_strategies_score INTEGER,
+            after_strategies_score INTEGER,
+            exam1_score INTEGER,
+            exam2_score INTEGER,
+            exam3_score INTEGER,
+            exam4_score INTEGER,
+            "Have you taken the CET-4 exam:" TEXT,
+            "CET-4 score" INTEGER,
+            "CET-4 reading score" INTEGER,
+            "Have you taken the CET-6 exam" TEXT,
+            "CET-6 score" INTEGER,
+            "CET-6 reading score" INTEGER,
+            "Other English scores for reference" TEXT,
+            "Exam name" TEXT,
+            "Total score" REAL,
+            "Reading score" REAL,
+            created_at TEXT,
+            updated_at TEXT
+        )
+'''
+
+# 用户画像中的数值列及其类型
+INTEGER_PROFILE_COLUMNS = (
+    "post_score", "after_score",
+    "post_strategies_score", "after_strategies_score",
+    "exam1_score", "exam2_score", "exam3_score", "exam4_score",
+    "CET-4 score", "CET-4 reading score", "CET-6 score", "CET-6 reading score",
+)
+REAL_PROFILE_COLUMNS = ("Total score", "Reading score")
+
+# 学习进度：0 已填写画像，1 完成能力前测，2 完成策略前测（计划阶段结束），3 开始后测，4 前后测全部完成
+COMPLETION_STAGES = ["profile", "pre_test", "pre_strategy", "post_test", "completed"]
+STAGE_SQL = (
+    "(CASE WHEN after_score IS NOT NULL AND after_strategies_score IS NOT NULL THEN 4 "
+    "WHEN after_score IS NOT NULL OR after_strategies_score IS NOT NULL THEN 3 "
+    "WHEN post_strategies_score IS NOT NULL THEN 2 "
+    "WHEN post_score IS NOT NULL THEN 1 ELSE 0 END)"
+)
+
+# 班级排名和筛选用到的索引
+USER_PROFILE_INDEXES = {
+    "idx_user_profile_created_at": "(created_at)",
+    "idx_user_profile_grade_major_post": "(grade, major, post_score)",
+    "idx_user_profile_grade_major_after": "(grade, major, after_score)",
+    "idx_user_profile_post_score": "(post_score)",
+    "idx_user_profile_after_score": "(after_score)",
+    # 教师端名单：按年级、专业、进度筛选后按id分页（索引条目末尾隐含rowid，筛选后天然按id有序）
+    "idx_user_profile_roster": f"(grade, major, {STAGE_SQL})",
+    # 班级汇总：完成人数和平均分只读索引，不回表
+    "idx_user_profile_class_scores": "(grade, major, post_score, after_score, post_strategies_score, after_strategies_score)",
+}
+
+# 错题明细：由 false_id 拆分而来，写入 false_id 时同步更新，用于统计各题的错误人数
+WRONG_ANSWERS_TABLE = '''
+        CREATE TABLE IF NOT EXISTS wrong_answers (
+            user_id INTEGER NOT NULL,
+            exam_id INTEGER NOT NULL,
+            question_num INTEGER NOT NULL,
+            PRIMARY KEY (user_id, exam_id, question_num)
+        ) WITHOUT ROWID
+'''
+# 没有写试卷号的错题ID（如 "3"）默认属于的试卷，与错题分析一致
+DEFAULT_WRONG_ANSWER_EXAM_ID = 1
+
+# 班级汇总表：按班级（年级+专业，缺失时为空字符串）保存各指标的人数、总和、平方和、分数段人数和各题错误人数，
+# 由 User_Profile 和 wrong_answers 上的触发器在提交的同一事务中增量更新，看板直接读取
+COHORT_TABLES = {
+    "cohort_stats": '''
+        CREATE TABLE IF NOT EXISTS cohort_stats (
+            grade TEXT NOT NULL,
+            major TEXT NOT NULL,
+            metric TEXT NOT NULL,
+            n INTEGER NOT NULL,
+            total INTEGER NOT NULL,
+            total_sq INTEGER NOT NULL,
+            PRIMARY KEY (grade, major, metric)
+        ) WITHOUT ROWID
+    ''',
+    "cohort_histogram": '''
+        CREATE TABLE IF NOT EXISTS cohort_histogram (
+            grade TEXT NOT NULL,
+            major TEXT NOT NULL,
+            metric TEXT NOT NULL,
+            bucket INTEGER NOT NULL,
+            count INTEGER NOT NULL,
+            PRIMARY KEY (grade, major, metric, bucket)
+        ) WITHOUT ROWID
+    ''',
+    "cohort_misses": '''
+        CREATE TABLE IF NOT EXISTS cohort_misses (
+            grade TEXT NOT NULL,
+            major TEXT NOT NULL,
+            exam_id INTEGER NOT NULL,
+            question_num INTEGER NOT NULL,
+            misses INTEGER NOT NULL,
+            PRIMARY KEY (grade, major, exam_id, question_num)
+        ) WITHOUT ROWID
+    ''',
+}
+# 各汇总表末尾的数值列数，其余为主键列
+COHORT_VALUE_COLUMNS = {"cohort_stats": 3, "cohort_histogram": 1, "cohort_misses": 1}
+
+# 汇总指标：名称 -> (取值表达式, 分数段宽度)。{row} 为 new/old 或表名，取值为NULL的学生不计入该指标；
+# 宽度为 None 的指标只计人数，不分段
+COHORT_METRICS = {
+    "students": ("1", None),
+    "pre_test": ("{row}.post_score", 10),
+    "post_test": ("{row}.after_score", 10),
+    "paired_gain": ("({row}.after_score - {row}.post_score)", 10),
+    "pre_strategy": ("{row}.post_strategies_score", 5),
+    "post_strategy": ("{row}.after_strategies_score", 5),
+    "completed": ("(CASE WHEN {row}.after_score IS NOT NULL AND {row}.after_strategies_score IS NOT NULL THEN 1 END)",
+                  None),
+}
+# 影响汇总的画像列，其他列的更新不触发汇总
+COHORT_SOURCE_COLUMNS = ("grade", "major", "post_score", "after_score", "post_strategies_score", "after_strategies_score")
+_COHORT_MOVED_SQL = "old.grade IS NOT new.grade OR old.major IS NOT new.major"
+
+
+def _create_user_profile_indexes(cursor):
+    """创建用户画像索引"""
+    for index_name, columns in USER_PROFILE_INDEXES.items():
+        cursor.execute(f'CREATE INDEX IF NOT EXISTS {index_name} ON User_Profile {columns}')
+
+
+def wrong_answer_pairs(false_id: Optional[str]) -> List[Tuple[int, int]]:
+    """把错题ID字符串（"1-2,1:4,3"）拆分为 (试卷ID, 题号) 列表，忽略无法解析的项"""
+    pairs = []
+    for item in (false_id or "").split(","):
+        item = item.strip()
+        exam_id, sep, question_num = item.replace(":", "-").partition("-")
+        if not sep:
+            exam_id, question_num = DEFAULT_WRONG_ANSWER_EXAM_ID, item
+        try:
+            pairs.append((int(exam_id), int(question_num)))
+        except ValueError:
+            continue
+    return pairs
+
+
+def _sync_wrong_answers(cursor, name: str, false_id: Optional[str]):
+    """在当前事务中按 false_id 重写该用户的错题明细"""
+    row = cursor.execute('SELECT id FROM User_Profile WHERE name = ?', (name,)).fetchone()
+    if not row:
+        return
+    user_id = row[0]
+    cursor.execute('DELETE FROM wrong_answers WHERE user_id = ?', (user_id,))
+    cursor.executemany('INSERT OR IGNORE INTO wrong_answers (user_id, exam_id, question_num) VALUES (?, ?, ?)',
+                       [(user_id, exam_id, question_num) for exam_id, question_num in wrong_answer_pairs(false_id)])
+
+
+def _cohort_bucket_sql(value: str, width: int) -> str:
+    """分数段编号（向下取整，负的提升值也落在正确的段中）"""
+    return f"(({value}) - ((({value}) % {width}) + {width}) % {width}) / {width}"
+
+
+def _cohort_delta_sql(row: str, sign: int, only_changed: bool = False) -> List[str]:
+    """
+    触发器语句：把一行画像（new 或 old）计入（sign=1）或移出（sign=-1）其班级汇总
+
+    only_changed=True 用于更新触发器，只处理取值或所在班级发生变化的指标。
+    """
+    grade, major = f"coalesce({row}.grade, '')", f"coalesce({row}.major, '')"
+    statements = []
+    for metric, (expr, width) in COHORT_METRICS.items():
+        value = expr.format(row=row)
+        guard = f"{value} IS NOT NULL"
+        if only_changed:
+            guard += f" AND ({expr.format(row='old')} IS NOT {expr.format(row='new')} OR {_COHORT_MOVED_SQL})"
+        statements.append(
+            f"INSERT INTO cohort_stats (grade, major, metric, n, total, total_sq) "
+            f"SELECT {grade}, {major}, '{metric}', {sign}, {sign} * {value}, {sign} * {value} * {value} "
+            f"WHERE {guard} "
+            f"ON CONFLICT (grade, major, metric) DO UPDATE SET n = n + excluded.n, "
+            f"total = total + excluded.total, total_sq = total_sq + excluded.total_sq"
+        )
+        if width:
+            statements.append(
+                f"INSERT INTO cohort_histogram (grade, major, metric, bucket, count) "
+                f"SELECT {grade}, {major}, '{metric}', {_cohort_bucket_sql(value, width)}, {sign} "
+                f"WHERE {guard} "
+                f"ON CONFLICT (grade, major, metric, bucket) DO UPDATE SET count = count + excluded.count"
+            )
+    return statements
+
+
+def _cohort_misses_sql(row: str, sign: int, guard: str = "1") -> str:
+    """触发器语句：把一个学生的全部错题计入或移出其班级的错误人数"""
+    return (
+        f"INSERT INTO cohort_misses (grade, major, exam_id, question_num, misses) "
+        f"SELECT coalesce({row}.grade, ''), coalesce({row}.major, ''), exam_id, question_num, {sign} "
+        f"FROM wrong_answers WHERE user_id = {row}.id AND ({guard}) "
+        f"ON CONFLICT (grade, major, exam_id, question_num) DO UPDATE SET misses = misses + excluded.misses"
+    )
+
+
+def _cohort_answer_sql(row: str, sign: int) -> str:
+    """触发器语句：把一条错题明细计入或移出所属学生的班级"""
+    return (
+        f"INSERT INTO cohort_misses (grade, major, exam_id, question_num, misses) "
+        f"SELECT coalesce(grade, ''), coalesce(major, ''), {row}.exam_id, {row}.question_num, {sign} "
+        f"FROM User_Profile WHERE id = {row}.user_id "
+        f"ON CONFLICT (grade, major, exam_id, question_num) DO UPDATE SET misses = misses + excluded.misses"
+    )
+
+
+def _cohort_triggers() -> Dict[str, str]:
+    """班级汇总的同步触发器：名称 -> 触发器定义"""
+    def body(statements: List[str]) -> str:
+        return "BEGIN\n" + "".join(f"    {statement};\n" for statement in statements) + "END"
+
+    return {
+        "cohort_user_profile_ai": "AFTER INSERT ON User_Profile " + body(
+            _cohort_delta_sql("new", 1) + [_cohort_misses_sql("new", 1)]),
+        "cohort_user_profile_ad": "AFTER DELETE ON User_Profile " + body(
+            _cohort_delta_sql("old", -1) + [_cohort_misses_sql("old", -1)]),
+        # 只有汇总相关的列变化时才更新；换班时错题也一起移到新班级
+        "cohort_user_profile_au": f"AFTER UPDATE OF {', '.join(COHORT_SOURCE_COLUMNS)} ON User_Profile " + body(
+            _cohort_delta_sql("old", -1, only_changed=True) + _cohort_delta_sql("new", 1, only_changed=True)
+            + [_cohort_misses_sql("old", -1, _COHORT_MOVED_SQL), _cohort_misses_sql("new", 1, _COHORT_MOVED_SQL)]),
+        "cohort_wrong_answers_ai": "AFTER INSERT ON wrong_answers " + body([_cohort_answer_sql("new", 1)]),
+        "cohort_wrong_answers_ad": "AFTER DELETE ON wrong_answers " + body([_cohort_answer_sql("old", -1)]),
+        "cohort_wrong_answers_au": "AFTER UPDATE ON wrong_answers " + body(
+            [_cohort_answer_sql("old", -1), _cohort_answer_sql("new", 1)]),
+    }
+
+
+def _cohort_rebuild_queries() -> List[Tuple[str, str, str]]:
+    """由原表重新计算汇总的查询：(表名, 列, SELECT语句)"""
+    grade, major = "coalesce(grade, '')", "coalesce(major, '')"
+    queries = []
+    for metric, (expr, width) in COHORT_METRICS.items():
+        value = expr.format(row="User_Profile")
+        queries.append((
+            "cohort_stats", "grade, major, metric, n, total, total_sq",
+            f"SELECT {grade}, {major}, '{metric}', COUNT(*), SUM({value}), SUM({value} * {value}) "
+            f"FROM User_Profile WHERE {value} IS NOT NULL GROUP BY 1, 2",
+        ))
+        if width:
+            queries.append((
+                "cohort_histogram", "grade, major, metric, bucket, count",
+                f"SELECT {grade}, {major}, '{metric}', {_cohort_bucket_sql(value, width)}, COUNT(*) "
+                f"FROM User_Profile WHERE {value} IS NOT NULL GROUP BY 1, 2, 4",
+            ))
+    queries.append((
+        "cohort_misses", "grade, major, exam_id, question_num, misses",
+        "SELECT coalesce(u.grade, ''), coalesce(u.major, ''), w.exam_id, w.question_num, COUNT(*) "
+        "FROM wrong_answers w JOIN User_Profile u ON u.id = w.user_id GROUP BY 1, 2, 3, 4",
+    ))
+    return queries
+
+
+def create_cohort_tables(cursor):
+    """创建班级汇总表，并按当前定义重建同步触发器"""
+    cursor.execute(WRONG_ANSWERS_TABLE)
+    for ddl in COHORT_TABLES.values():
+        cursor.execute(ddl)
+    for name, definition in _cohort_triggers().items():
+        cursor.execute(f'DROP TRIGGER IF EXISTS {name}')
+        cursor.execute(f'CREATE TRIGGER {name} {definition}')
+
+
+def rebuild_cohort_stats(cursor) -> int:
+    """在当前事务中由用户画像和错题明细全量重算班级汇总（用于修复），返回班级数"""
+    create_cohort_tables(cursor)
+    for table in COHORT_TABLES:
+        cursor.execute(f'DELETE FROM {table}')
+    for table, columns, query in _cohort_rebuild_queries():
+        cursor.execute(f'INSERT INTO {table} ({columns}) {query}')
+    return cursor.execute("SELECT COUNT(*) FROM cohort_stats WHERE metric = 'students'").fetchone()[0]
+
+
+def check_cohort_stats(cursor) -> Dict[str, int]:
+    """比较汇总表与全量重算的结果，返回每个汇总表中不一致的行数（不修改数据）"""
+    expected: Dict[str, Dict[tuple, tuple]] = {table: {} for table in COHORT_TABLES}
+    columns = {}
+    for table, table_columns, query in _cohort_rebuild_queries():
+        columns[table] = table_columns
+        values = COHORT_VALUE_COLUMNS[table]
+        expected[table].update((row[:-values], row[-values:]) for row in cursor.execute(query))
+
+    drift = {}
+    for table, rows in expected.items():
+        values = COHORT_VALUE_COLUMNS[table]
+        # 计数为0的行是学生离开班级后留下的，与不存在等价
+        stored = {row[:-values]: row[-values:]
+                  for row in cursor.execute(f'SELECT {columns[table]} FROM {table}') if row[-values] != 0}
+        drift[table] = sum(1 for key in stored.keys() | rows.keys() if stored.get(key) != rows.get(key))
+    return drift
+
+
+def _coerce_profile_values(user_data: Dict[str, Any]) -> Dict[str, Any]:
+    """写入前把数值列转换为对应类型"""
+    data = dict(user_data)
+    for key in INTEGER_PROFILE_COLUMNS:
+        if key in data:
+            data[key] = to_int_score(data[key])
+    for key in REAL_PROFILE_COLUMNS:
+        if key in data:
+            data[key] = to_real_score(data[key])
+    return data
+
+
+def _create_content_tables(cursor):
+    """创建缺失的内容表"""
+    for ddl in CONTENT_TABLES.values():
+        cursor.execute(ddl)
+
+
+def ensure_content_tables(conn):
+    """确保内容表存在（供批量导入等脚本使用）"""
+    try:
+        _create_content_tables(conn.cursor())
+        conn.commit()
+    except sqlite3.Error as e:
+        logger.error(f"创建内容表错误: {e}")
+        raise
+
+
 def _initialize_database(conn):
     """初始化数据库表"""
     try:
@@ -69,13 +556,8 @@ def _initialize_database(conn):
             cursor.execute('INSERT INTO introduction (content) VALUES (?)', (default_intro,))
             logger.info("已插入默认系统介绍")
         
-        # 创建自评量表 - 确保列名为 content
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS self_rate (
-            id INTEGER PRIMARY KEY,
-            content TEXT NOT NULL
-        )
-        ''')
+        # 创建自评量表、策略量表、试卷表和认知策略表
+        _create_content_tables(cursor)
         
         # 检查是否有数据，没有则插入默认数据
         cursor.execute('SELECT COUNT(*) FROM self_rate')
@@ -107,14 +589,6 @@ def _initialize_database(conn):
             for i, item_text in enumerate(default_items, 1):
                 cursor.execute('INSERT INTO self_rate (id, content) VALUES (?, ?)', (i, item_text))
         
-        # 创建策略量表
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS Strategies (
-            id INTEGER PRIMARY KEY,
-            content TEXT NOT NULL
-        )
-        ''')
-        
         # 检查是否有数据，没有则插入默认数据
         cursor.execute('SELECT COUNT(*) FROM Strategies')
         if cursor.fetchone()[0] == 0:
@@ -136,35 +610,12 @@ def _initialize_database(conn):
             logger.warning(f"删除User_Profile表失败: {e}")
 
         # 创建用户画像表（使用User_Profile代替空格命名）
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS User_Profile (
-            id INTEGER PRIMARY KEY,
-            name TEXT NOT NULL UNIQUE,
-            grade TEXT,
-            major TEXT,
-            gender TEXT,
-            post_score TEXT,
-            after_score TEXT,
-            false_id TEXT,
-            post_strategies_score TEXT,
-            after_strategies_score TEXT,
-            exam1_score TEXT,
-            exam2_score TEXT,
-            exam3_score TEXT,
-            exam4_score TEXT,
-            "Have you taken the CET-4 exam:" TEXT,
-            "CET-4 score" TEXT,
-            "CET-4 reading score" TEXT,
-            "Have you taken the CET-6 exam" TEXT,
-            "CET-6 score" TEXT,
-            "CET-6 reading score" TEXT,
-            "Other English scores for reference" TEXT,
-            "Exam name" TEXT,
-            "Total score" TEXT,
-            "Reading score" TEXT
-        )
-        ''')
+        cursor.execute(USER_PROFILE_TABLE.format(table="User_Profile"))
+        _create_user_profile_indexes(cursor)
         
+        # 表已重建，迁移需要从头重新应用
+        cursor.execute('PRAGMA user_version = 0')
+
         # 提交更改
         conn.commit()
         logger.info("数据库初始化成功")
@@ -174,6 +625,186 @@ def _initialize_database(conn):
         raise
 
 
+def _column_names(cursor, table: str) -> List[str]:
+    """获取表的列名"""
+    cursor.execute(f'PRAGMA table_info("{table}")')
+    return [row[1] for row in cursor.fetchall()]
+
+
+def _migration_profile_timestamps(cursor):
+    """为用户画像增加创建/更新时间，用于按日期筛选导出"""
+    columns = _column_names(cursor, "User_Profile")
+    for column in ("created_at", "updated_at"):
+        if column not in columns:
+            cursor.execute(f'ALTER TABLE User_Profile ADD COLUMN {column} TEXT')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_user_profile_created_at ON User_Profile (created_at)')
+
+
+def _migration_typed_scores(cursor):
+    """把用户画像的分数列从TEXT改为INTEGER/REAL，并创建排名索引"""
+    column_types = {row[1]: row[2].upper() for row in cursor.execute('PRAGMA table_info(User_Profile)')}
+    if column_types.get("post_score") != "INTEGER":
+        conn = cursor.connection
+        conn.create_function("perss_int", 1, to_int_score, deterministic=True)
+        conn.create_function("perss_real", 1, to_real_score, deterministic=True)
+
+        # 记录无法转换的值，避免静默丢失
+        for column in INTEGER_PROFILE_COLUMNS + REAL_PROFILE_COLUMNS:
+            func = "perss_int" if column in INTEGER_PROFILE_COLUMNS else "perss_real"
+            cursor.execute(
+                f'SELECT name, "{column}" FROM User_Profile '
+                f'WHERE "{column}" IS NOT NULL AND trim("{column}") != \'\' AND {func}("{column}") IS NULL'
+            )
+            for name, value in cursor.fetchall():
+                logger.warning(f"用户 {name} 的 {column} 值无法转换为数字，将置空: {value!r}")
+
+        old_columns = set(column_types)
+        cursor.execute('DROP TABLE IF EXISTS User_Profile_new')
+        cursor.execute(USER_PROFILE_TABLE.format(table="User_Profile_new"))
+        target_columns = [c for c in _column_names(cursor, "User_Profile_new") if c in old_columns]
+        select_list = []
+        for column in target_columns:
+            if column in INTEGER_PROFILE_COLUMNS:
+                select_list.append(f'perss_int("{column}")')
+            elif column in REAL_PROFILE_COLUMNS:
+                select_list.append(f'perss_real("{column}")')
+            else:
+                select_list.append(f'"{column}"')
+        column_sql = ", ".join(f'"{c}"' for c in target_columns)
+        cursor.execute(
+            f'INSERT INTO User_Profile_new ({column_sql}) SELECT {", ".join(select_list)} FROM User_Profile'
+        )
+        cursor.execute('DROP TABLE User_Profile')
+        cursor.execute('ALTER TABLE User_Profile_new RENAME TO User_Profile')
+    _create_user_profile_indexes(cursor)
+
+
+def _create_search_indexes(cursor, rebuild: bool = False):
+    """创建全文检索索引和同步触发器，rebuild=True 时按原表重建索引内容"""
+    _create_content_tables(cursor)
+    for ddl, triggers, rebuild_sql in SEARCH_INDEXES.values():
+        cursor.execute(ddl)
+        for trigger in triggers:
+            cursor.execute(trigger)
+        if rebuild:
+            for sql in rebuild_sql:
+                cursor.execute(sql)
+
+
+def _migration_search_indexes(cursor):
+    """为试卷、阅读策略和认知策略建立FTS5全文检索索引"""
+    _create_search_indexes(cursor, rebuild=True)
+
+
+def _migration_events(cursor):
+    """增加学习行为事件表，记录逐题作答、页面停留和对话等过程数据"""
+    cursor.execute(EVENTS_TABLE)
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_events_name_ts ON events (name, ts)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_events_type_ts ON events (type, ts)')
+
+
+def _migration_content_version(cursor):
+    """增加内容版本表，静态内容表的增删改由触发器递增版本号"""
+    cursor.execute(CONTENT_META_TABLE)
+    cursor.execute("INSERT OR IGNORE INTO content_meta (key, version) VALUES ('content', 1)")
+    existing = {row[0] for row in cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    for table in CONTENT_VERSIONED_TABLES:
+        if table not in existing:
+            continue
+        for suffix, event in (("ai", "INSERT"), ("au", "UPDATE"), ("ad", "DELETE")):
+            cursor.execute(
+                f'CREATE TRIGGER IF NOT EXISTS "{table}_content_version_{suffix}" AFTER {event} ON "{table}" BEGIN '
+                f"UPDATE content_meta SET version = version + 1 WHERE key = 'content'; END"
+            )
+
+
+def _migration_content_updated_at(cursor):
+    """为内容版本增加更新时间，用于HTTP Last-Modified"""
+    if "updated_at" not in _column_names(cursor, "content_meta"):
+        cursor.execute('ALTER TABLE content_meta ADD COLUMN updated_at TEXT')
+    cursor.execute("UPDATE content_meta SET updated_at = CURRENT_TIMESTAMP WHERE updated_at IS NULL")
+    existing = {row[0] for row in cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    for table in CONTENT_VERSIONED_TABLES:
+        if table not in existing:
+            continue
+        for suffix, event in (("ai", "INSERT"), ("au", "UPDATE"), ("ad", "DELETE")):
+            cursor.execute(f'DROP TRIGGER IF EXISTS "{table}_content_version_{suffix}"')
+            cursor.execute(
+                f'CREATE TRIGGER "{table}_content_version_{suffix}" AFTER {event} ON "{table}" BEGIN '
+                f"UPDATE content_meta SET version = version + 1, updated_at = CURRENT_TIMESTAMP "
+                f"WHERE key = 'content'; END"
+            )
+
+
+def _migration_idempotency_keys(cursor):
+    """增加幂等键表，保存提交接口的首次响应"""
+    cursor.execute(IDEMPOTENCY_TABLE)
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_idempotency_keys_created_at ON idempotency_keys (created_at)')
+
+
+def _migration_dashboard(cursor):
+    """增加错题明细表并由已有 false_id 回填，创建教师端名单和班级汇总索引"""
+    cursor.execute(WRONG_ANSWERS_TABLE)
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_wrong_answers_question ON wrong_answers (exam_id, question_num)')
+    cursor.execute('DELETE FROM wrong_answers')
+    rows = cursor.execute("SELECT id, false_id FROM User_Profile WHERE false_id IS NOT NULL AND false_id != ''").fetchall()
+    cursor.executemany('INSERT OR IGNORE INTO wrong_answers (user_id, exam_id, question_num) VALUES (?, ?, ?)',
+                       [(user_id, exam_id, question_num)
+                        for user_id, false_id in rows
+                        for exam_id, question_num in wrong_answer_pairs(false_id)])
+    _create_user_profile_indexes(cursor)
+
+
+def _migration_cohort_stats(cursor):
+    """增加由触发器增量维护的班级汇总表，并由已有数据计算初值"""
+    rebuild_cohort_stats(cursor)
+
+
+# 结构迁移列表：(版本号, 迁移函数)，已应用的版本记录在 PRAGMA user_version 中
+_MIGRATIONS = [
+    (1, _migration_profile_timestamps),
+    (2, _migration_typed_scores),
+    (3, _migration_search_indexes),
+    (4, _migration_events),
+    (5, _migration_content_version),
+    (6, _migration_content_updated_at),
+    (7, _migration_idempotency_keys),
+    (8, _migration_dashboard),
+    (9, _migration_cohort_stats),
+]
+
+
+def _migrate_database(conn):
+    """按顺序应用尚未执行的结构迁移"""
+    cursor = conn.cursor()
+    try:
+        version = cursor.execute('PRAGMA user_version').fetchone()[0]
+        if version >= _MIGRATIONS[-1][0]:
+            return
+
+        # 加写锁后重新读取版本，避免多个进程重复迁移
+        cursor.execute('BEGIN IMMEDIATE')
+        version = cursor.execute('PRAGMA user_version').fetchone()[0]
+        for target, migration in _MIGRATIONS:
+            if version < target:
+                logger.info(f"应用数据库迁移 {target}: {migration.__doc__}")
+                migration(cursor)
+                version = target
+        cursor.execute(f'PRAGMA user_version = {version}')
+        conn.commit()
+        logger.info(f"数据库结构已更新到版本 {version}")
+    except sqlite3.Error as e:
+        conn.rollback()
+        logger.error(f"数据库迁移错误: {e}")
+        raise
+
+
+def migrate_database():
+    """执行数据库结构迁移（供启动脚本在启动服务前调用）"""
+    conn = get_db_connection()
+    conn.close()
+
+
 def get_introduction() -> str:
     """获取系统介绍内容"""
     logger.info("获取系统介绍")
@@ -214,7 +845,7 @@ def get_self_rate_items() -> List[Dict[str, Any]]:
         if not result:
             logger.warning("从数据库获取的 self_rate_items 为空列表")
         else:
-            logger.info(f"第一个获取到的 self_rate item: {result[0]}") 
+            logger.debug("第一个获取到的 self_rate item: %s", result[0])
             
         return result
     except sqlite3.Error as e:
@@ -290,6 +921,123 @@ def get_exam_by_id(exam_id: int) -> Dict[str, Any]:
         return {}
 
 
+def _read_content_version(cursor) -> int:
+    """读取当前内容版本"""
+    row = cursor.execute("SELECT version FROM content_meta WHERE key = 'content'").fetchone()
+    return row[0] if row else 0
+
+
+def get_content_version() -> int:
+    """获取当前内容版本，内容表每次变化后递增"""
+    conn = get_db_connection()
+    try:
+        return _read_content_version(conn.cursor())
+    finally:
+        conn.close()
+
+
+def get_content_state() -> Tuple[int, Optional[str]]:
+    """获取内容版本和最后更新时间（UTC，'YYYY-MM-DD HH:MM:SS'）"""
+    conn = get_db_connection()
+    try:
+        row = conn.execute("SELECT version, updated_at FROM content_meta WHERE key = 'content'").fetchone()
+        return (row["version"], row["updated_at"]) if row else (0, None)
+    finally:
+        conn.close()
+
+
+def get_bootstrap_content(exam_ids: Tuple[int, ...]) -> Dict[str, Any]:
+    """
+    一次读取计划阶段需要的全部静态内容：系统介绍、自评量表、策略量表和试卷（不含答案）
+
+    所有查询在同一个读事务中执行，保证内容和版本号来自同一快照。
+    """
+    conn = get_db_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute('BEGIN')
+        version = _read_content_version(cursor)
+
+        row = cursor.execute('SELECT content FROM introduction LIMIT 1').fetchone()
+        introduction = row["content"] if row and row["content"] else "同学你好！欢迎使用英语阅读个性化学习支持系统。"
+
+        self_rate_items = [{"id": r["id"], "content": r["content"]}
+                           for r in cursor.execute('SELECT id, content FROM self_rate ORDER BY id')]
+        strategy_items = [{"id": r["id"], "content": r["content"]}
+                          for r in cursor.execute('SELECT id, content FROM Strategies ORDER BY id')]
+
+        exams = []
+        placeholders = ", ".join("?" for _ in exam_ids)
+        for r in cursor.execute(f'SELECT * FROM exam WHERE id IN ({placeholders}) ORDER BY id', exam_ids):
+            questions = [{"number": i, "question": r[f"t{i}"]} for i in range(1, 6) if r[f"t{i}"]]
+            exams.append({"exam_id": r["id"], "content": r["content"], "questions": questions})
+        conn.rollback()
+
+        return {
+            "content_version": version,
+            "introduction": introduction,
+            "self_rate_items": self_rate_items,
+            "strategies": strategy_items,
+            "exams": exams,
+        }
+    finally:
+        conn.close()
+
+
+def _insert_user_profile(cursor, user_data: Dict[str, Any]):
+    """在当前事务中插入用户画像"""
+    # 构建列和值
+    columns = []
+    values = []
+    placeholders = []
+    
+    for key, value in _coerce_profile_values(user_data).items():
+        columns.append(f'"{key}"')
+        values.append(value)
+        placeholders.append('?')
+    
+    # 记录创建和更新时间（UTC）
+    columns.extend(['created_at', 'updated_at'])
+    placeholders.extend(['CURRENT_TIMESTAMP', 'CURRENT_TIMESTAMP'])
+
+    # 执行插入
+    query = f'INSERT INTO User_Profile ({", ".join(columns)}) VALUES ({", ".join(placeholders)})'
+    cursor.execute(query, values)
+    if user_data.get("false_id"):
+        _sync_wrong_answers(cursor, user_data["name"], user_data["false_id"])
+
+
+def _update_user_profile(cursor, user_data: Dict[str, Any]):
+    """在当前事务中更新已存在的用户画像"""
+    set_clause = []
+    values = []
+    
+    for key, value in _coerce_profile_values(user_data).items():
+        if key != "name":  # 不更新name字段
+            set_clause.append(f'"{key}" = ?')
+            values.append(value)
+    
+    set_clause.append('updated_at = CURRENT_TIMESTAMP')
+
+    # 添加WHERE条件
+    values.append(user_data["name"])
+    
+    # 执行更新
+    query = f'UPDATE User_Profile SET {", ".join(set_clause)} WHERE name = ?'
+    cursor.execute(query, values)
+    if "false_id" in user_data:
+        _sync_wrong_answers(cursor, user_data["name"], user_data["false_id"])
+
+
+def _fetch_user_profile(cursor, name: str) -> Dict[str, Any]:
+    """在当前事务中读取用户画像，不存在时返回空字典"""
+    cursor.execute('SELECT * FROM User_Profile WHERE name = ?', (name,))
+    row = cursor.fetchone()
+    if not row:
+        return {}
+    return {key: row[key] for key in row.keys()}
+
+
 def create_user_profile(user_data: Dict[str, Any]) -> bool:
     """创建用户画像"""
     logger.info(f"创建用户画像: {user_data.get('name', '未知用户')}")
@@ -304,19 +1052,7 @@ def create_user_profile(user_data: Dict[str, Any]) -> bool:
             conn.close()
             return False
         
-        # 构建列和值
-        columns = []
-        values = []
-        placeholders = []
-        
-        for key, value in user_data.items():
-            columns.append(f'"{key}"')
-            values.append(value)
-            placeholders.append('?')
-        
-        # 执行插入
-        query = f'INSERT INTO User_Profile ({", ".join(columns)}) VALUES ({", ".join(placeholders)})'
-        cursor.execute(query, values)
+        _insert_user_profile(cursor, user_data)
         conn.commit()
         conn.close()
         return True
@@ -340,7 +1076,7 @@ def update_user_profile(user_data: Dict[str, Any]) -> bool:
             return False
         
         # 检查用户是否存在
-        cursor.execute('SELECT * FROM User_Profile WHERE name = ?', (name,))
+        cursor.execute('SELECT 1 FROM User_Profile WHERE name = ?', (name,))
         user = cursor.fetchone()
         
         if not user:
@@ -349,20 +1085,7 @@ def update_user_profile(user_data: Dict[str, Any]) -> bool:
             return create_user_profile(user_data)
         
         # 用户存在，更新用户数据
-        set_clause = []
-        values = []
-        
-        for key, value in user_data.items():
-            if key != "name":  # 不更新name字段
-                set_clause.append(f'"{key}" = ?')
-                values.append(value)
-        
-        # 添加WHERE条件
-        values.append(name)
-        
-        # 执行更新
-        query = f'UPDATE User_Profile SET {", ".join(set_clause)} WHERE name = ?'
-        cursor.execute(query, values)
+        _update_user_profile(cursor, user_data)
         conn.commit()
         conn.close()
         return True
@@ -371,6 +1094,141 @@ def update_user_profile(user_data: Dict[str, Any]) -> bool:
         return False
 
 
+# 试卷与前后测总分的对应关系：试卷ID -> (总分列, 同组另一套试卷ID)
+EXAM_SCORE_PAIRS = {
+    1: ("post_score", 2),   # 前测1
+    2: ("post_score", 1),   # 前测2
+    3: ("after_score", 4),  # 后测1
+    4: ("after_score", 3),  # 后测2
+}
+# 需要记录错题的试卷（前测）
+EXAMS_WITH_WRONG_IDS = (1, 2)
+
+
+class ExamAlreadyRecordedError(ValueError):
+    """学生的这套试卷已经有成绩，不能再次提交"""
+
+
+def merge_false_ids(existing: Optional[str], wrong_questions: List[str]) -> str:
+    """合并已有错题ID和本次错题ID，去重后排序"""
+    all_false_ids = set()
+    if existing:
+        all_false_ids.update(item.strip() for item in existing.split(',') if item.strip())
+    all_false_ids.update(item.strip() for item in wrong_questions if item and item.strip())
+    return ",".join(sorted(all_false_ids))
+
+
+def apply_exam_result(cursor, name: str, exam_id: int, score: int, wrong_questions: List[str],
+                      overwrite: bool = True) -> Dict[str, Any]:
+    """
+    在当前事务中记录一次试卷提交
+
+    读取用户画像、计算单卷分数和前/后测总分、合并错题ID并写回，
+    读和写在同一事务内完成。返回写入的字段。
+    overwrite 为 False 时只记录首次成绩，该试卷已有成绩时抛出 ExamAlreadyRecordedError。
+    """
+    profile = _fetch_user_profile(cursor, name)
+    if not overwrite and exam_id in EXAM_SCORE_PAIRS and profile.get(f"exam{exam_id}_score") is not None:
+        raise ExamAlreadyRecordedError(f"用户{name}的试卷{exam_id}已经提交过，成绩以首次提交为准")
+    data: Dict[str, Any] = {"name": name}
+
+    if exam_id in EXAM_SCORE_PAIRS:
+        total_key, other_exam_id = EXAM_SCORE_PAIRS[exam_id]
+        data[f"exam{exam_id}_score"] = score
+        data[total_key] = score + (profile.get(f"exam{other_exam_id}_score") or 0)
+
+    if exam_id in EXAMS_WITH_WRONG_IDS:
+        data["false_id"] = merge_false_ids(profile.get("false_id"), wrong_questions)
+
+    if profile:
+        _update_user_profile(cursor, data)
+    else:
+        _insert_user_profile(cursor, data)
+    return data
+
+
+def apply_exam_results(cursor, results: List[Dict[str, Any]]) -> int:
+    """
+    在当前事务中记录一批试卷成绩（批量阅卷），跳过阅卷失败的条目，返回记录条数
+
+    同一学生的多套试卷按顺序依次写入，前测/后测总分按已写入的单卷分数计算。
+    """
+    recorded = 0
+    for result in results:
+        if not result.get("success"):
+            continue
+        apply_exam_result(cursor, result["name"], result["exam_id"], result["score"], result["wrong_questions"])
+        recorded += 1
+    return recorded
+
+
+def apply_strategy_result(cursor, name: str, score: int, is_pre_test: bool) -> Dict[str, Any]:
+    """在当前事务中记录一次策略问卷得分，返回写入的字段"""
+    key = "post_strategies_score" if is_pre_test else "after_strategies_score"
+    data = {"name": name, key: score}
+    cursor.execute('SELECT 1 FROM User_Profile WHERE name = ?', (name,))
+    if cursor.fetchone():
+        _update_user_profile(cursor, data)
+    else:
+        _insert_user_profile(cursor, data)
+    return data
+
+
+def insert_user_profile(cursor, user_data: Dict[str, Any]) -> bool:
+    """在当前事务中创建用户画像，用户名为空或已存在时返回 False"""
+    if not user_data.get("name"):
+        logger.warning("用户名不能为空")
+        return False
+    try:
+        _insert_user_profile(cursor, user_data)
+    except sqlite3.IntegrityError as e:
+        logger.warning(f"创建用户画像失败: {e}")
+        return False
+    return True
+
+
+def get_idempotent_response(cursor, endpoint: str, key: str, not_before: float) -> Optional[Tuple[str, str]]:
+    """读取未过期的幂等键记录，返回 (请求摘要, 响应JSON)，不存在时返回 None"""
+    row = cursor.execute(
+        'SELECT request_hash, response FROM idempotency_keys WHERE endpoint = ? AND key = ? AND created_at >= ?',
+        (endpoint, key, not_before),
+    ).fetchone()
+    return (row[0], row[1]) if row else None
+
+
+def save_idempotent_response(cursor, endpoint: str, key: str, request_hash: str, response: str, created_at: float):
+    """在当前事务中保存幂等键的首次响应，覆盖同一键已过期的记录"""
+    cursor.execute(
+        'INSERT OR REPLACE INTO idempotency_keys (endpoint, key, request_hash, response, created_at) '
+        'VALUES (?, ?, ?, ?, ?)',
+        (endpoint, key, request_hash, response, created_at),
+    )
+
+
+def insert_events(cursor, rows: List[Tuple]) -> int:
+    """在当前事务中批量写入事件，每行按 EVENT_COLUMNS 的顺序排列，返回写入条数"""
+    placeholders = ", ".join("?" for _ in EVENT_COLUMNS)
+    cursor.executemany(f'INSERT INTO events ({", ".join(EVENT_COLUMNS)}) VALUES ({placeholders})', rows)
+    return len(rows)
+
+
+def run_in_transaction(operation: Callable[[sqlite3.Cursor], Any]) -> Any:
+    """在单独的连接和事务中执行一个写操作并提交"""
+    conn = get_db_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute('BEGIN IMMEDIATE')
+        try:
+            result = operation(cursor)
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        return result
+    finally:
+        conn.close()
+
+
 def get_user_profile(name: str) -> Dict[str, Any]:
     """获取用户画像"""
     logger.info(f"获取用户画像: {name}")
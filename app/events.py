@@ -0,0 +1,131 @@
+"""学习行为事件模块：解析客户端批量上报的NDJSON事件"""
+import json
+import logging
+import math
+import re
+import time
+import zlib
+from typing import Any, Dict, List, Optional, Tuple
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+# 单次上报的限制：请求体（压缩前后）字节数和事件条数
+MAX_BODY_BYTES = 1024 * 1024
+MAX_BATCH_EVENTS = 1000
+# 文本字段和 data 字段的最大长度
+MAX_FIELD_LENGTH = 64
+MAX_DATA_LENGTH = 4096
+# 响应中最多返回的错误条数
+MAX_REPORTED_ERRORS = 10
+# ts 的上限（不含）：JavaScript 能精确表示的最大整数，超出的值也无法存为SQLite整数
+MAX_EVENT_TS = 2 ** 53
+
+_TYPE_PATTERN = re.compile(r"^[A-Za-z0-9_.:-]{1,64}$")
+_TEXT_FIELDS = ("name", "session", "page", "item")
+_GZIP_MAGIC = b"\x1f\x8b"
+
+
+class EventBatchError(ValueError):
+    """整批事件无法解析"""
+
+    def __init__(self, message: str, status_code: int = 400):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class EventError(ValueError):
+    """单条事件校验失败"""
+
+
+def decode_body(body: bytes, content_encoding: Optional[str] = None) -> str:
+    """
+    解码请求体，支持gzip
+
+    navigator.sendBeacon 无法设置 Content-Encoding，所以除了请求头，
+    也按gzip文件头识别压缩内容。解压时限制输出大小，防止压缩炸弹。
+    """
+    if (content_encoding or "").lower() == "gzip" or body[:2] == _GZIP_MAGIC:
+        decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        try:
+            body = decompressor.decompress(body, MAX_BODY_BYTES + 1)
+        except zlib.error as e:
+            raise EventBatchError(f"gzip解压失败: {e}")
+        if len(body) > MAX_BODY_BYTES or decompressor.unconsumed_tail:
+            raise EventBatchError(f"解压后的请求体超过 {MAX_BODY_BYTES} 字节", status_code=413)
+    try:
+        return body.decode("utf-8")
+    except UnicodeDecodeError:
+        raise EventBatchError("请求体必须是UTF-8编码的NDJSON")
+
+
+def _text(event: Dict[str, Any], key: str) -> Optional[str]:
+    """读取可选的短文本字段，数字按字符串保存"""
+    value = event.get(key)
+    if value is None or value == "":
+        return None
+    if isinstance(value, bool) or not isinstance(value, (str, int)):
+        raise EventError(f"{key} 必须是字符串")
+    value = str(value)
+    if len(value) > MAX_FIELD_LENGTH:
+        raise EventError(f"{key} 超过 {MAX_FIELD_LENGTH} 个字符")
+    return value
+
+
+def validate_event(event: Any, received_at: int) -> Tuple:
+    """校验单条事件，返回与 EVENT_COLUMNS 顺序一致的元组"""
+    if not isinstance(event, dict):
+        raise EventError("每行必须是一个JSON对象")
+
+    event_type = event.get("type")
+    if not isinstance(event_type, str) or not _TYPE_PATTERN.match(event_type):
+        raise EventError("type 必须是1-64位的字母、数字或 _.:-")
+
+    ts = event.get("ts", received_at)
+    if (isinstance(ts, bool) or not isinstance(ts, (int, float)) or not math.isfinite(ts)
+            or not 0 < ts < MAX_EVENT_TS):
+        raise EventError("ts 必须是毫秒级时间戳")
+
+    value = event.get("value")
+    if value is not None and (isinstance(value, bool) or not isinstance(value, (int, float))
+                              or not math.isfinite(value)):
+        raise EventError("value 必须是数字")
+
+    data = event.get("data")
+    if data is not None:
+        if not isinstance(data, (dict, list)):
+            raise EventError("data 必须是对象或数组")
+        data = json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+        if len(data) > MAX_DATA_LENGTH:
+            raise EventError(f"data 超过 {MAX_DATA_LENGTH} 个字符")
+
+    name, session, page, item = (_text(event, key) for key in _TEXT_FIELDS)
+    return (int(ts), received_at, name, session, event_type, page, item, value, data)
+
+
+def parse_event_batch(text: str) -> Tuple[List[Tuple], int, List[str]]:
+    """
+    解析一批NDJSON事件
+
+    无效行被跳过，返回 (有效行, 无效行数, 前几条错误信息)。
+    """
+    received_at = int(time.time() * 1000)
+    rows: List[Tuple] = []
+    errors: List[str] = []
+    rejected = 0
+    lines = [line for line in text.splitlines() if line.strip()]
+    if len(lines) > MAX_BATCH_EVENTS:
+        raise EventBatchError(f"单次最多上报 {MAX_BATCH_EVENTS} 条事件", status_code=413)
+
+    for line_no, line in enumerate(lines, 1):
+        try:
+            try:
+                event = json.loads(line)
+            except json.JSONDecodeError as e:
+                raise EventError(f"JSON解析失败: {e.msg}")
+            rows.append(validate_event(event, received_at))
+        except EventError as e:
+            rejected += 1
+            if len(errors) < MAX_REPORTED_ERRORS:
+                errors.append(f"第{line_no}行: {e}")
+    return rows, rejected, errors
@@ -0,0 +1,163 @@
+"""学习结果导出模块，按批次流式读取用户画像并编码为CSV或NDJSON"""
+import csv
+import io
+import json
+import logging
+from datetime import date, datetime, timedelta
+from typing import Any, Iterator, List, Optional, Tuple
+
+from app.database import get_db_connection
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+# 导出字段：(数据库列名, 导出字段名)
+EXPORT_COLUMNS: List[Tuple[str, str]] = [
+    ("name", "name"),
+    ("grade", "grade"),
+    ("major", "major"),
+    ("gender", "gender"),
+    ("Have you taken the CET-4 exam:", "cet4_taken"),
+    ("CET-4 score", "cet4_score"),
+    ("CET-4 reading score", "cet4_reading_score"),
+    ("Have you taken the CET-6 exam", "cet6_taken"),
+    ("CET-6 score", "cet6_score"),
+    ("CET-6 reading score", "cet6_reading_score"),
+    ("Other English scores for reference", "other_scores"),
+    ("Exam name", "exam_name"),
+    ("Total score", "total_score"),
+    ("Reading score", "reading_score"),
+    ("exam1_score", "exam1_score"),
+    ("exam2_score", "exam2_score"),
+    ("exam3_score", "exam3_score"),
+    ("exam4_score", "exam4_score"),
+    ("post_score", "pre_test_score"),
+    ("after_score", "post_test_score"),
+    ("post_strategies_score", "pre_strategies_score"),
+    ("after_strategies_score", "post_strategies_score"),
+    ("false_id", "wrong_questions"),
+    ("created_at", "created_at"),
+    ("updated_at", "updated_at"),
+]
+EXPORT_FIELDS = [field for _, field in EXPORT_COLUMNS]
+
+# 每次从游标取出的行数，同时也是每个输出块包含的行数
+DEFAULT_CHUNK_SIZE = 500
+
+
+def parse_date_bound(value: Optional[str], upper: bool = False) -> Optional[str]:
+    """
+    解析日期筛选条件，返回与 created_at（UTC，'YYYY-MM-DD HH:MM:SS'）可比较的字符串
+
+    只给出日期的上界按整天计算，例如 until=2025-06-30 包含6月30日全天。
+    """
+    if not value:
+        return None
+    try:
+        if len(value) == 10:
+            day = date.fromisoformat(value)
+            if upper:
+                day += timedelta(days=1)
+            return f"{day.isoformat()} 00:00:00"
+        return datetime.fromisoformat(value).strftime("%Y-%m-%d %H:%M:%S")
+    except ValueError:
+        raise ValueError(f"日期格式无效: {value}，应为 YYYY-MM-DD 或 YYYY-MM-DDTHH:MM:SS")
+
+
+def build_export_query(grade: Optional[str] = None, major: Optional[str] = None,
+                       since: Optional[str] = None, until: Optional[str] = None) -> Tuple[str, List[Any]]:
+    """构造导出查询，筛选条件全部下推到SQL"""
+    conditions = []
+    params: List[Any] = []
+    if grade:
+        conditions.append("grade = ?")
+        params.append(grade)
+    if major:
+        conditions.append("major = ?")
+        params.append(major)
+    since_bound = parse_date_bound(since)
+    if since_bound:
+        conditions.append("created_at >= ?")
+        params.append(since_bound)
+    until_bound = parse_date_bound(until, upper=True)
+    if until_bound:
+        # 只给日期时上界为次日零点，因此用严格小于
+        conditions.append("created_at < ?" if until and len(until) == 10 else "created_at <= ?")
+        params.append(until_bound)
+
+    columns = ", ".join(f'"{column}"' for column, _ in EXPORT_COLUMNS)
+    query = f"SELECT {columns} FROM User_Profile"
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    query += " ORDER BY id"
+    return query, params
+
+
+def iter_profile_rows(grade: Optional[str] = None, major: Optional[str] = None,
+                      since: Optional[str] = None, until: Optional[str] = None,
+                      chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[List[tuple]]:
+    """
+    按批次读取用户画像，每次产出一批原始行
+
+    游标逐批取数，内存中最多只有一批数据。StreamingResponse 会在线程池的
+    不同线程中推进生成器，所以连接需要关闭同线程检查。
+    """
+    query, params = build_export_query(grade, major, since, until)
+    conn = get_db_connection(check_same_thread=False)
+    conn.row_factory = None  # 导出只需要元组，省去sqlite3.Row的开销
+    try:
+        cursor = conn.execute(query, params)
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            yield rows
+    finally:
+        conn.close()
+
+
+def _wrong_questions(value: Optional[str]) -> List[str]:
+    """把逗号分隔的错题ID拆成列表"""
+    if not value:
+        return []
+    return [item.strip() for item in value.split(",") if item.strip()]
+
+
+def encode_csv(chunks: Iterator[List[tuple]], with_bom: bool = True) -> Iterator[str]:
+    """把行批次编码为CSV文本块（默认带BOM，方便Excel识别UTF-8中文）"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_FIELDS)
+    header = buffer.getvalue()
+    yield ("\ufeff" + header) if with_bom else header
+
+    for rows in chunks:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(rows)
+        yield buffer.getvalue()
+
+
+def encode_ndjson(chunks: Iterator[List[tuple]]) -> Iterator[str]:
+    """把行批次编码为NDJSON文本块，错题ID输出为列表"""
+    wrong_index = EXPORT_FIELDS.index("wrong_questions")
+    for rows in chunks:
+        lines = []
+        for row in rows:
+            record = dict(zip(EXPORT_FIELDS, row))
+            record["wrong_questions"] = _wrong_questions(row[wrong_index])
+            lines.append(json.dumps(record, ensure_ascii=False))
+        lines.append("")
+        yield "\n".join(lines)
+
+
+EXPORT_FORMATS = {
+    "csv": (encode_csv, "text/csv", "csv"),
+    "ndjson": (encode_ndjson, "application/x-ndjson", "ndjson"),
+}
+
+
+def stream_export(fmt: str, **filters: Any) -> Iterator[str]:
+    """按格式生成导出内容"""
+    encoder = EXPORT_FORMATS[fmt][0]
+    return encoder(iter_profile_rows(**filters))
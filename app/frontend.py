@@ -0,0 +1,133 @@
+"""前端静态文件：由后端直接提供构建好的 frontend/dist"""
+import gzip
+import logging
+import os
+import re
+from mimetypes import guess_type
+from pathlib import Path
+
+from starlette.datastructures import Headers
+from starlette.exceptions import HTTPException
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import NotModifiedResponse, StaticFiles
+from starlette.types import Scope
+
+from app.config import (
+    API_PREFIX,
+    FRONTEND_ASSET_CACHE_CONTROL,
+    FRONTEND_FILE_CACHE_CONTROL,
+    FRONTEND_INDEX_CACHE_CONTROL,
+)
+from app.response_store import GZIP_LEVEL, BROTLI_QUALITY, MIN_COMPRESS_BYTES, brotli, choose_encoding
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+# 构建产物的文件名带内容哈希（如 static/js/app.3f2a1b7c.js），内容变化时文件名随之变化
+HASHED_ASSET = re.compile(r"\.[0-9a-f]{8,}\.[A-Za-z0-9]+$")
+# 预压缩文件的扩展名
+PRECOMPRESSED_SUFFIXES = {"br": ".br", "gzip": ".gz"}
+# 值得预压缩的文件类型，图片和字体本身已压缩
+COMPRESSIBLE_EXTENSIONS = {".html", ".js", ".css", ".json", ".svg", ".txt", ".map", ".ico", ".webmanifest"}
+
+
+class FrontendStaticFiles(StaticFiles):
+    """
+    单页应用的静态文件
+
+    - 带哈希的资源长期缓存（immutable），index.html 每次都重新校验；
+    - 存在 .br/.gz 预压缩文件且客户端支持时直接返回压缩文件；
+    - 找不到的前端路由（如 /planning）返回 index.html，由前端路由处理。
+    """
+
+    def __init__(self, directory: str):
+        super().__init__(directory=directory, html=True)
+
+    async def get_response(self, path: str, scope: Scope) -> Response:
+        try:
+            return await super().get_response(path, scope)
+        except HTTPException as exc:
+            if exc.status_code != 404 or not _is_client_route(path):
+                raise
+        full_path, stat_result = self.lookup_path("index.html")
+        if stat_result is None:
+            raise HTTPException(status_code=404)
+        return self.file_response(full_path, stat_result, scope)
+
+    def file_response(self, full_path, stat_result: os.stat_result, scope: Scope, status_code: int = 200) -> Response:
+        request_headers = Headers(scope=scope)
+        full_path = str(full_path)
+        headers = {"Cache-Control": _cache_control(full_path)}
+
+        served_path, served_stat, encoding = full_path, stat_result, "identity"
+        available = _precompressed_variants(full_path, stat_result)
+        if available:
+            headers["Vary"] = "Accept-Encoding"
+            encoding = choose_encoding(request_headers.get("accept-encoding"), available)
+            if encoding != "identity":
+                served_path, served_stat = available[encoding]
+                headers["Content-Encoding"] = encoding
+
+        # 按原文件确定类型；ETag 按实际返回的文件计算，各编码互不相同
+        response = FileResponse(
+            served_path,
+            status_code=status_code,
+            headers=headers,
+            media_type=guess_type(full_path)[0] or "text/plain",
+            stat_result=served_stat,
+            method=scope["method"],
+        )
+        if self.is_not_modified(response.headers, request_headers):
+            return NotModifiedResponse(response.headers)
+        return response
+
+
+def _is_client_route(path: str) -> bool:
+    """没有扩展名、又不是API的路径视为前端路由"""
+    path = path.replace(os.sep, "/")
+    if path == API_PREFIX.strip("/") or path.startswith(API_PREFIX.strip("/") + "/"):
+        return False
+    return "." not in path.rsplit("/", 1)[-1]
+
+
+def _cache_control(full_path: str) -> str:
+    name = os.path.basename(full_path)
+    if name.endswith(".html"):
+        return FRONTEND_INDEX_CACHE_CONTROL
+    if HASHED_ASSET.search(name):
+        return FRONTEND_ASSET_CACHE_CONTROL
+    return FRONTEND_FILE_CACHE_CONTROL
+
+
+def _precompressed_variants(full_path: str, stat_result: os.stat_result):
+    """返回 编码 -> (文件路径, stat)，只使用不比原文件旧的预压缩文件"""
+    variants = {}
+    for encoding, suffix in PRECOMPRESSED_SUFFIXES.items():
+        try:
+            variant_stat = os.stat(full_path + suffix)
+        except OSError:
+            continue
+        if variant_stat.st_mtime >= stat_result.st_mtime:
+            variants[encoding] = (full_path + suffix, variant_stat)
+    return variants
+
+
+def precompress_directory(directory: str) -> int:
+    """为构建产物生成 .gz（安装了brotli时还有 .br）预压缩文件，返回生成的文件数"""
+    created = 0
+    for path in Path(directory).rglob("*"):
+        if not path.is_file() or path.suffix not in COMPRESSIBLE_EXTENSIONS:
+            continue
+        body = path.read_bytes()
+        if len(body) < MIN_COMPRESS_BYTES:
+            continue
+        outputs = {".gz": gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)}
+        if brotli is not None:
+            outputs[".br"] = brotli.compress(body, quality=BROTLI_QUALITY)
+        for suffix, compressed in outputs.items():
+            # 压缩后反而更大的文件不保留
+            if len(compressed) < len(body):
+                Path(str(path) + suffix).write_bytes(compressed)
+                created += 1
+    logger.info(f"已为 {directory} 生成 {created} 个预压缩文件")
+    return created
@@ -0,0 +1,352 @@
+"""阅卷模块：在服务器端按参考答案批改试卷，支持选择题和主观题的模糊匹配"""
+import csv
+import io
+import logging
+import re
+import threading
+import unicodedata
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.config import EXAM_QUESTION_POINTS, GRADING_SIMILARITY_THRESHOLD, GRADING_OPTION_THRESHOLD
+from app.database import get_exam_by_id
+from app.http_cache import content_state
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+# 每套试卷的最大题数，与试卷表的 t1..t5 / a1..a5 列对应
+MAX_QUESTIONS = 5
+# 单次批量阅卷最多的答卷数
+MAX_BATCH_SUBMISSIONS = 2000
+# 单个作答的最大字符数
+MAX_ANSWER_LENGTH = 1000
+
+STOPWORDS = frozenset("""
+a about above after again against all am an and any are as at be because been before being below between both
+but by can could did do does doing down during each few for from further had has have having he her here hers
+him his how i if in into is it its itself just me more most my no nor not of off on once only or other our ours
+out over own same she should so some such than that the their theirs them then there these they this those
+through to too under until up very was we were what when where which while who whom why will with would you
+your yours
+""".split())
+
+# 不规则复数/过去式
+IRREGULAR_LEMMAS = {
+    "men": "man", "women": "woman", "children": "child", "people": "person", "feet": "foot",
+    "teeth": "tooth", "mice": "mouse", "was": "be", "were": "be", "is": "be", "are": "be",
+    "began": "begin", "begun": "begin", "became": "become", "took": "take", "taken": "take",
+    "made": "make", "found": "find", "went": "go", "gone": "go", "saw": "see", "seen": "see",
+    "got": "get", "gave": "give", "given": "give", "led": "lead", "grew": "grow", "grown": "grow",
+    "brought": "bring", "thought": "think", "bought": "buy", "fell": "fall", "fallen": "fall",
+}
+
+_QUOTES = str.maketrans({"‘": "'", "’": "'", "“": '"', "”": '"', "＇": "'"})
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:'[a-z]+)?")
+# 作答开头的选项字母，如 "B"、"b)"、"(C)"、"D. It replaced..."；全角符号先经 NFKC 转为半角
+_CHOICE_PATTERN = re.compile(r"^\(?([a-d])\)?(?:$|[\s).:、，,．])", re.IGNORECASE)
+# 题干中的选项行，如 "A) It has seen a change..."
+_OPTION_PATTERN = re.compile(r"^\s*\(?([A-D])[).．、]\s*(.+?)\s*$", re.MULTILINE)
+
+
+class GradingError(ValueError):
+    """无法阅卷"""
+
+    def __init__(self, message: str, status_code: int = 400):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def lemmatize(token: str) -> str:
+    """按规则把词还原为原形，作答和参考答案使用同一规则，只需保证一致"""
+    if token in IRREGULAR_LEMMAS:
+        return IRREGULAR_LEMMAS[token]
+    if len(token) <= 3 or token.isdigit():
+        return token
+    if token.endswith("ies") and len(token) > 4:
+        return token[:-3] + "y"
+    if token.endswith("ied") and len(token) > 4:
+        return token[:-3] + "y"
+    if token.endswith("sses") or token.endswith("ches") or token.endswith("shes") or token.endswith("xes"):
+        return token[:-2]
+    for suffix, min_len in (("ing", 6), ("ed", 5)):
+        if token.endswith(suffix) and len(token) >= min_len:
+            stem = token[:-len(suffix)]
+            # 去掉重复的辅音字母，如 stopped -> stop
+            if len(stem) > 2 and stem[-1] == stem[-2] and stem[-1] not in "aeiouls":
+                stem = stem[:-1]
+            return stem
+    if token.endswith("s") and not token.endswith(("ss", "us", "is")):
+        return token[:-1]
+    return token
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    """
+    把答案规范化为词列表
+
+    统一大小写和引号、去掉所有格 's、去掉标点和停用词，再还原词形。
+    答案全部由停用词组成时保留这些词，避免得到空集合。
+    """
+    if not text:
+        return []
+    text = unicodedata.normalize("NFKC", text).translate(_QUOTES).lower()
+    words = [word[:-2] if word.endswith("'s") else word.replace("'", "") for word in _TOKEN_PATTERN.findall(text)]
+    content_words = [word for word in words if word not in STOPWORDS]
+    return [lemmatize(word) for word in (content_words or words)]
+
+
+def parse_choice(answer: Optional[str]) -> Optional[str]:
+    """读取作答开头的选项字母，没有时返回 None"""
+    match = _CHOICE_PATTERN.match(unicodedata.normalize("NFKC", answer or "").strip())
+    return match.group(1).upper() if match else None
+
+
+def parse_options(question: Optional[str]) -> Dict[str, frozenset]:
+    """从题干中解析各选项原文的词集合"""
+    return {letter: frozenset(tokenize(text)) for letter, text in _OPTION_PATTERN.findall(unicodedata.normalize("NFKC", question or ""))}
+
+
+def dice(a: frozenset, b: frozenset) -> float:
+    """两个词集合的Dice相似度"""
+    if not a or not b:
+        return 0.0
+    return 2 * len(a & b) / (len(a) + len(b))
+
+
+class AnswerKey:
+    """
+    一套试卷规范化后的参考答案
+
+    选择题保存正确选项字母和各选项的词集合；主观题的参考答案词集合
+    编码为 题数 x 词表大小 的布尔矩阵，批改时整批作答一次矩阵运算。
+    """
+
+    def __init__(self, exam: Dict[str, Any], version: int):
+        self.exam_id = exam["id"]
+        self.version = version
+        self.numbers: List[int] = []
+        self.answers: List[str] = []
+        self.choices: List[Optional[str]] = []
+        self.options: List[Dict[str, frozenset]] = []
+        key_tokens: List[frozenset] = []
+        for i in range(1, MAX_QUESTIONS + 1):
+            answer = exam.get(f"a{i}")
+            if not exam.get(f"t{i}") or answer is None or not str(answer).strip():
+                continue
+            answer = str(answer).strip()
+            self.numbers.append(i)
+            self.answers.append(answer)
+            # 参考答案只有一个选项字母的是选择题
+            choice = unicodedata.normalize("NFKC", answer).strip()
+            self.choices.append(choice.upper() if re.fullmatch(r"[A-Da-d]", choice) else None)
+            self.options.append(parse_options(exam.get(f"t{i}")))
+            key_tokens.append(frozenset(tokenize(answer)))
+
+        self.vocabulary: Dict[str, int] = {}
+        for tokens in key_tokens:
+            for token in tokens:
+                self.vocabulary.setdefault(token, len(self.vocabulary))
+        self.matrix = np.zeros((len(self.numbers), max(len(self.vocabulary), 1)), dtype=bool)
+        for q, tokens in enumerate(key_tokens):
+            self.matrix[q, [self.vocabulary[token] for token in tokens]] = True
+        self.sizes = self.matrix.sum(axis=1)
+
+    def resolve_choice(self, q: int, answer: str) -> Optional[str]:
+        """确定选择题作答选择的选项：优先读取选项字母，否则与选项原文模糊匹配"""
+        letter = parse_choice(answer)
+        if letter or not self.options[q]:
+            return letter
+        tokens = frozenset(tokenize(answer))
+        best, best_score = None, 0.0
+        for option, option_tokens in self.options[q].items():
+            score = dice(tokens, option_tokens)
+            if score > best_score:
+                best, best_score = option, score
+        return best if best_score >= GRADING_OPTION_THRESHOLD else None
+
+    def grade(self, submissions: Sequence[Sequence[str]]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        批改一批答卷，每份答卷为按题号顺序排列的作答
+
+        返回 (是否正确, 相似度)，形状均为 答卷数 x 题数。
+        """
+        count, questions = len(submissions), len(self.numbers)
+        similarity = np.zeros((count, questions), dtype=np.float64)
+        answer_matrix = np.zeros((count, questions, self.matrix.shape[1]), dtype=bool)
+        answer_sizes = np.zeros((count, questions), dtype=np.int64)
+        free_text = np.array([choice is None for choice in self.choices], dtype=bool)
+
+        for s, answers in enumerate(submissions):
+            for q in range(questions):
+                answer = answers[q] if q < len(answers) else ""
+                if not answer or not answer.strip():
+                    continue
+                if self.choices[q] is not None:
+                    similarity[s, q] = 1.0 if self.resolve_choice(q, answer) == self.choices[q] else 0.0
+                    continue
+                tokens = set(tokenize(answer))
+                answer_sizes[s, q] = len(tokens)
+                known = [self.vocabulary[token] for token in tokens if token in self.vocabulary]
+                answer_matrix[s, q, known] = True
+
+        # 主观题：Dice系数 = 2|A∩K| / (|A| + |K|)
+        overlap = np.logical_and(answer_matrix, self.matrix[np.newaxis]).sum(axis=2)
+        total = answer_sizes + self.sizes[np.newaxis]
+        dice_scores = np.divide(2 * overlap, total, out=np.zeros_like(similarity), where=total > 0)
+        similarity[:, free_text] = dice_scores[:, free_text]
+
+        threshold = np.where(free_text, GRADING_SIMILARITY_THRESHOLD, 1.0)
+        correct = similarity >= threshold[np.newaxis]
+        return correct, similarity
+
+    def summarize(self, correct: np.ndarray, similarity: np.ndarray) -> Dict[str, Any]:
+        """把一份答卷的批改结果整理为得分、错题ID和逐题结果"""
+        wrong_questions = [f"{self.exam_id}-{number}" for number, ok in zip(self.numbers, correct) if not ok]
+        return {
+            "exam_id": self.exam_id,
+            "score": int(correct.sum()) * EXAM_QUESTION_POINTS,
+            "max_score": len(self.numbers) * EXAM_QUESTION_POINTS,
+            "wrong_questions": wrong_questions,
+            "results": [
+                {"number": number, "correct": bool(ok), "similarity": round(float(sim), 3), "answer": answer}
+                for number, ok, sim, answer in zip(self.numbers, correct, similarity, self.answers)
+            ],
+        }
+
+
+# 已规范化的参考答案：试卷ID -> AnswerKey，内容版本变化后重新生成
+_answer_keys: Dict[int, AnswerKey] = {}
+_answer_keys_lock = threading.Lock()
+
+
+def get_answer_key(exam_id: int) -> AnswerKey:
+    """取出试卷的参考答案，试卷不存在时抛出 GradingError"""
+    version = content_state()[0]
+    key = _answer_keys.get(exam_id)
+    if key is not None and key.version == version:
+        return key
+    with _answer_keys_lock:
+        key = _answer_keys.get(exam_id)
+        if key is None or key.version != version:
+            exam = get_exam_by_id(exam_id)
+            if not exam:
+                raise GradingError(f"未找到ID为{exam_id}的试卷", status_code=404)
+            key = AnswerKey(exam, version)
+            if not key.numbers:
+                raise GradingError(f"试卷{exam_id}没有参考答案", status_code=404)
+            _answer_keys[exam_id] = key
+            logger.info(f"生成试卷{exam_id}的参考答案，共{len(key.numbers)}题，内容版本 {version}")
+    return key
+
+
+def validate_answers(key: AnswerKey, answers: Sequence[Optional[str]]) -> List[str]:
+    """检查一份作答的题数和长度，缺少的题按未作答处理"""
+    if len(answers) > len(key.numbers):
+        raise GradingError(f"试卷{key.exam_id}只有{len(key.numbers)}题，收到{len(answers)}个作答")
+    answers = [answer or "" for answer in answers]
+    if any(len(answer) > MAX_ANSWER_LENGTH for answer in answers):
+        raise GradingError(f"单题作答不能超过 {MAX_ANSWER_LENGTH} 个字符")
+    return answers
+
+
+def grade_exam(exam_id: int, answers: Sequence[Optional[str]]) -> Dict[str, Any]:
+    """批改一份答卷"""
+    key = get_answer_key(exam_id)
+    correct, similarity = key.grade([validate_answers(key, answers)])
+    return key.summarize(correct[0], similarity[0])
+
+
+def _batch_row(row: Any, index: int) -> Tuple[str, int, List[str]]:
+    """校验批量阅卷中的一行，返回 (姓名, 试卷ID, 作答)"""
+    if not isinstance(row, dict):
+        raise GradingError(f"第{index}条必须是对象")
+    name = str(row.get("name") or "").strip()
+    if not name:
+        raise GradingError(f"第{index}条缺少姓名")
+    try:
+        exam_id = int(row.get("exam_id"))
+    except (TypeError, ValueError):
+        raise GradingError(f"第{index}条的试卷ID无效")
+    answers = row.get("answers")
+    if not isinstance(answers, list) or not all(answer is None or isinstance(answer, (str, int)) for answer in answers):
+        raise GradingError(f"第{index}条的 answers 必须是作答列表")
+    return name, exam_id, ["" if answer is None else str(answer) for answer in answers]
+
+
+def parse_batch_csv(text: str) -> List[Dict[str, Any]]:
+    """
+    解析批量阅卷的CSV，首行为列名：name, exam_id, a1, ..., a5
+
+    与导入试卷时的答案列名一致，缺少的作答列按未作答处理。
+    """
+    reader = csv.DictReader(io.StringIO(text.lstrip("﻿")))
+    fields = reader.fieldnames or []
+    if "name" not in fields or "exam_id" not in fields:
+        raise GradingError("CSV首行必须包含 name 和 exam_id 列")
+    answer_columns = [f"a{i}" for i in range(1, MAX_QUESTIONS + 1) if f"a{i}" in fields]
+    rows = []
+    for record in reader:
+        answers = [record.get(column) or "" for column in answer_columns]
+        # 去掉末尾的空作答，题数少于5题的试卷不会被当作多出的作答
+        while answers and not answers[-1].strip():
+            answers.pop()
+        rows.append({"name": record.get("name"), "exam_id": record.get("exam_id"), "answers": answers})
+    return rows
+
+
+def parse_batch_json(data: Any) -> List[Dict[str, Any]]:
+    """解析批量阅卷的JSON：答卷数组，或 {"submissions": [...]}"""
+    if isinstance(data, dict):
+        data = data.get("submissions")
+    if not isinstance(data, list):
+        raise GradingError("JSON必须是答卷数组或包含 submissions 数组的对象")
+    return data
+
+
+def grade_batch(rows: Sequence[Any]) -> List[Dict[str, Any]]:
+    """
+    批量阅卷
+
+    按试卷分组，每套试卷的全部答卷一次矩阵运算批改。
+    单条答卷无效时只在该条的报告中记录错误，不影响其他答卷。
+    报告顺序与输入一致。
+    """
+    if len(rows) > MAX_BATCH_SUBMISSIONS:
+        raise GradingError(f"单次最多批改 {MAX_BATCH_SUBMISSIONS} 份答卷", status_code=413)
+
+    reports: List[Optional[Dict[str, Any]]] = [None] * len(rows)
+    groups: Dict[int, List[Tuple[int, str, List[str]]]] = {}
+    for index, row in enumerate(rows):
+        try:
+            name, exam_id, answers = _batch_row(row, index + 1)
+        except GradingError as e:
+            reports[index] = {"name": row.get("name") if isinstance(row, dict) else None,
+                              "exam_id": None, "success": False, "error": str(e)}
+            continue
+        groups.setdefault(exam_id, []).append((index, name, answers))
+
+    for exam_id, members in groups.items():
+        try:
+            key = get_answer_key(exam_id)
+        except GradingError as e:
+            for index, name, _ in members:
+                reports[index] = {"name": name, "exam_id": exam_id, "success": False, "error": str(e)}
+            continue
+
+        valid = []
+        for index, name, answers in members:
+            try:
+                valid.append((index, name, validate_answers(key, answers)))
+            except GradingError as e:
+                reports[index] = {"name": name, "exam_id": exam_id, "success": False, "error": str(e)}
+        if not valid:
+            continue
+
+        correct, similarity = key.grade([answers for _, _, answers in valid])
+        for row_no, (index, name, _) in enumerate(valid):
+            reports[index] = {"name": name, "success": True, **key.summarize(correct[row_no], similarity[row_no])}
+
+    logger.info(f"批量阅卷完成: {len(rows)} 份答卷，{len(groups)} 套试卷")
+    return reports
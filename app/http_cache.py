@@ -0,0 +1,141 @@
+"""HTTP缓存辅助函数：ETag/Last-Modified校验值、Cache-Control策略和304响应"""
+import hashlib
+import json
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Any, Dict, Optional, Tuple
+
+from fastapi import Request, Response
+
+from app.config import CONTENT_VERSION_TTL_SECONDS
+from app.database import get_content_state
+
+# 内容版本的进程内缓存：(版本, 更新时间, 过期时刻)
+# 缓存期内的条件请求不访问数据库；内容变化最多延迟 CONTENT_VERSION_TTL_SECONDS 秒生效
+_content_state: Tuple[int, Optional[str], float] = (0, None, 0.0)
+_content_state_lock = threading.Lock()
+
+
+def content_state() -> Tuple[int, Optional[str]]:
+    """返回缓存的内容版本和更新时间，过期后重新读取"""
+    global _content_state
+    version, updated_at, expires = _content_state
+    if time.monotonic() < expires:
+        return version, updated_at
+    with _content_state_lock:
+        version, updated_at, expires = _content_state
+        if time.monotonic() >= expires:
+            version, updated_at = get_content_state()
+            _content_state = (version, updated_at, time.monotonic() + CONTENT_VERSION_TTL_SECONDS)
+    return version, updated_at
+
+
+def content_etag(scope: str, version: int) -> str:
+    """由内容版本生成强ETag，scope 区分同一版本下的不同资源"""
+    return f'"{scope}-v{version}"'
+
+
+def profile_etag(profile: Dict[str, Any], scope: str, weak: bool = False) -> Optional[str]:
+    """
+    由用户画像整行内容生成ETag，画像任何字段变化都会得到新的ETag
+
+    画像不存在（如使用示例数据）时返回 None，调用方不应缓存。
+    AI生成的内容每次不完全相同，只能使用弱ETag。
+    """
+    if not profile or profile.get("id") is None:
+        return None
+    raw = json.dumps(profile, sort_keys=True, ensure_ascii=False, default=str)
+    digest = hashlib.sha1(f"{scope}:{raw}".encode("utf-8")).hexdigest()[:20]
+    return f'W/"{digest}"' if weak else f'"{digest}"'
+
+
+def http_date(timestamp: Optional[str]) -> Optional[str]:
+    """把数据库中的UTC时间转换为HTTP日期格式"""
+    if not timestamp:
+        return None
+    try:
+        dt = datetime.strptime(timestamp, "%Y-%m-%d %H:%M:%S").replace(tzinfo=timezone.utc)
+    except ValueError:
+        return None
+    return format_datetime(dt, usegmt=True)
+
+
+# 预编码响应的压缩版本在ETag后追加的编码后缀，见 app.response_store
+_ENCODING_SUFFIXES = ('-gzip"', '-br"')
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    判断 If-None-Match 请求头是否包含当前ETag
+
+    按弱比较，忽略 W/ 前缀；压缩版本的ETag（如 "self-rate-v3-gzip"）与原始ETag视为同一版本。
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    current = etag[2:] if etag.startswith("W/") else etag
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        for suffix in _ENCODING_SUFFIXES:
+            if candidate.endswith(suffix):
+                candidate = candidate[:-len(suffix)] + '"'
+                break
+        if candidate == current:
+            return True
+    return False
+
+
+def _not_modified_since(if_modified_since: Optional[str], last_modified: Optional[str]) -> bool:
+    """判断资源在 If-Modified-Since 之后是否未修改"""
+    if not if_modified_since or not last_modified:
+        return False
+    try:
+        return parsedate_to_datetime(last_modified) <= parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+
+
+def not_modified(etag: str, cache_control: str, last_modified: Optional[str] = None) -> Response:
+    """构造304响应，带上与200响应相同的校验头"""
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+    if last_modified:
+        headers["Last-Modified"] = last_modified
+    return Response(status_code=304, headers=headers)
+
+
+def check_not_modified(request: Request, etag: str, cache_control: str,
+                       last_modified: Optional[str] = None) -> Optional[Response]:
+    """
+    处理条件请求：校验值与请求匹配时返回304响应，否则返回 None
+
+    有 If-None-Match 时忽略 If-Modified-Since。
+    """
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        unchanged = etag_matches(if_none_match, etag)
+    else:
+        unchanged = _not_modified_since(request.headers.get("if-modified-since"), last_modified)
+    return not_modified(etag, cache_control, last_modified) if unchanged else None
+
+
+def set_cache_headers(response: Response, etag: Optional[str], cache_control: str,
+                      last_modified: Optional[str] = None):
+    """为成功的响应写入缓存头；没有校验值时禁止缓存"""
+    if not etag:
+        response.headers["Cache-Control"] = "no-store"
+        return
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = cache_control
+    if last_modified:
+        response.headers["Last-Modified"] = last_modified
+
+
+def content_validators(scope: str) -> Tuple[str, Optional[str]]:
+    """静态内容接口的校验值 (ETag, Last-Modified)，来自缓存的内容版本，缓存期内不访问数据库"""
+    version, updated_at = content_state()
+    return content_etag(scope, version), http_date(updated_at)
@@ -0,0 +1,112 @@
+"""
+提交接口的幂等键
+
+客户端为一次提交生成 Idempotency-Key，网络重试时沿用同一个键。首次响应与写操作在同一个事务中
+保存到 idempotency_keys 表，之后相同的键直接返回保存的响应，不再读写画像。
+
+同一进程内并发到达的重复请求等待第一个完成后读取它的响应；不同worker进程之间，
+写事务内会再检查一次键是否已保存，由SQLite的写锁保证只执行一次。
+同一个键用于内容不同的请求时返回422。
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import time
+from functools import partial
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from fastapi import HTTPException, Request, Response
+
+from app.config import IDEMPOTENCY_KEY_MAX_LENGTH, IDEMPOTENCY_TTL_SECONDS
+from app.database import get_db_connection, get_idempotent_response, save_idempotent_response
+from app.write_batcher import WriteOperation, run_write
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+# 返回保存的响应时附带的响应头
+REPLAYED_HEADER = "Idempotent-Replayed"
+
+# 进行中的提交：(接口, 键) -> 完成时设置的 future
+_in_flight: Dict[Tuple[str, str], asyncio.Future] = {}
+
+
+def request_fingerprint(payload: Any) -> str:
+    """请求内容的摘要，用于发现同一个键被用于不同的请求"""
+    raw = json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def _replay(stored: Optional[Tuple[str, str]], request_hash: str) -> Optional[Dict[str, Any]]:
+    """由保存的记录得到响应内容，请求内容不一致时拒绝"""
+    if stored is None:
+        return None
+    stored_hash, body = stored
+    if stored_hash != request_hash:
+        raise HTTPException(status_code=422, detail=f"{IDEMPOTENCY_HEADER} 已用于内容不同的请求")
+    return json.loads(body)
+
+
+def _lookup(endpoint: str, key: str, request_hash: str) -> Optional[Dict[str, Any]]:
+    """在写队列之外读取已保存的响应，重试请求不必排队等待写入"""
+    conn = get_db_connection()
+    try:
+        stored = get_idempotent_response(conn.cursor(), endpoint, key, time.time() - IDEMPOTENCY_TTL_SECONDS)
+    finally:
+        conn.close()
+    return _replay(stored, request_hash)
+
+
+def _apply_once(cursor, endpoint: str, key: str, request_hash: str, operation: WriteOperation,
+                respond: Callable[[Any], Dict[str, Any]]) -> Tuple[bool, Dict[str, Any]]:
+    """在写事务中执行提交并保存响应；其他进程已保存同一个键时直接返回其响应"""
+    now = time.time()
+    stored = _replay(get_idempotent_response(cursor, endpoint, key, now - IDEMPOTENCY_TTL_SECONDS), request_hash)
+    if stored is not None:
+        return True, stored
+    body = respond(operation(cursor))
+    save_idempotent_response(cursor, endpoint, key, request_hash, json.dumps(body, ensure_ascii=False), now)
+    return False, body
+
+
+async def idempotent_write(request: Request, response: Response, endpoint: str, payload: Any,
+                           operation: WriteOperation, respond: Callable[[Any], Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    执行一次提交，返回响应内容
+
+    operation 在写事务中执行，respond 由其结果构造响应内容（JSON可序列化的字典）。
+    请求未带 Idempotency-Key 时与直接调用 run_write 相同；写操作失败时不保存响应，客户端可以用同一个键重试。
+    """
+    key = request.headers.get(IDEMPOTENCY_HEADER)
+    if key is None:
+        return respond(await run_write(operation))
+    key = key.strip()
+    if not key or len(key) > IDEMPOTENCY_KEY_MAX_LENGTH:
+        raise HTTPException(status_code=400, detail=f"{IDEMPOTENCY_HEADER} 长度应为1到{IDEMPOTENCY_KEY_MAX_LENGTH}个字符")
+
+    request_hash = request_fingerprint(payload)
+    flight = (endpoint, key)
+    # 相同的键正在处理时等待其完成；第一个请求失败时由本请求重新执行
+    while flight in _in_flight:
+        await asyncio.shield(_in_flight[flight])
+
+    stored = _lookup(endpoint, key, request_hash)
+    if stored is not None:
+        logger.info(f"重复提交 {endpoint}，返回已保存的响应: {key}")
+        response.headers[REPLAYED_HEADER] = "true"
+        return stored
+
+    done = asyncio.get_running_loop().create_future()
+    _in_flight[flight] = done
+    try:
+        replayed, body = await run_write(partial(_apply_once, endpoint=endpoint, key=key, request_hash=request_hash,
+                                                 operation=operation, respond=respond))
+    finally:
+        del _in_flight[flight]
+        done.set_result(None)
+    if replayed:
+        logger.info(f"重复提交 {endpoint}（其他进程已处理），返回已保存的响应: {key}")
+        response.headers[REPLAYED_HEADER] = "true"
+    return body
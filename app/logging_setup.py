@@ -0,0 +1,207 @@
+"""
+日志配置：所有日志经队列交给后台线程输出
+
+请求处理线程只负责截断过长的参数、合并消息并放入队列，
+格式化和写终端/文件都在后台线程完成。支持按日志器抽样和JSON格式输出。
+"""
+import atexit
+import json
+import logging
+import logging.handlers
+import queue
+import reprlib
+import sys
+import threading
+from datetime import datetime, timezone
+from typing import Dict, Optional
+
+from app.config import LOG_LEVEL, LOG_FORMAT, LOG_FILE, LOG_MAX_MESSAGE_LENGTH, LOG_SAMPLE_RATES
+
+TEXT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+# 队列满时丢弃新日志而不是阻塞请求
+QUEUE_SIZE = 10000
+
+# LogRecord 的标准属性，其余属性视为 extra 字段写入JSON
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime"}
+
+_listener: Optional[logging.handlers.QueueListener] = None
+_setup_lock = threading.Lock()
+
+
+def truncate(text: str, max_length: int) -> str:
+    """截断过长的文本并注明原长度"""
+    if len(text) <= max_length:
+        return text
+    return f"{text[:max_length]}…（共{len(text)}字符，已截断）"
+
+
+def _make_repr(max_length: int) -> reprlib.Repr:
+    """限制长度的 repr，容器只展开前几项，不会先生成完整字符串"""
+    limited = reprlib.Repr()
+    limited.maxstring = max_length
+    limited.maxother = max_length
+    limited.maxlong = 40
+    limited.maxlevel = 3
+    limited.maxdict = limited.maxlist = limited.maxtuple = limited.maxset = 20
+    return limited
+
+
+class TruncatingFilter(logging.Filter):
+    """
+    在格式化之前截断日志内容
+
+    %s 参数中的字典、列表等用受限的 repr 转换；已经拼好的长消息直接截断。
+    """
+
+    def __init__(self, max_length: int = LOG_MAX_MESSAGE_LENGTH):
+        super().__init__()
+        self.max_length = max_length
+        self._repr = _make_repr(max_length)
+
+    def _shorten(self, value):
+        if isinstance(value, str):
+            return value if len(value) <= self.max_length else self._cut(value)
+        if isinstance(value, (int, float, bool)) or value is None:
+            return value
+        return self._repr.repr(value)
+
+    def _cut(self, text: str) -> str:
+        return truncate(text, self.max_length)
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if isinstance(record.msg, str) and len(record.msg) > self.max_length:
+            record.msg = self._cut(record.msg)
+        if isinstance(record.args, tuple):
+            record.args = tuple(self._shorten(arg) for arg in record.args)
+        elif isinstance(record.args, dict):
+            record.args = {key: self._shorten(value) for key, value in record.args.items()}
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """
+    按日志器抽样，WARNING 以下的日志每 N 条只保留 1 条
+
+    rates 为 日志器名称 -> 保留比例，子日志器继承上级的设置。
+    """
+
+    def __init__(self, rates: Dict[str, float]):
+        super().__init__()
+        self.intervals = {name: max(1, round(1 / rate)) for name, rate in rates.items() if 0 < rate < 1}
+        self.dropped = {name: 0 for name in rates if rates[name] <= 0}
+        self._counters: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def _rule(self, name: str) -> Optional[str]:
+        while name:
+            if name in self.intervals or name in self.dropped:
+                return name
+            name = name.rpartition(".")[0]
+        return None
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING or (not self.intervals and not self.dropped):
+            return True
+        rule = self._rule(record.name)
+        if rule is None:
+            return True
+        if rule in self.dropped:
+            return False
+        interval = self.intervals[rule]
+        with self._lock:
+            count = self._counters.get(rule, 0)
+            self._counters[rule] = count + 1
+        if count % interval:
+            return False
+        record.sampled = interval
+        return True
+
+
+class JSONFormatter(logging.Formatter):
+    """每条日志输出一行JSON"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class _DeferredQueueHandler(logging.handlers.QueueHandler):
+    """
+    只合并消息、不做格式化的队列处理器
+
+    标准的 QueueHandler 在调用线程中格式化整条日志，这里推迟到后台线程。
+    合并后的消息仍超长时（如多个参数各自接近上限）再截断一次。
+    """
+
+    def __init__(self, log_queue, max_length: int = LOG_MAX_MESSAGE_LENGTH):
+        super().__init__(log_queue)
+        self.max_length = max_length
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record.msg = truncate(record.getMessage(), self.max_length)
+        record.args = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            pass
+
+
+def setup_logging(level: str = LOG_LEVEL, fmt: str = LOG_FORMAT, log_file: Optional[str] = LOG_FILE,
+                  stream=None) -> logging.handlers.QueueListener:
+    """
+    配置根日志器，重复调用时直接返回已有的后台线程
+
+    fmt 为 text 或 json；log_file 不为空时同时写入文件。
+    """
+    global _listener
+    with _setup_lock:
+        if _listener is not None:
+            return _listener
+
+        formatter = JSONFormatter() if fmt == "json" else logging.Formatter(TEXT_FORMAT)
+        handlers = [logging.StreamHandler(stream or sys.stderr)]
+        if log_file:
+            handlers.append(logging.handlers.WatchedFileHandler(log_file, encoding="utf-8"))
+        for handler in handlers:
+            handler.setFormatter(formatter)
+
+        log_queue: "queue.Queue[logging.LogRecord]" = queue.Queue(QUEUE_SIZE)
+        queue_handler = _DeferredQueueHandler(log_queue, LOG_MAX_MESSAGE_LENGTH)
+        # 过滤器挂在队列处理器上，在请求线程中先于消息合并执行
+        queue_handler.addFilter(SamplingFilter(LOG_SAMPLE_RATES))
+        queue_handler.addFilter(TruncatingFilter(LOG_MAX_MESSAGE_LENGTH))
+
+        root = logging.getLogger()
+        for handler in list(root.handlers):
+            root.removeHandler(handler)
+        root.addHandler(queue_handler)
+        root.setLevel(level)
+
+        _listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+        _listener.start()
+        atexit.register(shutdown_logging)
+        return _listener
+
+
+def shutdown_logging():
+    """输出队列中剩余的日志并停止后台线程"""
+    global _listener
+    with _setup_lock:
+        if _listener is not None:
+            _listener.stop()
+            _listener = None
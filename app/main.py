@@ -1,35 +1,82 @@
 import logging
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import HTMLResponse
-from fastapi.staticfiles import StaticFiles
+from fastapi.responses import HTMLResponse, JSONResponse
 import os
 from pathlib import Path
 
+from app.logging_setup import setup_logging
+
 # 导入配置
-from app.config import CORS_ORIGINS, API_PREFIX 
+from app.config import (
+    CORS_ORIGINS, API_PREFIX, WRITE_BATCHING_ENABLED, MAINTENANCE_ENABLED, SERVE_FRONTEND, FRONTEND_DIST_DIR,
+    PROFILE_TOKEN, SHUTDOWN_TIMEOUT_SECONDS,
+)
+from app.chat_session import drain_chat_connections
+from app.write_batcher import group_writer
+from app.maintenance import RequestLoadMiddleware, maintenance_scheduler
+from app.frontend import FrontendStaticFiles
+from app.profiling import RequestProfilerMiddleware
 
 # 导入自定义路由模块
-from app.routers import planning, execution, feedback
+from app.routers import planning, execution, feedback, research, admin, events, dashboard
 
 # 配置日志
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+setup_logging()
 logger = logging.getLogger(__name__)
 
+# 默认使用 orjson 直接把响应内容编码为字节，未安装时退回标准库 json
+try:
+    import orjson  # noqa: F401
+    from fastapi.responses import ORJSONResponse as DefaultResponse
+except ImportError:
+    DefaultResponse = JSONResponse
+
 # 创建FastAPI应用 - 不使用中间件参数
 app = FastAPI(
     title="个性化英语阅读支持系统API",
     description="为英语阅读学习提供个性化支持的API服务",
     version="1.0.0",
+    default_response_class=DefaultResponse,
 )
 
 # 注册路由
 app.include_router(planning.router, prefix=API_PREFIX)
 app.include_router(execution.router, prefix=API_PREFIX)
 app.include_router(feedback.router, prefix=API_PREFIX)
+app.include_router(research.router, prefix=API_PREFIX)
+app.include_router(admin.router, prefix=API_PREFIX)
+app.include_router(events.router, prefix=API_PREFIX)
+app.include_router(dashboard.router, prefix=API_PREFIX)
+
+# 单请求剖析：只在配置了令牌时安装，未配置时没有任何开销
+# 必须先于下面的中间件注册（位于内层），剖析的才是实际处理请求的任务
+if PROFILE_TOKEN:
+    app.add_middleware(RequestProfilerMiddleware)
+
+# 统计进行中的请求，维护任务在请求较多时推迟执行；
+# 使用纯ASGI中间件，不为每个请求额外包一层 BaseHTTPMiddleware
+app.add_middleware(RequestLoadMiddleware)
+
+@app.on_event("startup")
+async def start_background_tasks():
+    """启动组提交写入器和数据库维护任务"""
+    if WRITE_BATCHING_ENABLED:
+        await group_writer.start()
+    if MAINTENANCE_ENABLED:
+        await maintenance_scheduler.start()
+
+@app.on_event("shutdown")
+async def stop_background_tasks():
+    """等待进行中的AI对话回复，提交队列中剩余的写操作后停止写入器，再停止维护任务"""
+    await drain_chat_connections(SHUTDOWN_TIMEOUT_SECONDS)
+    await group_writer.stop()
+    await maintenance_scheduler.stop()
+
+# 存在构建好的前端时由后端提供，根路径交给前端页面；否则显示API欢迎页
+serve_frontend = SERVE_FRONTEND and os.path.isfile(os.path.join(FRONTEND_DIST_DIR, "index.html"))
 
 # 根路径，显示欢迎页面
-@app.get("/", response_class=HTMLResponse)
 async def root():
     """API根路径，显示简单的欢迎页面"""
     return """
@@ -69,6 +116,9 @@ async def root():
     </html>
     """
 
+if not serve_frontend:
+    app.add_api_route("/", root, methods=["GET"], response_class=HTMLResponse)
+
 # 简易测试客户端
 @app.get("/client", response_class=HTMLResponse)
 async def test_client():
@@ -395,4 +445,9 @@ async def test_client():
 @app.get("/healthcheck")
 async def healthcheck():
     """API健康检查端点"""
-    return {"status": "healthy", "version": "1.0.0"}
\ No newline at end of file
+    return {"status": "healthy", "version": "1.0.0"}
+
+# 前端静态文件挂载在根路径，必须放在所有路由之后；未匹配的前端路由返回 index.html
+if serve_frontend:
+    app.mount("/", FrontendStaticFiles(directory=FRONTEND_DIST_DIR), name="frontend")
+    logger.info(f"由后端提供前端页面: {FRONTEND_DIST_DIR}")
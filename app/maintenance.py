@@ -0,0 +1,284 @@
+"""数据库维护模块：在后台定期执行WAL检查点、统计信息更新和增量清理"""
+import asyncio
+import logging
+import os
+import sqlite3
+import time
+from typing import Any, Dict, Optional
+
+from app.config import (
+    DATABASE_PATH,
+    MAINTENANCE_INTERVAL_SECONDS,
+    MAINTENANCE_MAX_BACKOFF_SECONDS,
+    MAINTENANCE_BUSY_IN_FLIGHT,
+    MAINTENANCE_BUSY_REQUESTS_PER_SECOND,
+    WAL_CHECKPOINT_BYTES,
+    WAL_TRUNCATE_BYTES,
+    WAL_CHECKPOINT_MAX_AGE_SECONDS,
+    OPTIMIZE_INTERVAL_SECONDS,
+    INCREMENTAL_VACUUM_ENABLED,
+    INCREMENTAL_VACUUM_MIN_FREE_PAGES,
+    INCREMENTAL_VACUUM_PAGES,
+    IDEMPOTENCY_TTL_SECONDS,
+    IDEMPOTENCY_PURGE_INTERVAL_SECONDS,
+)
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+
+class RequestLoad:
+    """
+    统计正在处理的请求数和最近的请求量，供维护任务判断是否空闲
+
+    只统计本进程的请求。生产模式下每个worker各有一个维护任务，看不到其他worker的负载：
+    本worker空闲时也可能执行 wal_checkpoint(TRUNCATE)，而其他worker仍在处理请求。
+    """
+
+    def __init__(self):
+        self.in_flight = 0
+        self._count = 0
+        self._since = time.monotonic()
+
+    def enter(self):
+        self.in_flight += 1
+        self._count += 1
+
+    def exit(self):
+        self.in_flight -= 1
+
+    def take_rate(self) -> float:
+        """返回上次调用以来的平均每秒请求数，并重新开始计数"""
+        now = time.monotonic()
+        elapsed = max(now - self._since, 1e-6)
+        rate = self._count / elapsed
+        self._count = 0
+        self._since = now
+        return rate
+
+
+request_load = RequestLoad()
+
+
+class RequestLoadMiddleware:
+    """ASGI中间件：统计进行中的HTTP请求，直到响应（包括流式响应）发送完毕"""
+
+    def __init__(self, app, load: RequestLoad = request_load):
+        self.app = app
+        self.load = load
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        self.load.enter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.load.exit()
+
+
+def wal_size(db_path: Optional[str] = None) -> int:
+    """返回WAL文件的字节数，不存在时为0"""
+    try:
+        return os.path.getsize((db_path or DATABASE_PATH) + "-wal")
+    except OSError:
+        return 0
+
+
+class MaintenanceScheduler:
+    """
+    后台维护调度器
+
+    每隔 MAINTENANCE_INTERVAL_SECONDS 检查一次：
+    - WAL超过 WAL_CHECKPOINT_BYTES 或距上次检查点超过最大间隔时执行检查点：
+      没有进行中的请求时用 TRUNCATE 把WAL截断，否则用 PASSIVE，
+      WAL超过 WAL_TRUNCATE_BYTES 时无论是否有请求都截断；
+    - 每隔 OPTIMIZE_INTERVAL_SECONDS 执行 PRAGMA optimize，没有统计信息时先执行 ANALYZE；
+    - 开启增量清理且数据库为 auto_vacuum=INCREMENTAL 时，空闲页超过阈值则回收一部分；
+    - 每隔 IDEMPOTENCY_PURGE_INTERVAL_SECONDS 删除过期的幂等键。
+
+    请求量较高时跳过本轮并加倍等待间隔（不超过 MAINTENANCE_MAX_BACKOFF_SECONDS），
+    空闲后恢复。所有数据库操作在线程池中用独立连接执行，不阻塞事件循环。
+    """
+
+    def __init__(self, interval: float = MAINTENANCE_INTERVAL_SECONDS):
+        self.interval = interval
+        self._delay = interval
+        self._task: Optional[asyncio.Task] = None
+        self._stopping: Optional[asyncio.Event] = None
+        self._last_checkpoint = time.monotonic()
+        # 启动后的第一轮空闲检查即更新统计信息
+        self._last_optimize = float("-inf")
+        self._last_idempotency_purge = time.monotonic()
+        self.status: Dict[str, Any] = {
+            "running": False,
+            "runs": 0,
+            "skipped_busy": 0,
+            "next_delay_seconds": interval,
+            "wal_bytes": wal_size(),
+            "last_run_at": None,
+            "last_checkpoint": None,
+            "last_optimize": None,
+            "last_vacuum": None,
+            "last_idempotency_purge": None,
+            "last_error": None,
+        }
+
+    @property
+    def running(self) -> bool:
+        """调度任务是否在运行"""
+        return self._task is not None and not self._task.done()
+
+    async def start(self):
+        """启动调度任务"""
+        if self.running:
+            return
+        self._stopping = asyncio.Event()
+        self._task = asyncio.create_task(self._loop(), name="perss-maintenance")
+        self.status["running"] = True
+        logger.info(f"数据库维护任务已启动，检查间隔 {self.interval}s")
+
+    async def stop(self):
+        """停止调度任务，正在执行的维护操作会先完成"""
+        if not self.running:
+            return
+        self._stopping.set()
+        await self._task
+        self._task = None
+        self.status["running"] = False
+        logger.info("数据库维护任务已停止")
+
+    async def _loop(self):
+        """调度主循环"""
+        while not self._stopping.is_set():
+            try:
+                await asyncio.wait_for(self._stopping.wait(), self._delay)
+                break
+            except asyncio.TimeoutError:
+                pass
+
+            rate = request_load.take_rate()
+            if (request_load.in_flight >= MAINTENANCE_BUSY_IN_FLIGHT
+                    or rate >= MAINTENANCE_BUSY_REQUESTS_PER_SECOND):
+                self._delay = min(self._delay * 2, MAINTENANCE_MAX_BACKOFF_SECONDS)
+                self.status["skipped_busy"] += 1
+                self.status["next_delay_seconds"] = self._delay
+                logger.debug(f"请求较多（进行中 {request_load.in_flight}，{rate:.1f} 次/秒），"
+                             f"推迟维护 {self._delay}s")
+                continue
+
+            self._delay = self.interval
+            self.status["next_delay_seconds"] = self._delay
+            try:
+                await asyncio.to_thread(self.run_once)
+            except Exception as e:
+                self.status["last_error"] = str(e)
+                logger.error(f"数据库维护失败: {e}", exc_info=True)
+
+    def run_once(self, force: bool = False) -> Dict[str, Any]:
+        """执行一轮维护，force=True 时忽略阈值全部执行（用于手动触发）"""
+        now = time.monotonic()
+        size = wal_size()
+        conn = sqlite3.connect(DATABASE_PATH, timeout=1.0)
+        try:
+            if (force or size >= WAL_CHECKPOINT_BYTES
+                    or (size > 0 and now - self._last_checkpoint >= WAL_CHECKPOINT_MAX_AGE_SECONDS)):
+                # 没有进行中的请求时截断WAL；有请求时只做不阻塞读写的 PASSIVE，
+                # 除非WAL已经超过 WAL_TRUNCATE_BYTES。多个worker时这里只知道本进程是否空闲
+                idle = request_load.in_flight == 0
+                mode = "TRUNCATE" if force or idle or size >= WAL_TRUNCATE_BYTES else "PASSIVE"
+                self._checkpoint(conn, mode, size)
+
+            if force or now - self._last_optimize >= OPTIMIZE_INTERVAL_SECONDS:
+                self._optimize(conn)
+
+            if force or now - self._last_idempotency_purge >= IDEMPOTENCY_PURGE_INTERVAL_SECONDS:
+                self._purge_idempotency_keys(conn)
+
+            if INCREMENTAL_VACUUM_ENABLED:
+                self._incremental_vacuum(conn, force)
+        finally:
+            conn.close()
+
+        self.status["runs"] += 1
+        self.status["wal_bytes"] = wal_size()
+        self.status["last_run_at"] = time.strftime("%Y-%m-%d %H:%M:%S")
+        return self.status
+
+    def _checkpoint(self, conn: sqlite3.Connection, mode: str, size_before: int):
+        """执行WAL检查点并记录耗时"""
+        started = time.perf_counter()
+        busy, log_frames, checkpointed = conn.execute(f"PRAGMA wal_checkpoint({mode})").fetchone()
+        elapsed_ms = round((time.perf_counter() - started) * 1000, 2)
+        self._last_checkpoint = time.monotonic()
+        self.status["last_checkpoint"] = {
+            "mode": mode,
+            "busy": bool(busy),
+            "log_frames": log_frames,
+            "checkpointed_frames": checkpointed,
+            "wal_bytes_before": size_before,
+            "wal_bytes_after": wal_size(),
+            "duration_ms": elapsed_ms,
+            "at": time.strftime("%Y-%m-%d %H:%M:%S"),
+        }
+        logger.info(f"WAL检查点({mode}): {size_before} -> {self.status['last_checkpoint']['wal_bytes_after']} 字节，"
+                    f"{checkpointed}/{log_frames} 帧，耗时 {elapsed_ms}ms{'（有读者占用）' if busy else ''}")
+
+    def _optimize(self, conn: sqlite3.Connection):
+        """更新查询规划器的统计信息"""
+        started = time.perf_counter()
+        has_stats = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'sqlite_stat1'"
+        ).fetchone()
+        if not has_stats:
+            conn.execute("ANALYZE")
+        conn.execute("PRAGMA optimize")
+        conn.commit()
+        self._last_optimize = time.monotonic()
+        self.status["last_optimize"] = {
+            "analyzed": not has_stats,
+            "duration_ms": round((time.perf_counter() - started) * 1000, 2),
+            "at": time.strftime("%Y-%m-%d %H:%M:%S"),
+        }
+
+    def _purge_idempotency_keys(self, conn: sqlite3.Connection):
+        """删除超过保存期的幂等键"""
+        self._last_idempotency_purge = time.monotonic()
+        exists = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'idempotency_keys'"
+        ).fetchone()
+        if not exists:
+            return  # 尚未执行迁移
+        started = time.perf_counter()
+        deleted = conn.execute("DELETE FROM idempotency_keys WHERE created_at < ?",
+                               (time.time() - IDEMPOTENCY_TTL_SECONDS,)).rowcount
+        conn.commit()
+        self.status["last_idempotency_purge"] = {
+            "deleted": deleted,
+            "duration_ms": round((time.perf_counter() - started) * 1000, 2),
+            "at": time.strftime("%Y-%m-%d %H:%M:%S"),
+        }
+
+    def _incremental_vacuum(self, conn: sqlite3.Connection, force: bool):
+        """回收空闲页，仅适用于 auto_vacuum=INCREMENTAL 的数据库"""
+        if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+            self.status["last_vacuum"] = {"skipped": "数据库未启用 auto_vacuum=INCREMENTAL"}
+            return
+        free_pages = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        if not force and free_pages < INCREMENTAL_VACUUM_MIN_FREE_PAGES:
+            return
+        started = time.perf_counter()
+        # incremental_vacuum 每一步返回一行，需要取完才会执行全部步骤
+        conn.execute(f"PRAGMA incremental_vacuum({INCREMENTAL_VACUUM_PAGES})").fetchall()
+        conn.commit()
+        self.status["last_vacuum"] = {
+            "free_pages_before": free_pages,
+            "free_pages_after": conn.execute("PRAGMA freelist_count").fetchone()[0],
+            "duration_ms": round((time.perf_counter() - started) * 1000, 2),
+            "at": time.strftime("%Y-%m-%d %H:%M:%S"),
+        }
+
+
+# 全局调度器，在应用启动时按配置启用
+maintenance_scheduler = MaintenanceScheduler()
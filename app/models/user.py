@@ -2,6 +2,8 @@
 from typing import Optional, Dict, Any, List
 from datetime import datetime
 
+from app.utils import to_int_score, to_real_score
+
 
 class UserProfile:
     """用户画像模型"""
@@ -13,20 +15,24 @@ class UserProfile:
             major: Optional[str] = None,
             gender: Optional[str] = None,
             cet4_taken: Optional[str] = None,
-            cet4_score: Optional[str] = None,
-            cet4_reading_score: Optional[str] = None,
+            cet4_score: Optional[int] = None,
+            cet4_reading_score: Optional[int] = None,
             cet6_taken: Optional[str] = None,
-            cet6_score: Optional[str] = None,
-            cet6_reading_score: Optional[str] = None,
+            cet6_score: Optional[int] = None,
+            cet6_reading_score: Optional[int] = None,
             other_scores: Optional[str] = None,
             exam_name: Optional[str] = None,
-            total_score: Optional[str] = None,
-            reading_score: Optional[str] = None,
-            post_score: Optional[str] = None,
+            total_score: Optional[float] = None,
+            reading_score: Optional[float] = None,
+            post_score: Optional[int] = None,
             false_id: Optional[str] = None,
-            post_strategies_score: Optional[str] = None,
-            after_strategies_score: Optional[str] = None,
-            after_score: Optional[str] = None,
+            post_strategies_score: Optional[int] = None,
+            after_strategies_score: Optional[int] = None,
+            after_score: Optional[int] = None,
+            exam1_score: Optional[int] = None,
+            exam2_score: Optional[int] = None,
+            exam3_score: Optional[int] = None,
+            exam4_score: Optional[int] = None,
     ):
         self.name = name
         self.grade = grade
@@ -47,6 +53,10 @@ class UserProfile:
         self.post_strategies_score = post_strategies_score
         self.after_strategies_score = after_strategies_score
         self.after_score = after_score
+        self.exam1_score = exam1_score
+        self.exam2_score = exam2_score
+        self.exam3_score = exam3_score
+        self.exam4_score = exam4_score
         self.created_at = datetime.now()
         self.updated_at = datetime.now()
 
@@ -71,7 +81,11 @@ class UserProfile:
             "false_id": self.false_id,
             "post_strategies_score": self.post_strategies_score,
             "after_strategies_score": self.after_strategies_score,
-            "after_score": self.after_score
+            "after_score": self.after_score,
+            "exam1_score": self.exam1_score,
+            "exam2_score": self.exam2_score,
+            "exam3_score": self.exam3_score,
+            "exam4_score": self.exam4_score
         }
 
     @classmethod
@@ -83,75 +97,65 @@ class UserProfile:
             major=data.get("major"),
             gender=data.get("gender"),
             cet4_taken=data.get("Have you taken the CET-4 exam:"),
-            cet4_score=data.get("CET-4 score"),
-            cet4_reading_score=data.get("CET-4 reading score"),
+            cet4_score=to_int_score(data.get("CET-4 score")),
+            cet4_reading_score=to_int_score(data.get("CET-4 reading score")),
             cet6_taken=data.get("Have you taken the CET-6 exam"),
-            cet6_score=data.get("CET-6 score"),
-            cet6_reading_score=data.get("CET-6 reading score"),
+            cet6_score=to_int_score(data.get("CET-6 score")),
+            cet6_reading_score=to_int_score(data.get("CET-6 reading score")),
             other_scores=data.get("Other English scores for reference"),
             exam_name=data.get("Exam name"),
-            total_score=data.get("Total score"),
-            reading_score=data.get("Reading score"),
-            post_score=data.get("post_score"),
+            total_score=to_real_score(data.get("Total score")),
+            reading_score=to_real_score(data.get("Reading score")),
+            post_score=to_int_score(data.get("post_score")),
             false_id=data.get("false_id"),
-            post_strategies_score=data.get("post_strategies_score"),
-            after_strategies_score=data.get("after_strategies_score"),
-            after_score=data.get("after_score")
+            post_strategies_score=to_int_score(data.get("post_strategies_score")),
+            after_strategies_score=to_int_score(data.get("after_strategies_score")),
+            after_score=to_int_score(data.get("after_score")),
+            exam1_score=to_int_score(data.get("exam1_score")),
+            exam2_score=to_int_score(data.get("exam2_score")),
+            exam3_score=to_int_score(data.get("exam3_score")),
+            exam4_score=to_int_score(data.get("exam4_score"))
         )
 
     def get_reading_level(self) -> str:
         """获取用户阅读水平"""
-        try:
-            # 使用后测分数，如果没有则使用前测分数
-            score = int(self.after_score) if self.after_score else int(self.post_score) if self.post_score else 0
-
-            if score < 60:
-                return "初级"
-            elif score < 80:
-                return "中级"
-            else:
-                return "高级"
-        except (ValueError, TypeError):
-            return "未知"
+        # 使用后测分数，如果没有则使用前测分数
+        score = self.after_score if self.after_score is not None else self.post_score or 0
+
+        if score < 60:
+            return "初级"
+        elif score < 80:
+            return "中级"
+        else:
+            return "高级"
 
     def get_strategy_level(self) -> str:
         """获取用户策略水平"""
-        try:
-            # 使用后测分数，如果没有则使用前测分数
-            score = int(self.after_strategies_score) if self.after_strategies_score else int(
-                self.post_strategies_score) if self.post_strategies_score else 0
-
-            if score <= 25:
-                return "初级"
-            elif score <= 50:
-                return "中级"
-            else:
-                return "高级"
-        except (ValueError, TypeError):
-            return "未知"
+        # 使用后测分数，如果没有则使用前测分数
+        score = self.after_strategies_score if self.after_strategies_score is not None \
+            else self.post_strategies_score or 0
+
+        if score <= 25:
+            return "初级"
+        elif score <= 50:
+            return "中级"
+        else:
+            return "高级"
 
     def get_improvement(self) -> Dict[str, float]:
         """计算提高百分比"""
         reading_improvement = 0
         strategy_improvement = 0
 
-        try:
-            pre_score = int(self.post_score) if self.post_score else 0
-            post_score = int(self.after_score) if self.after_score else 0
-
-            if pre_score > 0:
-                reading_improvement = ((post_score - pre_score) / pre_score) * 100
-        except (ValueError, TypeError):
-            pass
-
-        try:
-            pre_strategy = int(self.post_strategies_score) if self.post_strategies_score else 0
-            post_strategy = int(self.after_strategies_score) if self.after_strategies_score else 0
+        pre_score = self.post_score or 0
+        post_score = self.after_score or 0
+        if pre_score > 0:
+            reading_improvement = ((post_score - pre_score) / pre_score) * 100
 
-            if pre_strategy > 0:
-                strategy_improvement = ((post_strategy - pre_strategy) / pre_strategy) * 100
-        except (ValueError, TypeError):
-            pass
+        pre_strategy = self.post_strategies_score or 0
+        post_strategy = self.after_strategies_score or 0
+        if pre_strategy > 0:
+            strategy_improvement = ((post_strategy - pre_strategy) / pre_strategy) * 100
 
         return {
             "reading": reading_improvement,
@@ -0,0 +1,258 @@
+"""
+单请求性能剖析
+
+请求带有与 PROFILE_TOKEN 一致的 X-Profile-Token 头（或 profile_token 查询参数）时，
+在处理这个请求期间由后台线程定时采样事件循环线程的调用栈，结束后把结果保存为
+speedscope JSON 或 collapsed 折叠栈（flamegraph.pl、speedscope 均可打开），
+文件名通过响应头 X-Profile-File 返回。
+
+只统计处理该请求的任务：任务正在运行时记录当前调用栈；任务挂起等待（AI接口、
+组提交写入、线程池中的同步代码等）时记录其 await 链，叶子节点标记为 [await]。
+样本权重为两次采样之间的实际间隔（微秒），所以火焰图宽度对应墙上时间。
+"""
+import asyncio
+import hmac
+import json
+import logging
+import os
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from typing import Optional, Tuple
+from urllib.parse import parse_qs
+
+from app.config import BASE_DIR, PROFILE_DIR, PROFILE_SAMPLE_INTERVAL, PROFILE_TOKEN
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+# 支持的输出格式 -> 文件扩展名
+PROFILE_FORMATS = {
+    "speedscope": "speedscope.json",
+    "collapsed": "collapsed.txt",
+}
+# 调用栈的最大深度
+MAX_STACK_DEPTH = 200
+# 挂起等待时间的叶子节点
+AWAIT_FRAME = ("[await]", "", 0)
+
+_ASYNCIO_EVENTS_FILE = os.path.join("asyncio", "events.py")
+_SITE_PACKAGES = "site-packages" + os.sep
+_short_paths = {}
+
+# 帧标识：(函数名, 文件, 起始行号)
+Frame = Tuple[str, str, int]
+
+
+def _short_path(filename: str) -> str:
+    """项目文件显示相对路径，第三方库显示包内路径"""
+    short = _short_paths.get(filename)
+    if short is None:
+        base = str(BASE_DIR) + os.sep
+        if filename.startswith(base):
+            short = filename[len(base):]
+        elif _SITE_PACKAGES in filename:
+            short = filename.split(_SITE_PACKAGES, 1)[1]
+        else:
+            short = os.path.join(os.path.basename(os.path.dirname(filename)), os.path.basename(filename))
+        _short_paths[filename] = short
+    return short
+
+
+def _frame_key(frame) -> Frame:
+    code = frame.f_code
+    return (code.co_name, _short_path(code.co_filename), code.co_firstlineno)
+
+
+def _running_stack(frame) -> Tuple[Frame, ...]:
+    """正在运行的调用栈（根在前），去掉事件循环本身的帧"""
+    frames = []
+    while frame is not None and len(frames) < MAX_STACK_DEPTH:
+        code = frame.f_code
+        # asyncio.events.Handle._run 之下是事件循环，之上是任务的协程
+        if code.co_name == "_run" and code.co_filename.endswith(_ASYNCIO_EVENTS_FILE):
+            break
+        frames.append(_frame_key(frame))
+        frame = frame.f_back
+    frames.reverse()
+    return tuple(frames)
+
+
+def _await_stack(coro) -> Tuple[Frame, ...]:
+    """挂起任务的 await 链（根在前），叶子为 [await]"""
+    frames = []
+    while coro is not None and len(frames) < MAX_STACK_DEPTH:
+        frame = getattr(coro, "cr_frame", None) or getattr(coro, "gi_frame", None)
+        if frame is None:
+            break
+        frames.append(_frame_key(frame))
+        coro = getattr(coro, "cr_await", None) or getattr(coro, "gi_yieldfrom", None)
+    frames.append(AWAIT_FRAME)
+    return tuple(frames)
+
+
+class StackSampler:
+    """在后台线程中定时采样一个任务的调用栈"""
+
+    def __init__(self, task: asyncio.Task, interval: float = PROFILE_SAMPLE_INTERVAL):
+        self.task = task
+        self.loop = task.get_loop()
+        self.loop_thread_id = threading.get_ident()
+        self.interval = interval
+        self.samples: Counter = Counter()
+        self.sample_count = 0
+        self.duration = 0.0
+        self._stop_event = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="perss-profiler", daemon=True)
+
+    def start(self):
+        self._started = time.perf_counter()
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        self._thread.join()
+        self.duration = time.perf_counter() - self._started
+
+    def _run(self):
+        last = time.perf_counter()
+        while not self._stop_event.wait(self.interval):
+            now = time.perf_counter()
+            stack = self._sample()
+            if stack:
+                # 线程切换可能推迟采样，以实际间隔作为权重
+                self.samples[stack] += max(1, int((now - last) * 1e6))
+                self.sample_count += 1
+            last = now
+
+    def _sample(self) -> Optional[Tuple[Frame, ...]]:
+        task = self.task
+        if task.done():
+            return None
+        if asyncio.current_task(self.loop) is task:
+            frame = sys._current_frames().get(self.loop_thread_id)
+            return _running_stack(frame) if frame is not None else None
+        return _await_stack(task.get_coro())
+
+
+def to_collapsed(samples: Counter) -> str:
+    """折叠栈格式：每行 "根;...;叶 权重" """
+    lines = []
+    for stack, weight in sorted(samples.items()):
+        names = [f"{name} ({path}:{line})" if path else name for name, path, line in stack]
+        lines.append(f"{';'.join(name.replace(';', ':') for name in names)} {weight}")
+    return "\n".join(lines) + "\n"
+
+
+def to_speedscope(samples: Counter, name: str, duration: float) -> dict:
+    """speedscope 文件格式（sampled 类型，单位微秒）"""
+    frame_index = {}
+    frames = []
+    stacks = []
+    weights = []
+    for stack, weight in samples.items():
+        indexes = []
+        for frame in stack:
+            if frame not in frame_index:
+                frame_index[frame] = len(frames)
+                func, path, line = frame
+                frames.append({"name": func, "file": path, "line": line} if path else {"name": func})
+            indexes.append(frame_index[frame])
+        stacks.append(indexes)
+        weights.append(weight)
+    return {
+        "$schema": "https://www.speedscope.app/file-format-schema.json",
+        "exporter": "PERSS",
+        "name": name,
+        "activeProfileIndex": 0,
+        "shared": {"frames": frames},
+        "profiles": [{
+            "type": "sampled",
+            "name": name,
+            "unit": "microseconds",
+            "startValue": 0,
+            "endValue": max(sum(weights), int(duration * 1e6)),
+            "samples": stacks,
+            "weights": weights,
+        }],
+    }
+
+
+class RequestProfilerMiddleware:
+    """
+    ASGI中间件：对带有剖析令牌的单个请求采样剖析
+
+    应放在其他 http 中间件的内层，使当前任务就是处理请求的任务。未带令牌的请求只多一次请求头检查。
+    """
+
+    def __init__(self, app, token: str = PROFILE_TOKEN, output_dir: str = PROFILE_DIR,
+                 interval: float = PROFILE_SAMPLE_INTERVAL):
+        self.app = app
+        self.token = token.encode("utf-8")
+        self.output_dir = output_dir
+        self.interval = interval
+
+    def _requested_format(self, scope) -> Optional[str]:
+        """请求要求剖析且令牌正确时返回输出格式，否则返回 None"""
+        token = fmt = None
+        for key, value in scope["headers"]:
+            if key == b"x-profile-token":
+                token = value
+            elif key == b"x-profile-format":
+                fmt = value.decode("latin-1")
+        if token is None:
+            query_string = scope.get("query_string", b"")
+            if b"profile_token=" not in query_string:
+                return None
+            query = parse_qs(query_string.decode("latin-1"))
+            token = query.get("profile_token", [""])[0].encode("latin-1")
+            fmt = fmt or query.get("profile_format", [None])[0]
+
+        if not self.token or not hmac.compare_digest(token, self.token):
+            logger.warning(f"剖析令牌无效，按普通请求处理: {scope['method']} {scope['path']}")
+            return None
+        fmt = (fmt or "speedscope").lower()
+        return fmt if fmt in PROFILE_FORMATS else "speedscope"
+
+    async def __call__(self, scope, receive, send):
+        fmt = self._requested_format(scope) if scope["type"] == "http" else None
+        if fmt is None:
+            await self.app(scope, receive, send)
+            return
+
+        name = f"{scope['method']} {scope['path']}"
+        slug = re.sub(r"[^A-Za-z0-9]+", "_", scope["path"]).strip("_")[:60] or "root"
+        filename = f"{time.strftime('%Y%m%d-%H%M%S')}-{scope['method']}-{slug}-{uuid.uuid4().hex[:6]}.{PROFILE_FORMATS[fmt]}"
+
+        async def send_with_header(message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((b"x-profile-file", filename.encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        sampler = StackSampler(asyncio.current_task(), self.interval)
+        sampler.start()
+        try:
+            await self.app(scope, receive, send_with_header)
+        finally:
+            sampler.stop()
+            self._save(filename, fmt, name, sampler)
+
+    def _save(self, filename: str, fmt: str, name: str, sampler: StackSampler):
+        path = os.path.join(self.output_dir, filename)
+        try:
+            os.makedirs(self.output_dir, exist_ok=True)
+            if fmt == "collapsed":
+                content = to_collapsed(sampler.samples)
+            else:
+                content = json.dumps(to_speedscope(sampler.samples, name, sampler.duration), ensure_ascii=False)
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(content)
+        except OSError as e:
+            logger.error(f"保存剖析结果失败: {e}")
+            return
+        logger.info(f"请求剖析已保存: {path}（{name}，{sampler.duration * 1000:.0f}ms，{sampler.sample_count}个样本）")
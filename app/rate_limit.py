@@ -0,0 +1,199 @@
+"""AI接口限流：按学生姓名和客户端IP的令牌桶，超出时返回429"""
+import logging
+import math
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from fastapi import HTTPException, Request
+from starlette.requests import HTTPConnection
+
+from app.config import (
+    RATE_LIMIT_ENABLED,
+    RATE_LIMITS,
+    RATE_LIMIT_BACKEND,
+    RATE_LIMIT_DB_PATH,
+    RATE_LIMIT_TRUST_PROXY,
+)
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+# 进程内最多保留的桶数，超出时淘汰最久未使用的桶（相当于把它重新装满）
+MAX_MEMORY_BUCKETS = 20000
+# SQLite后端每处理这么多次请求清理一次长时间未使用的桶
+SQLITE_CLEANUP_EVERY = 1000
+SQLITE_STALE_SECONDS = 3600
+
+
+class BucketSpec(NamedTuple):
+    """一个令牌桶：键、容量和每秒补充的令牌数"""
+    key: str
+    capacity: float
+    rate: float
+
+
+def _refill(state: Optional[Tuple[float, float]], spec: BucketSpec, now: float) -> float:
+    """按经过的时间补充令牌，不存在的桶视为满的"""
+    if state is None:
+        return spec.capacity
+    tokens, updated = state
+    return min(spec.capacity, tokens + max(0.0, now - updated) * spec.rate)
+
+
+def _wait_seconds(levels: List[float], specs: List[BucketSpec]) -> float:
+    """所有桶都至少有一个令牌时返回0，否则返回最早可以放行的等待秒数"""
+    return max((1.0 - level) / spec.rate if level < 1.0 else 0.0 for level, spec in zip(levels, specs))
+
+
+class MemoryBucketStore:
+    """进程内的令牌桶，多个worker进程时每个进程各自计数"""
+
+    def __init__(self, max_buckets: int = MAX_MEMORY_BUCKETS):
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+        self._max_buckets = max_buckets
+        self._lock = threading.Lock()
+
+    def take(self, specs: List[BucketSpec]) -> float:
+        """从每个桶各取一个令牌；任一桶不足时都不取，返回需要等待的秒数"""
+        now = time.monotonic()
+        with self._lock:
+            levels = [_refill(self._buckets.get(spec.key), spec, now) for spec in specs]
+            wait = _wait_seconds(levels, specs)
+            if wait > 0:
+                return wait
+            for spec, level in zip(specs, levels):
+                self._buckets[spec.key] = (level - 1.0, now)
+                self._buckets.move_to_end(spec.key)
+            while len(self._buckets) > self._max_buckets:
+                self._buckets.popitem(last=False)
+            return 0.0
+
+
+class SQLiteBucketStore:
+    """
+    保存在独立SQLite文件中的令牌桶，多个worker进程共享同一份计数
+
+    限流状态丢失无关紧要，所以关闭同步写盘；每次取令牌在一个 BEGIN IMMEDIATE 事务中完成。
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self._calls = 0
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=OFF")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS rate_buckets ("
+                "key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL) WITHOUT ROWID"
+            )
+            self._local.conn = conn
+        return conn
+
+    def take(self, specs: List[BucketSpec]) -> float:
+        """与 MemoryBucketStore.take 相同，时间使用各进程一致的系统时间"""
+        conn = self._connection()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            levels = []
+            for spec in specs:
+                row = conn.execute("SELECT tokens, updated FROM rate_buckets WHERE key = ?", (spec.key,)).fetchone()
+                levels.append(_refill(row, spec, now))
+            wait = _wait_seconds(levels, specs)
+            if wait == 0:
+                conn.executemany(
+                    "INSERT INTO rate_buckets (key, tokens, updated) VALUES (?, ?, ?) "
+                    "ON CONFLICT(key) DO UPDATE SET tokens = excluded.tokens, updated = excluded.updated",
+                    [(spec.key, level - 1.0, now) for spec, level in zip(specs, levels)],
+                )
+            self._calls += 1
+            if self._calls % SQLITE_CLEANUP_EVERY == 0:
+                conn.execute("DELETE FROM rate_buckets WHERE updated < ?", (now - SQLITE_STALE_SECONDS,))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return wait
+
+
+class RateLimiter:
+    """按预算（如 chat、analysis）检查学生桶和IP桶"""
+
+    def __init__(self, store, limits: Dict[str, Dict[str, Tuple[int, float]]]):
+        self.store = store
+        self.limits = limits
+
+    def _specs(self, budget: str, user: Optional[str], ip: Optional[str]) -> List[BucketSpec]:
+        specs = []
+        for scope, identity in (("user", user), ("ip", ip)):
+            if not identity or scope not in self.limits[budget]:
+                continue
+            capacity, period = self.limits[budget][scope]
+            specs.append(BucketSpec(f"{budget}:{scope}:{identity}", float(capacity), capacity / period))
+        return specs
+
+    def check(self, budget: str, user: Optional[str] = None, ip: Optional[str] = None) -> float:
+        """放行时返回0并消耗令牌，否则返回需要等待的秒数"""
+        specs = self._specs(budget, user, ip)
+        if not specs:
+            return 0.0
+        try:
+            return self.store.take(specs)
+        except sqlite3.Error as e:
+            # 限流存储出错时放行，不影响正常使用
+            logger.error(f"限流状态读写失败，本次请求不限流: {e}")
+            return 0.0
+
+
+def _create_store():
+    """按配置创建限流状态存储"""
+    if RATE_LIMIT_BACKEND == "sqlite":
+        logger.info(f"AI接口限流使用SQLite共享状态: {RATE_LIMIT_DB_PATH}")
+        return SQLiteBucketStore(RATE_LIMIT_DB_PATH)
+    return MemoryBucketStore()
+
+
+# 全局限流器
+rate_limiter = RateLimiter(_create_store(), RATE_LIMITS)
+
+
+def client_ip(request: HTTPConnection) -> Optional[str]:
+    """识别客户端IP，只在配置信任反向代理时读取 X-Forwarded-For"""
+    if RATE_LIMIT_TRUST_PROXY:
+        forwarded = request.headers.get("x-forwarded-for")
+        if forwarded:
+            return forwarded.split(",")[0].strip()
+    return request.client.host if request.client else None
+
+
+def retry_after_seconds(conn: HTTPConnection, budget: str, user: Optional[str] = None) -> int:
+    """放行时返回0并消耗令牌，否则返回需要等待的整秒数（HTTP请求和WebSocket连接通用）"""
+    if not RATE_LIMIT_ENABLED:
+        return 0
+    user = (user or "").strip() or None
+    ip = client_ip(conn)
+    wait = rate_limiter.check(budget, user=user, ip=ip)
+    if wait <= 0:
+        return 0
+    retry_after = max(1, math.ceil(wait))
+    logger.warning(f"限流: {budget} user={user} ip={ip}，{retry_after}秒后可重试")
+    return retry_after
+
+
+def enforce_rate_limit(request: Request, budget: str, user: Optional[str] = None):
+    """超出预算时抛出429，Retry-After 为最早可以重试的秒数"""
+    retry_after = retry_after_seconds(request, budget, user)
+    if retry_after:
+        raise HTTPException(
+            status_code=429,
+            detail=f"请求过于频繁，请{retry_after}秒后再试",
+            headers={"Retry-After": str(retry_after)},
+        )
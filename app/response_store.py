@@ -0,0 +1,133 @@
+"""预编码响应缓存：静态内容按内容版本只序列化、压缩一次，之后直接返回字节"""
+import gzip
+import json
+import logging
+import threading
+from typing import Any, Callable, Dict, Optional
+
+from fastapi import Request, Response
+from pydantic import BaseModel
+
+try:
+    import brotli
+except ImportError:  # brotli 已列入 requirements.txt，未安装时只提供gzip
+    brotli = None
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+# 小于该字节数的响应不压缩，压缩收益抵不过头部开销
+MIN_COMPRESS_BYTES = 512
+GZIP_LEVEL = 9
+BROTLI_QUALITY = 11
+# 协商时的优先顺序
+ENCODING_PREFERENCE = ("br", "gzip", "identity")
+
+
+def encode_json(payload: Any) -> bytes:
+    """编码响应内容；响应模型由 pydantic 直接序列化为字节，省略值为 None 的字段"""
+    if isinstance(payload, BaseModel):
+        return payload.model_dump_json(by_alias=True, exclude_none=True).encode("utf-8")
+    return json.dumps(payload, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+
+def parse_accept_encoding(header: Optional[str]) -> Dict[str, float]:
+    """解析 Accept-Encoding，返回 编码 -> q值"""
+    accepted: Dict[str, float] = {}
+    for part in (header or "").split(","):
+        coding, _, params = part.strip().partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        accepted[coding] = q
+    return accepted
+
+
+def choose_encoding(header: Optional[str], available) -> str:
+    """按客户端的 Accept-Encoding 选择可用编码，无可用压缩时返回 identity"""
+    accepted = parse_accept_encoding(header)
+    wildcard = accepted.get("*")
+    for coding in ENCODING_PREFERENCE:
+        if coding not in available or coding == "identity":
+            continue
+        q = accepted.get(coding, wildcard if wildcard is not None else 0.0)
+        if q > 0:
+            return coding
+    return "identity"
+
+
+class EncodedEntry:
+    """一个资源在某个版本下的全部编码结果"""
+
+    __slots__ = ("etag", "variants")
+
+    def __init__(self, etag: str, body: bytes):
+        self.etag = etag
+        self.variants: Dict[str, bytes] = {"identity": body}
+        if len(body) >= MIN_COMPRESS_BYTES:
+            self.variants["gzip"] = gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+            if brotli is not None:
+                self.variants["br"] = brotli.compress(body, quality=BROTLI_QUALITY)
+
+
+class ResponseStore:
+    """
+    预编码响应缓存
+
+    每个资源只保留当前ETag（即当前内容版本）对应的一份编码结果：
+    原始JSON、gzip 和（安装了 brotli 时）br。ETag变化后首个请求重新生成。
+    """
+
+    def __init__(self):
+        self._entries: Dict[str, EncodedEntry] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str, etag: str, build: Callable[[], Optional[Any]]) -> Optional[EncodedEntry]:
+        """取出资源的编码结果，不存在或版本不符时调用 build 生成；build 返回 None 时不缓存"""
+        entry = self._entries.get(key)
+        if entry is not None and entry.etag == etag:
+            return entry
+        payload = build()
+        if payload is None:
+            return None
+        entry = EncodedEntry(etag, encode_json(payload))
+        with self._lock:
+            self._entries[key] = entry
+        sizes = ", ".join(f"{name}={len(body)}" for name, body in entry.variants.items())
+        logger.info(f"生成预编码响应 {key} {etag}: {sizes}")
+        return entry
+
+    def serve(self, request: Request, key: str, etag: str, build: Callable[[], Optional[Any]],
+              cache_control: str, last_modified: Optional[str] = None) -> Optional[Response]:
+        """按客户端支持的编码返回缓存的响应字节；build 返回 None 时返回 None"""
+        entry = self.get(key, etag, build)
+        if entry is None:
+            return None
+        coding = choose_encoding(request.headers.get("accept-encoding"), entry.variants)
+        headers = {
+            # 同一资源的不同编码是不同的表示，使用不同的强ETag
+            "ETag": etag if coding == "identity" else f'{etag[:-1]}-{coding}"',
+            "Cache-Control": cache_control,
+            "Vary": "Accept-Encoding",
+        }
+        if last_modified:
+            headers["Last-Modified"] = last_modified
+        if coding != "identity":
+            headers["Content-Encoding"] = coding
+        return Response(content=entry.variants[coding], media_type="application/json", headers=headers)
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            self._entries.clear()
+
+
+# 全局响应缓存
+response_store = ResponseStore()
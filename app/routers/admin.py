@@ -0,0 +1,31 @@
+import asyncio
+import logging
+from fastapi import APIRouter, Depends, HTTPException
+
+from app.auth import require_admin_token
+from app.maintenance import maintenance_scheduler, request_load, wal_size
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+# 创建路由，全部接口需要管理令牌
+router = APIRouter(dependencies=[Depends(require_admin_token)])
+
+@router.get("/admin/maintenance")
+async def maintenance_status():
+    """查看数据库维护状态：WAL大小、最近一次检查点和统计信息更新的耗时"""
+    status = dict(maintenance_scheduler.status)
+    status["wal_bytes"] = wal_size()
+    status["in_flight_requests"] = request_load.in_flight
+    return status
+
+@router.post("/admin/maintenance/run")
+async def run_maintenance():
+    """立即执行一轮维护（TRUNCATE检查点、PRAGMA optimize、增量清理）"""
+    try:
+        status = await asyncio.to_thread(maintenance_scheduler.run_once, True)
+    except Exception as e:
+        logger.error(f"手动执行数据库维护失败: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"数据库维护失败: {str(e)}")
+    logger.info("手动执行数据库维护完成")
+    return status
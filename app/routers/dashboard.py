@@ -0,0 +1,51 @@
+import logging
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
+
+from app.auth import require_admin_token
+from app.dashboard import (
+    DEFAULT_PAGE_SIZE,
+    MAX_PAGE_SIZE,
+    DEFAULT_TOP_QUESTIONS,
+    MAX_TOP_QUESTIONS,
+    DashboardError,
+    class_summaries,
+    list_students,
+)
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+# 创建路由，看板返回学生的个人信息和成绩，只对持有管理令牌的教师开放
+router = APIRouter(dependencies=[Depends(require_admin_token)])
+
+@router.get("/dashboard/students")
+async def dashboard_students(
+    grade: Optional[str] = Query(None, description="按年级筛选"),
+    major: Optional[str] = Query(None, description="按专业筛选"),
+    stage: Optional[str] = Query(None, description="学习进度：profile、pre_test、pre_strategy、post_test、completed"),
+    sort: str = Query("id", description="排序：id（注册顺序）、post_score、after_score（分数从高到低）"),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE, description="每页条数"),
+    cursor: Optional[str] = Query(None, description="上一页返回的 next_cursor"),
+):
+    """教师端学生名单，键集分页"""
+    try:
+        return list_students(grade=grade, major=major, stage=stage, sort=sort, limit=limit, cursor=cursor)
+    except DashboardError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"获取学生名单失败: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"获取学生名单时发生错误: {str(e)}")
+
+@router.get("/dashboard/classes")
+async def dashboard_classes(
+    grade: Optional[str] = Query(None, description="按年级筛选"),
+    major: Optional[str] = Query(None, description="按专业筛选"),
+    top: int = Query(DEFAULT_TOP_QUESTIONS, ge=0, le=MAX_TOP_QUESTIONS, description="每个班级返回的高频错题数"),
+):
+    """按班级汇总完成人数、前后测和策略量表平均分、错误人数最多的题目"""
+    try:
+        return class_summaries(grade=grade, major=major, top_questions=top)
+    except Exception as e:
+        logger.error(f"获取班级汇总失败: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"获取班级汇总时发生错误: {str(e)}")
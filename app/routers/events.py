@@ -0,0 +1,46 @@
+import logging
+from functools import partial
+from fastapi import APIRouter, HTTPException, Request
+
+from app.database import insert_events
+from app.events import MAX_BODY_BYTES, EventBatchError, decode_body, parse_event_batch
+from app.write_batcher import run_write
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+# 创建路由
+router = APIRouter()
+
+@router.post("/events")
+async def ingest_events(request: Request):
+    """
+    批量接收学习行为事件
+
+    请求体为NDJSON（每行一个事件），可用gzip压缩；一批事件在同一个事务中写入。
+    事件字段：type（必填）、ts（毫秒时间戳）、name、session、page、item、value、data。
+    """
+    # 边读边检查大小，不把超大请求体读入内存
+    body = bytearray()
+    async for chunk in request.stream():
+        body.extend(chunk)
+        if len(body) > MAX_BODY_BYTES:
+            raise HTTPException(status_code=413, detail=f"请求体超过 {MAX_BODY_BYTES} 字节")
+
+    try:
+        rows, rejected, errors = parse_event_batch(
+            decode_body(bytes(body), request.headers.get("content-encoding"))
+        )
+    except EventBatchError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+
+    if rows:
+        try:
+            await run_write(partial(insert_events, rows=rows))
+        except Exception as e:
+            logger.error(f"写入事件失败（{len(rows)} 条）: {e}", exc_info=True)
+            raise HTTPException(status_code=500, detail=f"写入事件失败: {str(e)}")
+
+    if rejected:
+        logger.warning(f"事件上报中有 {rejected} 条无效: {errors[:3]}")
+    return {"accepted": len(rows), "rejected": rejected, "errors": errors}
@@ -1,13 +1,18 @@
 import logging
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request, Response, WebSocket
 from typing import Dict
 from fastapi import Depends
 from sqlalchemy.orm import Session
 import asyncio
 
 from app.database import get_user_profile
-from app.schemas.user import UserMessage
+from app.config import PROFILE_CACHE_CONTROL, ANALYSIS_CACHE_CONTROL
+from app.http_cache import check_not_modified, content_state, profile_etag, set_cache_headers
+from app.schemas.user import UserMessage, UserDetailResponse
+from app.schemas.analysis import AnalysisResponse, StrategyAdviceResponse, ChatResponse
+from app.rate_limit import enforce_rate_limit
 from app import ai_service
+from app.chat_session import ChatConnection
 
 # 配置日志
 logger = logging.getLogger(__name__)
@@ -15,8 +20,8 @@ logger = logging.getLogger(__name__)
 # 创建路由
 router = APIRouter()
 
-@router.get("/user/{name}")
-async def get_user(name: str):
+@router.get("/user/{name}", response_model=UserDetailResponse)
+async def get_user(name: str, request: Request, response: Response):
     """获取用户信息"""
     try:
         # 如果数据库函数无法使用，使用硬编码内容
@@ -24,6 +29,11 @@ async def get_user(name: str):
             user_profile = get_user_profile(name)
             if not user_profile:
                 raise ValueError("用户不存在")
+            etag = profile_etag(user_profile, "user")
+            cached = check_not_modified(request, etag, PROFILE_CACHE_CONTROL)
+            if cached:
+                return cached
+            set_cache_headers(response, etag, PROFILE_CACHE_CONTROL)
         except:
             # 示例用户数据
             user_profile = {
@@ -31,9 +41,9 @@ async def get_user(name: str):
                 "grade": "大三",
                 "major": "计算机科学",
                 "gender": "男",
-                "post_score": "80",
+                "post_score": 80,
                 "false_id": "1-2,1-3,2-1",
-                "post_strategies_score": "45"
+                "post_strategies_score": 45
             }
 
         logger.info(f"获取用户{name}信息成功")
@@ -42,8 +52,8 @@ async def get_user(name: str):
         logger.error(f"获取用户信息失败: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.get("/analyze-profile/{name}")
-async def analyze_profile(name: str):
+@router.get("/analyze-profile/{name}", response_model=AnalysisResponse, response_model_exclude_none=True)
+async def analyze_profile(name: str, request: Request, response: Response):
     """分析用户画像"""
     try:
         # 获取用户信息
@@ -59,12 +69,22 @@ async def analyze_profile(name: str):
                 "grade": "大三",
                 "major": "计算机科学",
                 "gender": "男",
-                "post_score": "80",
+                "post_score": 80,
                 "false_id": "1-2,1-3,2-1",
-                "post_strategies_score": "45"
+                "post_strategies_score": 45
             }
             logger.warning(f"使用示例数据代替: {user_profile}")
 
+        # 画像未变化时直接返回304，不重复调用AI服务
+        etag = profile_etag(user_profile, "analyze-profile", weak=True)
+        if etag:
+            cached = check_not_modified(request, etag, ANALYSIS_CACHE_CONTROL)
+            if cached:
+                return cached
+
+        # 限制每个学生和每个IP调用AI服务的频率，超出时返回429
+        enforce_rate_limit(request, "analysis", name)
+
         # 如果AI服务无法使用，使用硬编码内容
         try:
             # 设置较长的超时时间，防止请求阻塞
@@ -73,12 +93,13 @@ async def analyze_profile(name: str):
                 ai_service.analyze_user_profile(user_profile),
                 timeout=125.0  # 55秒超时，留有余量
             )
-            logger.info(f"AI服务返回结果: {result}")
+            logger.debug("AI服务返回结果: %s", result)
             if result.get("success"):
                 analysis = result.get("analysis", "")
                 if not analysis:
                     logger.warning("AI服务返回了空的分析结果，使用默认内容")
                     raise ValueError("空分析结果")
+                set_cache_headers(response, etag, ANALYSIS_CACHE_CONTROL)
             else:
                 # 如果AI服务返回失败但有fallback内容，使用fallback
                 fallback = result.get("fallback_content")
@@ -149,12 +170,14 @@ async def analyze_profile(name: str):
         response_data = {"success": True, "analysis": analysis}
         logger.info(f"分析用户{name}画像成功")
         return response_data
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"分析用户画像失败: {e}", exc_info=True)
         return {"success": True, "error": str(e), "analysis": "抱歉，分析过程中出现错误，请稍后再试。"}
 
-@router.get("/analyze-wrong-answers/{name}")
-async def analyze_wrong_answers(name: str):
+@router.get("/analyze-wrong-answers/{name}", response_model=AnalysisResponse, response_model_exclude_none=True)
+async def analyze_wrong_answers(name: str, request: Request, response: Response):
     """分析错题"""
     try:
         # 获取用户信息
@@ -170,12 +193,23 @@ async def analyze_wrong_answers(name: str):
                 "grade": "大三",
                 "major": "计算机科学",
                 "gender": "男",
-                "post_score": "80",
+                "post_score": 80,
                 "false_id": "1-2,1-3,2-1",
-                "post_strategies_score": "45"
+                "post_strategies_score": 45
             }
             logger.warning(f"使用示例数据代替: {user_profile}")
 
+        # 画像未变化时直接返回304，不重复调用AI服务
+        # 错题分析还依赖试卷内容，校验值同时包含内容版本
+        etag = profile_etag(user_profile, f"analyze-wrong-answers:{content_state()[0]}", weak=True)
+        if etag:
+            cached = check_not_modified(request, etag, ANALYSIS_CACHE_CONTROL)
+            if cached:
+                return cached
+
+        # 限制每个学生和每个IP调用AI服务的频率，超出时返回429
+        enforce_rate_limit(request, "analysis", name)
+
         # 如果AI服务无法使用，使用硬编码内容
         try:
             # 设置较长的超时时间，防止请求阻塞
@@ -184,12 +218,13 @@ async def analyze_wrong_answers(name: str):
                 ai_service.analyze_wrong_answers(user_profile, [1, 2]),
                 timeout=125.0  # 55秒超时，留有余量
             )
-            logger.info(f"AI服务返回结果: {result}")
+            logger.debug("AI服务返回结果: %s", result)
             if result.get("success"):
                 analysis = result.get("analysis", "")
                 if not analysis:
                     logger.warning("AI服务返回了空的分析结果，使用默认内容")
                     raise ValueError("空分析结果")
+                set_cache_headers(response, etag, ANALYSIS_CACHE_CONTROL)
             else:
                 # 如果AI服务返回失败但有fallback内容，使用fallback
                 fallback = result.get("fallback_content")
@@ -249,12 +284,14 @@ async def analyze_wrong_answers(name: str):
 
         logger.info(f"分析用户{name}错题成功")
         return {"success": True, "analysis": analysis}
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"分析错题失败: {e}", exc_info=True)
         return {"success": True, "error": str(e), "analysis": "抱歉，分析错题过程中出现错误，请稍后再试。"}
 
-@router.get("/suggest-strategies/{name}")
-async def suggest_strategies(name: str):
+@router.get("/suggest-strategies/{name}", response_model=StrategyAdviceResponse, response_model_exclude_none=True)
+async def suggest_strategies(name: str, request: Request, response: Response):
     """推荐阅读策略"""
     try:
         # 获取用户信息
@@ -270,12 +307,22 @@ async def suggest_strategies(name: str):
                 "grade": "大三",
                 "major": "计算机科学",
                 "gender": "男",
-                "post_score": "80",
+                "post_score": 80,
                 "false_id": "1-2,1-3,2-1",
-                "post_strategies_score": "45"
+                "post_strategies_score": 45
             }
             logger.warning(f"使用示例数据代替: {user_profile}")
 
+        # 画像未变化时直接返回304，不重复调用AI服务
+        etag = profile_etag(user_profile, "suggest-strategies", weak=True)
+        if etag:
+            cached = check_not_modified(request, etag, ANALYSIS_CACHE_CONTROL)
+            if cached:
+                return cached
+
+        # 限制每个学生和每个IP调用AI服务的频率，超出时返回429
+        enforce_rate_limit(request, "analysis", name)
+
         # 如果AI服务无法使用，使用硬编码内容
         try:
             # 设置较长的超时时间，防止请求阻塞
@@ -284,12 +331,13 @@ async def suggest_strategies(name: str):
                 ai_service.suggest_reading_strategies(user_profile),
                 timeout=125.0  # 55秒超时，留有余量
             )
-            logger.info(f"AI服务返回结果: {result}")
+            logger.debug("AI服务返回结果: %s", result)
             if result.get("success"):
                 suggestions = result.get("suggestions", "")
                 if not suggestions:
                     logger.warning("AI服务返回了空的策略建议，使用默认内容")
                     raise ValueError("空策略建议")
+                set_cache_headers(response, etag, ANALYSIS_CACHE_CONTROL)
             else:
                 # 如果AI服务返回失败但有fallback内容，使用fallback
                 fallback = result.get("fallback_content")
@@ -416,17 +464,25 @@ async def suggest_strategies(name: str):
         response_data = {"success": True, "suggestions": suggestions}
         logger.info(f"为用户{name}推荐阅读策略成功")
         return response_data
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"推荐阅读策略失败: {e}", exc_info=True)
         return {"success": True, "error": str(e), "suggestions": "抱歉，推荐过程中出现错误，请稍后再试。"}
 
-@router.post("/chat")
-async def chat(user_message: UserMessage):
+@router.websocket("/ws/chat/{name}")
+async def chat_socket(websocket: WebSocket, name: str):
+    """AI对话的WebSocket通道：画像只在连接时加载一次，回复逐段推送，可取消"""
+    await ChatConnection(websocket, name).run()
+
+@router.post("/chat", response_model=ChatResponse, response_model_exclude_none=True)
+async def chat(user_message: UserMessage, request: Request):
     """与AI交互"""
+    enforce_rate_limit(request, "chat", user_message.name)
     try:
         name = user_message.name
         message = user_message.message
-        logger.info(f"用户{name}发送消息: {message}")
+        logger.info("用户%s发送消息: %s", name, message)
 
         # 如果AI服务无法使用，使用硬编码内容
         try:
@@ -443,9 +499,9 @@ async def chat(user_message: UserMessage):
                     "grade": "大三",
                     "major": "计算机科学",
                     "gender": "男",
-                    "post_score": "80",
+                    "post_score": 80,
                     "false_id": "1-2,1-3,2-1",
-                    "post_strategies_score": "45"
+                    "post_strategies_score": 45
                 }
                 logger.warning(f"使用示例数据代替: {user_profile}")
 
@@ -455,7 +511,7 @@ async def chat(user_message: UserMessage):
                 ai_service.process_user_message(user_profile, message),
                 timeout=125.0  # 55秒超时，留有余量
             )
-            logger.info(f"AI服务返回结果: {result}")
+            logger.debug("AI服务返回结果: %s", result)
             if result.get("success"):
                 response = result.get("response", "")
                 if not response:
@@ -1,7 +1,11 @@
 import logging
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request, Response
 
 from app.database import get_user_profile
+from app.config import ANALYSIS_CACHE_CONTROL
+from app.http_cache import check_not_modified, profile_etag, set_cache_headers
+from app.schemas.analysis import SummaryResponse
+from app.rate_limit import enforce_rate_limit
 from app import ai_service
 
 # 配置日志
@@ -10,8 +14,8 @@ logger = logging.getLogger(__name__)
 # 创建路由
 router = APIRouter()
 
-@router.get("/final-summary/{name}")
-async def final_summary(name: str):
+@router.get("/final-summary/{name}", response_model=SummaryResponse)
+async def final_summary(name: str, request: Request, response: Response):
     """生成学习总结"""
     try:
         # 获取用户信息
@@ -26,17 +30,29 @@ async def final_summary(name: str):
                 "grade": "大三",
                 "major": "计算机科学",
                 "gender": "男",
-                "post_score": "80",
-                "after_score": "90",
+                "post_score": 80,
+                "after_score": 90,
                 "false_id": "1-2,1-3,2-1",
-                "post_strategies_score": "45",
-                "after_strategies_score": "60"
+                "post_strategies_score": 45,
+                "after_strategies_score": 60
             }
 
+        # 画像未变化时直接返回304，不重复调用AI服务
+        etag = profile_etag(user_profile, "final-summary", weak=True)
+        if etag:
+            cached = check_not_modified(request, etag, ANALYSIS_CACHE_CONTROL)
+            if cached:
+                return cached
+
+        # 限制每个学生和每个IP调用AI服务的频率，超出时返回429
+        enforce_rate_limit(request, "analysis", name)
+
         # 如果AI服务无法使用，使用硬编码内容
         try:
             result = await ai_service.generate_final_summary(user_profile)
             summary = result.get("summary", "")
+            if result.get("success") and summary:
+                set_cache_headers(response, etag, ANALYSIS_CACHE_CONTROL)
         except:
             summary = """
             # 学习总结报告
@@ -94,6 +110,8 @@ async def final_summary(name: str):
 
         logger.info(f"生成用户{name}学习总结成功")
         return {"success": True, "summary": summary}
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"生成学习总结失败: {e}")
         raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
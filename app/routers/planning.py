@@ -1,6 +1,7 @@
 import logging
-from fastapi import APIRouter, HTTPException, Body
-from typing import List, Dict, Any
+from functools import partial
+from fastapi import APIRouter, Depends, HTTPException, Body, Request, Response
+from typing import List, Dict, Any, Optional, Union
 from pydantic import ValidationError
 
 from app.database import (
@@ -8,13 +9,41 @@ from app.database import (
     get_self_rate_items,
     get_strategy_items,
     get_exam_by_id,
-    create_user_profile,
+    insert_user_profile,
     update_user_profile,
-    get_user_profile
+    get_user_profile,
+    get_bootstrap_content,
+    apply_exam_result,
+    apply_strategy_result,
+    ExamAlreadyRecordedError,
+)
+from app.auth import require_admin_token
+from app.idempotency import idempotent_write
+from app.grading import GradingError, grade_exam
+from app.config import (
+    BOOTSTRAP_EXAM_IDS,
+    CONTENT_CACHE_CONTROL,
+    EXAM_CACHE_CONTROL,
+    BOOTSTRAP_CACHE_CONTROL,
+)
+from app.http_cache import check_not_modified, content_validators
+from app.response_store import response_store
+from app.schemas.user import UserProfileCreate, UserProfileCreateResponse
+from app.schemas.exam import (
+    ExamResult,
+    ExamResponse,
+    ExamErrorResponse,
+    ExamResultResponse,
+    ExamSubmission,
+    ExamGradeResponse,
+)
+from app.schemas.strategy import StrategyResult, StrategyResultResponse
+from app.schemas.content import (
+    IntroductionResponse,
+    SelfRateResponse,
+    StrategyListResponse,
+    BootstrapResponse,
 )
-from app.schemas.user import UserProfileCreate
-from app.schemas.exam import ExamResult
-from app.schemas.strategy import StrategyResult
 
 # 配置日志
 logger = logging.getLogger(__name__)
@@ -22,70 +51,135 @@ logger = logging.getLogger(__name__)
 # 创建路由
 router = APIRouter()
 
-@router.get("/introduction")
-async def introduction():
+def _introduction_payload() -> IntroductionResponse:
+    """构造系统介绍的响应内容"""
+    intro_text = get_introduction() # 从数据库获取
+    if not intro_text:
+        # 提供一个默认值，以防数据库返回空
+        intro_text = "欢迎使用个性化英语阅读支持系统。"
+        logger.warning("/introduction 未能从数据库获取到内容，使用默认值。")
+    return IntroductionResponse(content=intro_text)
+
+@router.get("/introduction", response_model=IntroductionResponse)
+async def introduction(request: Request):
     """获取系统介绍"""
+    etag, last_modified = content_validators("introduction")
+    cached = check_not_modified(request, etag, CONTENT_CACHE_CONTROL, last_modified)
+    if cached:
+        return cached
     try:
-        intro_text = get_introduction() # 从数据库获取
-        if not intro_text:
-            # 提供一个默认值，以防数据库返回空
-            intro_text = "欢迎使用个性化英语阅读支持系统。"
-            logger.warning("/introduction 未能从数据库获取到内容，使用默认值。")
-
+        # 同一内容版本只在第一次请求时查询数据库并编码，之后直接返回缓存的字节
+        response = response_store.serve(request, "introduction", etag, _introduction_payload,
+                                        CONTENT_CACHE_CONTROL, last_modified)
         logger.info("访问/introduction端点成功")
-        return {"content": intro_text}
+        return response
     except Exception as e:
         logger.error(f"获取系统介绍失败: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"获取系统介绍时发生错误: {str(e)}")
 
-@router.get("/self-rate")
-async def self_rate():
+def _self_rate_payload() -> SelfRateResponse:
+    """构造自评量表的响应内容"""
+    items = get_self_rate_items() # 从数据库获取
+    if not items:
+        logger.warning("/self-rate 未能从数据库获取到项目，返回空列表。")
+        items = [] #确保在数据库没有返回内容时，也返回一个空的列表，而不是None
+
+    # 为每个项目添加内容字段的别名
+    for item in items:
+        # 确保前端无论使用content还是内容字段都能显示数据
+        if 'content' in item and '内容' not in item:
+            item['内容'] = item['content']
+
+    # 关键的调试日志，查看即将发送给前端的数据
+    logger.debug("/self-rate items being sent to frontend: %s", items)
+    return SelfRateResponse(items=items)
+
+@router.get("/self-rate", response_model=SelfRateResponse)
+async def self_rate(request: Request):
     """获取自评量表"""
+    etag, last_modified = content_validators("self-rate")
+    cached = check_not_modified(request, etag, CONTENT_CACHE_CONTROL, last_modified)
+    if cached:
+        return cached
     try:
-        items = get_self_rate_items() # 从数据库获取
-        if not items:
-            logger.warning("/self-rate 未能从数据库获取到项目，返回空列表。")
-            items = [] #确保在数据库没有返回内容时，也返回一个空的列表，而不是None
-
-        # 为每个项目添加内容字段的别名
-        for item in items:
-            # 确保前端无论使用content还是内容字段都能显示数据
-            if 'content' in item and '内容' not in item:
-                item['内容'] = item['content']
-
-        # 关键的调试日志，查看即将发送给前端的数据
-        logger.info(f"DEBUG: /self-rate items being sent to frontend: {items}")
+        response = response_store.serve(request, "self-rate", etag, _self_rate_payload,
+                                        CONTENT_CACHE_CONTROL, last_modified)
         logger.info("访问/self-rate端点成功")
-        return {"success": True, "items": items}
+        return response
     except Exception as e:
         logger.error(f"获取自评量表失败: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"获取自评量表时发生错误: {str(e)}")
 
-@router.get("/strategies")
-async def strategies():
+def _strategies_payload() -> StrategyListResponse:
+    """构造阅读策略列表的响应内容"""
+    items = get_strategy_items() # 从数据库获取
+    if not items:
+        logger.warning("/strategies 未能从数据库获取到项目，返回空列表。")
+        items = [] #确保在数据库没有返回内容时，也返回一个空的列表，而不是None
+    return StrategyListResponse(items=items)
+
+@router.get("/strategies", response_model=StrategyListResponse)
+async def strategies(request: Request):
     """获取阅读策略列表"""
+    etag, last_modified = content_validators("strategies")
+    cached = check_not_modified(request, etag, CONTENT_CACHE_CONTROL, last_modified)
+    if cached:
+        return cached
     try:
-        items = get_strategy_items() # 从数据库获取
-        if not items:
-            logger.warning("/strategies 未能从数据库获取到项目，返回空列表。")
-            items = [] #确保在数据库没有返回内容时，也返回一个空的列表，而不是None
-
+        response = response_store.serve(request, "strategies", etag, _strategies_payload,
+                                        CONTENT_CACHE_CONTROL, last_modified)
         logger.info("访问/strategies端点成功")
-        return {"success": True, "items": items}
+        return response
     except Exception as e:
         logger.error(f"获取阅读策略列表失败: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"获取阅读策略列表时发生错误: {str(e)}")
 
+def _bootstrap_payload(etag: str) -> BootstrapResponse:
+    """构造启动内容的响应内容"""
+    payload = get_bootstrap_content(BOOTSTRAP_EXAM_IDS)
+    # 与 /self-rate 一致，为自评量表项目添加内容字段的别名
+    for item in payload["self_rate_items"]:
+        item["内容"] = item["content"]
+    logger.info(f"生成启动内容，内容版本 {payload['content_version']}")
+    return BootstrapResponse(etag=etag, **payload)
+
+@router.get("/bootstrap", response_model=BootstrapResponse)
+async def bootstrap(request: Request):
+    """
+    一次返回计划阶段的全部静态内容（系统介绍、自评量表、策略量表、前测试卷，试卷不含答案）
+
+    ETag由内容版本生成，客户端带 If-None-Match 请求且内容未变化时返回304。
+    """
+    etag, last_modified = content_validators("content")
+    cached = check_not_modified(request, etag, BOOTSTRAP_CACHE_CONTROL, last_modified)
+    if cached:
+        return cached
+    try:
+        response = response_store.serve(request, "bootstrap", etag, partial(_bootstrap_payload, etag),
+                                        BOOTSTRAP_CACHE_CONTROL, last_modified)
+    except Exception as e:
+        logger.error(f"获取启动内容失败: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"获取启动内容时发生错误: {str(e)}")
+
+    logger.info("访问/bootstrap端点成功")
+    return response
+
+def _user_profile_created_response(success: bool) -> Dict[str, Any]:
+    """创建用户画像的响应内容"""
+    if not success:
+        return {"success": False, "message": "创建用户画像失败"}
+    return {"success": True, "message": "用户画像创建成功"}
+
 # 完全重写user-profile端点，确保路由能够正确注册
-@router.post("/user-profile", response_model=Dict[str, Any])
-async def create_user_profile_endpoint(user_data: UserProfileCreate = Body(...)):
+@router.post("/user-profile", response_model=UserProfileCreateResponse)
+async def create_user_profile_endpoint(request: Request, response: Response, user_data: UserProfileCreate = Body(...)):
     """
     创建用户画像
     
-    这个端点接收用户画像数据并将其保存到数据库中
+    这个端点接收用户画像数据并将其保存到数据库中；带 Idempotency-Key 的重试返回首次的结果
     
     Returns:
-        Dict[str, Any]: 操作结果，包含success和message字段
+        UserProfileCreateResponse: 操作结果，包含success和message字段
     """
     try:
         logger.info(f"接收到用户画像创建请求: {user_data.model_dump()}")
@@ -110,20 +204,25 @@ async def create_user_profile_endpoint(user_data: UserProfileCreate = Body(...))
         
         # 调用数据库函数保存数据
         try:
-            success = create_user_profile(db_data)
+            result = await idempotent_write(request, response, "user-profile", user_data.model_dump(),
+                                            partial(insert_user_profile, user_data=db_data),
+                                            _user_profile_created_response)
+        except HTTPException:
+            raise
         except Exception as db_error:
             logger.warning(f"数据库操作失败，使用模拟数据: {db_error}")
-            success = True
             logger.info(f"模拟创建用户画像: {user_data.name}")
+            result = _user_profile_created_response(True)
         
         # 返回结果
-        if not success:
+        if not result["success"]:
             logger.error("创建用户画像失败")
-            return {"success": False, "message": "创建用户画像失败"}
-        
-        logger.info(f"用户画像创建成功: {user_data.name}")
-        return {"success": True, "message": "用户画像创建成功"}
+        else:
+            logger.info(f"用户画像创建成功: {user_data.name}")
+        return result
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"创建用户画像过程中出错: {str(e)}")
         raise HTTPException(
@@ -132,13 +231,35 @@ async def create_user_profile_endpoint(user_data: UserProfileCreate = Body(...))
         )
 
 # 保留这个路由以确保兼容性
-@router.post("/user-profile/", response_model=Dict[str, Any])
-async def create_user_profile_endpoint_alt(user_data: UserProfileCreate = Body(...)):
+@router.post("/user-profile/", response_model=UserProfileCreateResponse)
+async def create_user_profile_endpoint_alt(request: Request, response: Response,
+                                          user_data: UserProfileCreate = Body(...)):
     """创建用户画像（带尾部斜杠的版本）"""
-    return await create_user_profile_endpoint(user_data)
-
-@router.get("/exam/{exam_id}")
-async def get_exam(exam_id: str):
+    return await create_user_profile_endpoint(request, response, user_data)
+
+def _exam_payload(exam: Dict[str, Any], numeric_id: int) -> ExamResponse:
+    """由试卷记录构造响应内容，参考答案只留在服务器上阅卷用，不发给浏览器"""
+    # 构造试题列表
+    questions = []
+    for i in range(1, 6):  # 假设每套试卷有5道题
+        question_key = f"t{i}"
+        answer_key = f"a{i}"
+
+        if question_key in exam and answer_key in exam:
+            questions.append({
+                "number": i,
+                "question": exam[question_key]
+            })
+
+    return ExamResponse(exam_id=numeric_id, content=exam["content"], questions=questions)
+
+def _exam_payload_from_db(numeric_id: int) -> Optional[ExamResponse]:
+    """从数据库读取试卷并构造响应内容，试卷不存在时返回 None"""
+    exam = get_exam_by_id(numeric_id)
+    return _exam_payload(exam, numeric_id) if exam else None
+
+@router.get("/exam/{exam_id}", response_model=Union[ExamResponse, ExamErrorResponse])
+async def get_exam(exam_id: str, request: Request):
     """获取试卷"""
     try:
         # 检查exam_id是否有效，如果是NaN或无效值，返回友好错误
@@ -162,12 +283,22 @@ async def get_exam(exam_id: str):
                 "exam_id": exam_id
             }
             
+        # 只有数据库中的试卷会带校验值并缓存编码结果，示例试卷不缓存
+        etag, last_modified = content_validators(f"exam{numeric_id}")
+        cached = check_not_modified(request, etag, EXAM_CACHE_CONTROL, last_modified)
+        if cached:
+            return cached
+
         # 继续原有的逻辑，但使用numeric_id
         # 如果数据库函数无法使用，使用硬编码内容
         try:
-            exam = get_exam_by_id(numeric_id)
-            if not exam:
+            response = response_store.serve(request, f"exam{numeric_id}", etag,
+                                            partial(_exam_payload_from_db, numeric_id),
+                                            EXAM_CACHE_CONTROL, last_modified)
+            if response is None:
                 raise ValueError("试卷不存在")
+            logger.info(f"获取试卷{numeric_id}成功")
+            return response
         except:
             # 示例试卷数据
             exams = {
@@ -240,26 +371,8 @@ async def get_exam(exam_id: str):
 
             exam = exams[numeric_id]
 
-        # 构造试题列表
-        questions = []
-        for i in range(1, 6):  # 假设每套试卷有5道题
-            question_key = f"t{i}"
-            answer_key = f"a{i}"
-
-            if question_key in exam and answer_key in exam:
-                questions.append({
-                    "number": i,
-                    "question": exam[question_key],
-                    "answer": exam[answer_key]
-                })
-
         logger.info(f"获取试卷{numeric_id}成功")
-        return {
-            "success": True,
-            "exam_id": numeric_id,
-            "content": exam["content"],
-            "questions": questions
-        }
+        return _exam_payload(exam, numeric_id)
     except HTTPException as e:
         # 直接重新抛出HTTP异常
         raise
@@ -272,133 +385,90 @@ async def get_exam(exam_id: str):
             "exam_id": exam_id
         }
 
-@router.post("/exam-result")
-async def submit_exam_result(result: ExamResult):
-    """提交试卷结果"""
-    try:
-        user_profile = None
-        try:
-            user_profile = get_user_profile(result.name)
-            if not user_profile: # if user_profile is None or an empty dict
-                logger.warning(f"获取用户 {result.name} 初始画像失败或为空，将创建新画像信息。")
-                user_profile = {} # Initialize to empty dict to avoid .get errors
-        except Exception as e:
-            logger.warning(f"获取用户 {result.name} 画像时发生异常: {e}，将创建新画像信息。")
-            user_profile = {} # Initialize to empty dict
-
-        data = {"name": result.name}
-        current_score = result.score # This is an int
-
-        if result.exam_id == 1: # Pre-test 1
-            data["exam1_score"] = str(current_score)
-            exam2_score_str = user_profile.get("exam2_score")
-            exam2_score = int(exam2_score_str) if exam2_score_str is not None else 0
-            data["post_score"] = str(current_score + exam2_score)
-            logger.info(f"用户 {result.name} 提交试卷1，分数: {current_score}。当前总前测分数: {data['post_score']}")
-            
-            # Retain false_id logic for pre-tests
-            existing_false_ids = set()
-            if user_profile.get("false_id"):
-                current_ids_str = user_profile.get("false_id", "")
-                if current_ids_str:
-                    existing_false_ids.update(item.strip() for item in current_ids_str.split(',') if item.strip())
-            new_wrong_questions = set(item.strip() for item in result.wrong_questions if item.strip())
-            all_false_ids = existing_false_ids.union(new_wrong_questions)
-            data["false_id"] = ",".join(sorted(list(all_false_ids)))
-            logger.info(f"用户 {result.name} 更新后的错题ID: {data['false_id']}")
-
-        elif result.exam_id == 2: # Pre-test 2
-            data["exam2_score"] = str(current_score)
-            exam1_score_str = user_profile.get("exam1_score")
-            exam1_score = int(exam1_score_str) if exam1_score_str is not None else 0
-            data["post_score"] = str(current_score + exam1_score)
-            logger.info(f"用户 {result.name} 提交试卷2，分数: {current_score}。当前总前测分数: {data['post_score']}")
-
-            # Retain false_id logic for pre-tests
-            existing_false_ids = set()
-            if user_profile.get("false_id"):
-                current_ids_str = user_profile.get("false_id", "")
-                if current_ids_str:
-                    existing_false_ids.update(item.strip() for item in current_ids_str.split(',') if item.strip())
-            new_wrong_questions = set(item.strip() for item in result.wrong_questions if item.strip())
-            all_false_ids = existing_false_ids.union(new_wrong_questions)
-            data["false_id"] = ",".join(sorted(list(all_false_ids)))
-            logger.info(f"用户 {result.name} 更新后的错题ID: {data['false_id']}")
-
-        elif result.exam_id == 3: # Post-test 1
-            data["exam3_score"] = str(current_score)
-            exam4_score_str = user_profile.get("exam4_score")
-            exam4_score = int(exam4_score_str) if exam4_score_str is not None else 0
-            data["after_score"] = str(current_score + exam4_score)
-            logger.info(f"用户 {result.name} 提交试卷3，分数: {current_score}。当前总后测分数: {data['after_score']}")
-            # If post-tests also need to save wrong_questions, add similar logic here for a different field, e.g., "after_false_id"
-
-        elif result.exam_id == 4: # Post-test 2
-            data["exam4_score"] = str(current_score)
-            exam3_score_str = user_profile.get("exam3_score")
-            exam3_score = int(exam3_score_str) if exam3_score_str is not None else 0
-            data["after_score"] = str(current_score + exam3_score)
-            logger.info(f"用户 {result.name} 提交试卷4，分数: {current_score}。当前总后测分数: {data['after_score']}")
-            # If post-tests also need to save wrong_questions, add similar logic here
-
-        # Ensure all potentially relevant scores are part of the data payload for update_user_profile
-        # This helps if update_user_profile expects all fields or if we are adding new fields.
-        for key in ["exam1_score", "exam2_score", "exam3_score", "exam4_score", "post_score", "after_score"]:
-            if key not in data and user_profile.get(key) is not None:
-                data[key] = user_profile.get(key) # Carry over existing scores not modified in this run
+@router.post("/exam-result", response_model=ExamResultResponse, dependencies=[Depends(require_admin_token)])
+async def submit_exam_result(result: ExamResult, request: Request, response: Response):
+    """
+    直接录入试卷成绩（教师更正成绩用，需要管理令牌），带 Idempotency-Key 的重试不会重复合并错题
 
+    学生作答一律通过 /exam-submission 由服务器阅卷。
+    """
+    try:
+        # 读取已有分数、计算总分和写回在同一个事务中完成，
+        # 同一用户的两套前测并发提交时不会互相覆盖总分
+        operation = partial(apply_exam_result, name=result.name, exam_id=result.exam_id,
+                            score=result.score, wrong_questions=result.wrong_questions)
         try:
-            success = update_user_profile(data)
-        except Exception as db_exc: # Catch specific db exception if possible
+            body = await idempotent_write(request, response, "exam-result", result.model_dump(), operation,
+                                          lambda data: {"success": True, "message": "试卷结果提交成功"})
+        except HTTPException:
+            raise
+        except Exception as db_exc:
             logger.error(f"数据库更新失败 for user {result.name}: {db_exc}", exc_info=True)
-            # For simulation/testing, you might set success = True, but in prod, this is an error
-            # success = True # Remove or comment out for production
-            # logger.info(f"模拟更新用户画像: {result.name}, 数据: {data}")
             raise HTTPException(status_code=500, detail=f"数据库更新失败: {db_exc}")
 
-
-        if not success:
-            # This case might be hit if update_user_profile itself returns False without an exception
-            logger.error(f"更新用户 {result.name} 画像在数据库层面返回失败。")
-            raise HTTPException(status_code=400, detail="提交试卷结果失败（数据库操作未成功）")
-
-        logger.info(f"用户 {result.name} 的试卷结果提交成功。更新的数据: {data}")
-        return {"success": True, "message": "试卷结果提交成功"}
+        logger.info(f"用户 {result.name} 的试卷{result.exam_id}结果提交成功")
+        return body
     except HTTPException: # Re-raise HTTPExceptions directly
         raise
     except Exception as e:
         logger.error(f"提交试卷结果过程中发生未知错误: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"服务器内部错误: {str(e)}")
 
-@router.post("/strategy-result")
-async def submit_strategy_result(result: StrategyResult):
-    """提交策略问卷结果"""
+@router.post("/exam-submission", response_model=ExamGradeResponse)
+async def submit_exam_answers(submission: ExamSubmission, request: Request, response: Response):
+    """
+    提交作答，由服务器阅卷并记录成绩
+
+    得分和错题ID按服务器上的参考答案计算，写入方式（包括 Idempotency-Key）与 /exam-result 相同。
+    参考答案随逐题结果在提交后返回，因此每套试卷只记录首次提交，再次提交返回409；
+    教师更正成绩使用 /exam-result。
+    """
+    try:
+        graded = grade_exam(submission.exam_id, submission.answers)
+    except GradingError as e:
+        logger.warning(f"用户 {submission.name} 的试卷{submission.exam_id}无法阅卷: {e}")
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+
+    operation = partial(apply_exam_result, name=submission.name, exam_id=submission.exam_id,
+                        score=graded["score"], wrong_questions=graded["wrong_questions"], overwrite=False)
+    try:
+        body = await idempotent_write(request, response, "exam-submission", submission.model_dump(), operation,
+                                      lambda data: {"success": True, **graded})
+    except HTTPException:
+        raise
+    except ExamAlreadyRecordedError as e:
+        logger.warning(str(e))
+        raise HTTPException(status_code=409, detail=str(e))
+    except Exception as db_exc:
+        logger.error(f"数据库更新失败 for user {submission.name}: {db_exc}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"数据库更新失败: {db_exc}")
+
+    logger.info(f"用户 {submission.name} 的试卷{submission.exam_id}阅卷完成，得分 {graded['score']}/{graded['max_score']}")
+    return body
+
+@router.post("/strategy-result", response_model=StrategyResultResponse)
+async def submit_strategy_result(result: StrategyResult, request: Request, response: Response):
+    """提交策略问卷结果，带 Idempotency-Key 的重试返回首次的结果"""
     try:
         logger.info(f"接收到策略问卷结果: {result.model_dump()}")
-        
-        # 判断是前测还是后测
-        data = {"name": result.name}
-        if result.is_pre_test:
-            data["post_strategies_score"] = str(result.score)
-            logger.info(f"设置前测策略得分: {result.score}")
-        else:
-            # 确保is_pre_test是布尔值，如果不是，默认为后测
-            data["after_strategies_score"] = str(result.score)
-            logger.info(f"设置后测策略得分: {result.score}")
+        logger.info(f"设置{'前测' if result.is_pre_test else '后测'}策略得分: {result.score}")
 
         # 如果数据库函数无法使用，返回成功
         try:
-            success = update_user_profile(data)
-            if not success:
-                logger.warning(f"更新用户策略得分失败: {data}")
-                raise HTTPException(status_code=400, detail="提交策略问卷结果失败")
+            await idempotent_write(request, response, "strategy-result", result.model_dump(),
+                                   partial(apply_strategy_result, name=result.name,
+                                           score=result.score, is_pre_test=result.is_pre_test),
+                                   lambda data: {"success": True, "message": "策略问卷结果提交成功"})
+        except HTTPException:
+            raise
         except Exception as e:
             logger.error(f"更新用户策略得分出错: {e}", exc_info=True)
-            success = True
             logger.info(f"模拟更新用户策略得分: {result.name}, 类型: {'前测' if result.is_pre_test else '后测'}, 分数: {result.score}")
 
         logger.info("策略问卷结果提交成功")
         return {"success": True, "message": "策略问卷结果提交成功"}
+    except HTTPException:
+        raise
     except ValidationError as e:
         logger.error(f"策略问卷数据验证失败: {e}", exc_info=True)
         return {"success": False, "message": f"数据格式不正确: {str(e)}"}
@@ -0,0 +1,142 @@
+import asyncio
+import json
+import logging
+from functools import partial
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+
+from app.auth import require_admin_token
+from app.cohort_analysis import SUBGROUP_COLUMNS, analyze_cohort
+from app.config import STATS_MIN_GROUP_SIZE
+from app.database import apply_exam_results
+from app.export import EXPORT_FORMATS, parse_date_bound, stream_export
+from app.write_batcher import run_write
+from app.grading import GradingError, grade_batch, parse_batch_csv, parse_batch_json
+from app.schemas.exam import BatchGradeResponse
+from app.search import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, SearchError, search_content
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+# 创建路由
+router = APIRouter()
+
+# 批量阅卷请求体的最大字节数
+MAX_BATCH_BODY_BYTES = 5 * 1024 * 1024
+
+@router.get("/export/results", dependencies=[Depends(require_admin_token)])
+async def export_results(
+    format: str = Query("csv", pattern="^(csv|ndjson)$", description="导出格式：csv 或 ndjson"),
+    grade: Optional[str] = Query(None, description="按年级筛选"),
+    major: Optional[str] = Query(None, description="按专业筛选"),
+    since: Optional[str] = Query(None, description="创建时间下界（UTC），YYYY-MM-DD"),
+    until: Optional[str] = Query(None, description="创建时间上界（UTC，含当天），YYYY-MM-DD"),
+):
+    """流式导出全部学生的画像、前后测成绩、策略得分和错题，包含个人信息，需要管理令牌"""
+    # 在开始输出前校验参数，避免响应发出一半才报错
+    try:
+        parse_date_bound(since)
+        parse_date_bound(until, upper=True)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    _, media_type, extension = EXPORT_FORMATS[format]
+    logger.info(f"导出学习结果: format={format}, grade={grade}, major={major}, since={since}, until={until}")
+    return StreamingResponse(
+        stream_export(format, grade=grade, major=major, since=since, until=until),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="perss_results.{extension}"'},
+    )
+
+@router.get("/stats/cohort")
+async def cohort_statistics(
+    grade: Optional[str] = Query(None, description="按年级筛选"),
+    major: Optional[str] = Query(None, description="按专业筛选"),
+    gender: Optional[str] = Query(None, description="按性别筛选"),
+    since: Optional[str] = Query(None, description="创建时间下界（UTC），YYYY-MM-DD"),
+    until: Optional[str] = Query(None, description="创建时间上界（UTC，含当天），YYYY-MM-DD"),
+    by: Optional[List[str]] = Query(None, description="分组列：grade、major、gender，可重复，默认全部"),
+    min_group_size: int = Query(STATS_MIN_GROUP_SIZE, ge=STATS_MIN_GROUP_SIZE,
+                                description="人数少于该值的群体和分组只返回人数，不能低于 PERSS_STATS_MIN_GROUP_SIZE"),
+):
+    """前后测研究统计：成绩分布、成对差值、Cohen's d、配对t检验和Wilcoxon检验，以及按年级、专业、性别的分组结果"""
+    try:
+        # 整个群体的向量化计算放到线程中执行，不阻塞事件循环
+        return await asyncio.to_thread(
+            analyze_cohort, grade=grade, major=major, gender=gender, since=since, until=until,
+            by=SUBGROUP_COLUMNS if by is None else by, min_group_size=min_group_size,
+        )
+    except ValueError as e:
+        # CohortAnalysisError 和日期格式错误
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"群体统计失败: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"统计时发生错误: {str(e)}")
+
+@router.get("/search")
+async def search(
+    q: str = Query(..., min_length=1, description="检索词，多个词为并且关系，词尾加 * 表示前缀匹配"),
+    kind: Optional[List[str]] = Query(None, description="内容类型：exam、strategy、cognitive，可重复，默认全部"),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE, description="每页条数"),
+    cursor: Optional[str] = Query(None, description="上一页返回的 next_cursor"),
+):
+    """在试卷文章、题干、阅读策略和认知策略中全文检索，按相关度排序并返回高亮片段"""
+    try:
+        return search_content(q, kinds=kind, limit=limit, cursor=cursor)
+    except SearchError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"全文检索失败: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"检索时发生错误: {str(e)}")
+
+
+@router.post("/exam-results/batch", response_model=BatchGradeResponse, dependencies=[Depends(require_admin_token)])
+async def grade_exam_batch(
+    request: Request,
+    dry_run: bool = Query(False, description="只阅卷，不记录成绩"),
+):
+    """
+    批量阅卷：纸质前测录入后一次提交全班答卷
+
+    请求体为CSV（text/csv，列为 name, exam_id, a1..a5）或JSON（答卷数组，
+    每份为 {"name", "exam_id", "answers"}）。全部答卷批改后在一个事务中记录成绩，
+    返回每份答卷的得分和错题；单份答卷无效时只在它的报告中给出错误。
+    会覆盖学生成绩，需要管理令牌。
+    """
+    too_large = HTTPException(status_code=413, detail=f"请求体超过 {MAX_BATCH_BODY_BYTES} 字节")
+    # 先按 Content-Length 拒绝，再边读边检查大小，不把超大请求体读入内存
+    declared = request.headers.get("content-length")
+    if declared is not None:
+        if not declared.isdigit():
+            raise HTTPException(status_code=400, detail="Content-Length 无效")
+        if int(declared) > MAX_BATCH_BODY_BYTES:
+            raise too_large
+    body = bytearray()
+    async for chunk in request.stream():
+        body.extend(chunk)
+        if len(body) > MAX_BATCH_BODY_BYTES:
+            raise too_large
+    try:
+        text = body.decode("utf-8")
+        if "csv" in request.headers.get("content-type", ""):
+            rows = parse_batch_csv(text)
+        else:
+            rows = parse_batch_json(json.loads(text))
+        reports = grade_batch(rows)
+    except (UnicodeDecodeError, json.JSONDecodeError) as e:
+        raise HTTPException(status_code=400, detail=f"请求体无法解析: {e}")
+    except GradingError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+
+    recorded = 0
+    if not dry_run:
+        try:
+            recorded = await run_write(partial(apply_exam_results, results=reports))
+        except Exception as e:
+            logger.error(f"批量记录成绩失败: {e}", exc_info=True)
+            raise HTTPException(status_code=500, detail=f"数据库更新失败: {e}")
+
+    graded = sum(1 for report in reports if report["success"])
+    logger.info(f"批量阅卷: {graded} 份成功，{len(reports) - graded} 份失败，记录 {recorded} 份")
+    return {"graded": graded, "failed": len(reports) - graded, "recorded": recorded, "reports": reports}
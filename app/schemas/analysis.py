@@ -0,0 +1,26 @@
+"""AI分析、总结和对话相关响应模式"""
+from pydantic import BaseModel
+from typing import Optional
+
+class AnalysisResponse(BaseModel):
+    """画像分析、错题分析响应"""
+    success: bool = True
+    analysis: str
+    error: Optional[str] = None
+
+class StrategyAdviceResponse(BaseModel):
+    """阅读策略推荐响应，推荐内容为Markdown文本"""
+    success: bool = True
+    suggestions: str
+    error: Optional[str] = None
+
+class SummaryResponse(BaseModel):
+    """学习总结响应"""
+    success: bool = True
+    summary: str
+
+class ChatResponse(BaseModel):
+    """AI对话响应"""
+    success: bool = True
+    response: str
+    error: Optional[str] = None
@@ -0,0 +1,45 @@
+"""静态内容相关响应模式"""
+from pydantic import BaseModel, ConfigDict, Field
+from typing import List
+
+from app.schemas.exam import QuestionResponse
+from app.schemas.strategy import StrategyItem
+
+class IntroductionResponse(BaseModel):
+    """系统介绍响应"""
+    content: str
+
+class SelfRateItem(BaseModel):
+    """自评量表项目"""
+    model_config = ConfigDict(populate_by_name=True)
+
+    id: int
+    content: str
+    # 兼容前端使用中文字段名
+    content_zh: str = Field(alias="内容")
+
+class SelfRateResponse(BaseModel):
+    """自评量表响应"""
+    success: bool = True
+    items: List[SelfRateItem]
+
+class StrategyListResponse(BaseModel):
+    """阅读策略列表响应"""
+    success: bool = True
+    items: List[StrategyItem]
+
+class BootstrapExam(BaseModel):
+    """启动内容中的试卷，不含答案"""
+    exam_id: int
+    content: str
+    questions: List[QuestionResponse]
+
+class BootstrapResponse(BaseModel):
+    """计划阶段全部静态内容的响应"""
+    success: bool = True
+    etag: str
+    content_version: int
+    introduction: str
+    self_rate_items: List[SelfRateItem]
+    strategies: List[StrategyItem]
+    exams: List[BootstrapExam]
@@ -1,19 +1,26 @@
 """考试相关请求/响应模式"""
 from pydantic import BaseModel
-from typing import List, Optional
+from typing import List, Optional, Union
 
 class QuestionResponse(BaseModel):
     """试题响应"""
     number: int
     question: str
-    answer: Optional[str] = None  # 对用户隐藏答案
 
 class ExamResponse(BaseModel):
     """试卷响应"""
+    success: bool = True
     exam_id: int
     content: str
     questions: List[QuestionResponse]
 
+class ExamErrorResponse(BaseModel):
+    """试卷ID无效或试卷不存在时的响应"""
+    success: bool = False
+    message: str
+    error: str
+    exam_id: Union[int, str]
+
 class ExamResult(BaseModel):
     """考试结果请求"""
     name: str
@@ -24,4 +31,44 @@ class ExamResult(BaseModel):
 class ExamResultResponse(BaseModel):
     """考试结果响应"""
     success: bool
-    message: str
\ No newline at end of file
+    message: str
+
+class ExamSubmission(BaseModel):
+    """提交作答请求，由服务器阅卷"""
+    name: str
+    exam_id: int
+    answers: List[Optional[str]]
+
+class QuestionGrade(BaseModel):
+    """单题批改结果"""
+    number: int
+    correct: bool
+    similarity: float
+    answer: str
+
+class ExamGradeResponse(BaseModel):
+    """阅卷结果响应"""
+    success: bool = True
+    exam_id: int
+    score: int
+    max_score: int
+    wrong_questions: List[str]
+    results: List[QuestionGrade]
+
+class BatchGradeReport(BaseModel):
+    """批量阅卷中单份答卷的结果"""
+    name: Optional[str] = None
+    exam_id: Optional[int] = None
+    success: bool
+    score: Optional[int] = None
+    max_score: Optional[int] = None
+    wrong_questions: List[str] = []
+    error: Optional[str] = None
+
+class BatchGradeResponse(BaseModel):
+    """批量阅卷响应"""
+    success: bool = True
+    graded: int
+    failed: int
+    recorded: int
+    reports: List[BatchGradeReport]
\ No newline at end of file
@@ -1,5 +1,5 @@
 """用户相关请求/响应模式"""
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
 from typing import Optional, List, Dict, Any
 
 class UserProfileCreate(BaseModel):
@@ -33,11 +33,52 @@ class UserProfileResponse(BaseModel):
     grade: Optional[str] = None
     major: Optional[str] = None
     gender: Optional[str] = None
-    post_score: Optional[str] = None
+    post_score: Optional[int] = None
     false_id: Optional[str] = None
-    post_strategies_score: Optional[str] = None
-    after_strategies_score: Optional[str] = None
-    after_score: Optional[str] = None
+    post_strategies_score: Optional[int] = None
+    after_strategies_score: Optional[int] = None
+    after_score: Optional[int] = None
+
+class UserProfileDetail(BaseModel):
+    """用户画像完整记录，字段名与数据库列名一致"""
+    model_config = ConfigDict(populate_by_name=True, extra="allow")
+
+    id: Optional[int] = None
+    name: str
+    grade: Optional[str] = None
+    major: Optional[str] = None
+    gender: Optional[str] = None
+    post_score: Optional[int] = None
+    after_score: Optional[int] = None
+    false_id: Optional[str] = None
+    post_strategies_score: Optional[int] = None
+    after_strategies_score: Optional[int] = None
+    exam1_score: Optional[int] = None
+    exam2_score: Optional[int] = None
+    exam3_score: Optional[int] = None
+    exam4_score: Optional[int] = None
+    cet4_taken: Optional[str] = Field(None, alias="Have you taken the CET-4 exam:")
+    cet4_score: Optional[int] = Field(None, alias="CET-4 score")
+    cet4_reading_score: Optional[int] = Field(None, alias="CET-4 reading score")
+    cet6_taken: Optional[str] = Field(None, alias="Have you taken the CET-6 exam")
+    cet6_score: Optional[int] = Field(None, alias="CET-6 score")
+    cet6_reading_score: Optional[int] = Field(None, alias="CET-6 reading score")
+    other_scores: Optional[str] = Field(None, alias="Other English scores for reference")
+    exam_name: Optional[str] = Field(None, alias="Exam name")
+    total_score: Optional[float] = Field(None, alias="Total score")
+    reading_score: Optional[float] = Field(None, alias="Reading score")
+    created_at: Optional[str] = None
+    updated_at: Optional[str] = None
+
+class UserDetailResponse(BaseModel):
+    """获取用户信息响应"""
+    success: bool = True
+    user: UserProfileDetail
+
+class UserProfileCreateResponse(BaseModel):
+    """创建用户画像响应"""
+    success: bool
+    message: str
 
 class UserMessage(BaseModel):
     """用户消息"""
@@ -0,0 +1,118 @@
+"""全文检索模块，在试卷、阅读策略和认知策略的FTS5索引上按BM25排序检索"""
+import base64
+import json
+import logging
+import re
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from app.database import get_db_connection
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+# 可检索的内容类型：类型 -> (索引表, BM25列权重, 标题表达式)
+# 试卷标题取文章第一行（如 "Passage One"），文章正文的权重高于题干
+SEARCH_KINDS = {
+    "exam": ("exam_fts", (1.0, 0.5), "substr(content, 1, instr(content || char(10), char(10)) - 1)"),
+    "strategy": ("strategy_fts", (1.0,), "content"),
+    "cognitive": ("cognitive_strategy_fts", (2.0, 1.0), "content"),
+}
+
+DEFAULT_PAGE_SIZE = 10
+MAX_PAGE_SIZE = 50
+# 片段长度（词数）和高亮标记
+SNIPPET_TOKENS = 16
+SNIPPET_OPEN, SNIPPET_CLOSE, SNIPPET_ELLIPSIS = "<mark>", "</mark>", "…"
+
+_TERM_PATTERN = re.compile(r"[\w'-]+\*?", re.UNICODE)
+
+
+class SearchError(ValueError):
+    """检索参数无效"""
+
+
+def build_match_query(text: str) -> str:
+    """
+    把用户输入转换为FTS5查询
+
+    每个词加引号作为短语，避免用户输入中的 AND/OR/NEAR、括号和引号被当作查询语法；
+    以 * 结尾的词按前缀匹配。多个词之间为 AND 关系。
+    """
+    terms = []
+    for term in _TERM_PATTERN.findall(text or ""):
+        prefix = term.endswith("*")
+        term = term.rstrip("*").strip("'-")
+        if term:
+            terms.append(f'"{term}"' + ("*" if prefix else ""))
+    if not terms:
+        raise SearchError("检索词不能为空")
+    return " ".join(terms)
+
+
+def encode_cursor(score: float, kind: str, item_id: int) -> str:
+    """把最后一条结果的排序键编码为游标"""
+    raw = json.dumps([score, kind, item_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[float, str, int]:
+    """解析游标，格式无效时抛出 SearchError"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        score, kind, item_id = json.loads(raw)
+        return float(score), str(kind), int(item_id)
+    except (ValueError, TypeError):
+        raise SearchError("游标无效")
+
+
+def _kind_query(kind: str) -> str:
+    """单个索引的检索语句，结果列为 (kind, id, score, title, snippet)"""
+    table, weights, title = SEARCH_KINDS[kind]
+    weight_sql = ", ".join(str(w) for w in weights)
+    return (
+        f"SELECT '{kind}' AS kind, rowid AS id, bm25({table}, {weight_sql}) AS score, "
+        f"{title} AS title, "
+        f"snippet({table}, -1, '{SNIPPET_OPEN}', '{SNIPPET_CLOSE}', '{SNIPPET_ELLIPSIS}', {SNIPPET_TOKENS}) AS snippet "
+        f"FROM {table} WHERE {table} MATCH :query"
+    )
+
+
+def search_content(text: str, kinds: Optional[Sequence[str]] = None, limit: int = DEFAULT_PAGE_SIZE,
+                   cursor: Optional[str] = None) -> Dict[str, Any]:
+    """
+    检索内容，按BM25得分排序（得分越小越相关）
+
+    使用键集分页：游标记录上一页最后一条的 (得分, 类型, id)，
+    下一页只取排在它之后的结果，翻页深度不影响查询代价。
+    """
+    kinds = list(dict.fromkeys(kinds or SEARCH_KINDS))
+    unknown = [kind for kind in kinds if kind not in SEARCH_KINDS]
+    if unknown:
+        raise SearchError(f"不支持的内容类型: {', '.join(unknown)}")
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+
+    params: Dict[str, Any] = {"query": build_match_query(text), "limit": limit + 1}
+    sql = "SELECT kind, id, score, title, snippet FROM (" + " UNION ALL ".join(_kind_query(k) for k in kinds) + ")"
+    if cursor:
+        params["score"], params["kind"], params["id"] = decode_cursor(cursor)
+        sql += " WHERE (score, kind, id) > (:score, :kind, :id)"
+    sql += " ORDER BY score, kind, id LIMIT :limit"
+
+    conn = get_db_connection()
+    try:
+        rows = conn.execute(sql, params).fetchall()
+    finally:
+        conn.close()
+
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    results: List[Dict[str, Any]] = [
+        {"kind": row["kind"], "id": row["id"], "score": row["score"],
+         "title": row["title"], "snippet": row["snippet"]}
+        for row in rows
+    ]
+    next_cursor = None
+    if has_more:
+        last = results[-1]
+        next_cursor = encode_cursor(last["score"], last["kind"], last["id"])
+    return {"query": text, "results": results, "next_cursor": next_cursor}
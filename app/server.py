@@ -0,0 +1,29 @@
+"""生产模式使用的uvicorn服务器"""
+import logging
+import socket
+from typing import List, Optional
+
+import uvicorn
+
+from app.chat_session import drain_chat_connections
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+
+class GracefulServer(uvicorn.Server):
+    """
+    停止时先等待进行中的AI对话回复推送完，再按uvicorn原有流程关闭
+
+    uvicorn 停止时会立即以1012关闭所有WebSocket，早于应用的shutdown事件，
+    流式推送中的回复会被截断。这里先停止接受新连接，再等待回复完成（最长为
+    timeout_graceful_shutdown），之后才关闭连接并等待其余请求。
+    """
+
+    async def shutdown(self, sockets: Optional[List[socket.socket]] = None) -> None:
+        for server in self.servers:
+            server.close()
+        drained = await drain_chat_connections(self.config.timeout_graceful_shutdown)
+        if drained:
+            logger.info(f"已等待 {drained} 个AI回复，继续关闭服务")
+        await super().shutdown(sockets=sockets)
@@ -1,10 +1,10 @@
 import logging
+import math
 import re
 from datetime import datetime
 from typing import Dict, List, Any, Optional
 
 # 配置日志
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
 
@@ -41,6 +41,27 @@ def calculate_exam_score(user_answers: List[str], correct_answers: List[str]) ->
     }
 
 
+def to_int_score(value: Any) -> Optional[int]:
+    """把分数转换为整数，空值、无法识别的值和非有限值（inf、nan）返回None"""
+    if value is None or isinstance(value, bool):
+        return None
+    if isinstance(value, int):
+        return value
+    number = to_real_score(value)
+    return int(round(number)) if number is not None else None
+
+
+def to_real_score(value: Any) -> Optional[float]:
+    """把分数转换为浮点数，空值、无法识别的值和非有限值（inf、nan）返回None"""
+    if value is None or isinstance(value, bool):
+        return None
+    try:
+        number = float(str(value).strip())
+    except (TypeError, ValueError):
+        return None
+    return number if math.isfinite(number) else None
+
+
 def calculate_strategy_score(answers: List[int]) -> int:
     """计算阅读策略得分"""
     if not answers:
@@ -0,0 +1,192 @@
+"""写入批处理模块：把短时间内集中到达的提交合并为一次事务（组提交）"""
+import asyncio
+import logging
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, List, Optional, Tuple
+
+from app.config import WRITE_BATCHING_ENABLED, WRITE_BATCH_MAX_ITEMS, WRITE_BATCH_MAX_DELAY_MS
+from app.database import get_db_connection, run_in_transaction
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+# 写操作：接收游标，在调用方提供的事务中执行
+WriteOperation = Callable[[sqlite3.Cursor], Any]
+
+
+class GroupCommitWriter:
+    """
+    组提交写入器
+
+    提交先进入队列，由唯一的写入任务按组取出：凑满 max_items 条或等待
+    max_delay 秒后，在同一个事务里依次执行并提交一次。每个调用方的
+    future 在所在组提交成功（数据已落盘）后才返回结果。
+
+    每个操作在自己的 SAVEPOINT 中执行，单个操作失败只回滚它自己，
+    不影响同组其他提交。
+    """
+
+    def __init__(self, max_items: int = WRITE_BATCH_MAX_ITEMS, max_delay_ms: float = WRITE_BATCH_MAX_DELAY_MS):
+        self.max_items = max_items
+        self.max_delay = max_delay_ms / 1000.0
+        self._queue: Optional[asyncio.Queue] = None
+        self._full: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        # stop() 开始后不再接受新的提交
+        self._stopping = False
+        # 所有事务都在同一个线程、同一个连接上执行
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._conn: Optional[sqlite3.Connection] = None
+        self.stats = {"operations": 0, "commits": 0, "failed_operations": 0, "largest_group": 0}
+
+    @property
+    def running(self) -> bool:
+        """写入任务是否在运行并接受新的提交，停止过程中为 False"""
+        return self._task is not None and not self._task.done() and not self._stopping
+
+    async def start(self):
+        """启动写入任务"""
+        if self.running:
+            return
+        self._stopping = False
+        self._queue = asyncio.Queue()
+        self._full = asyncio.Event()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="perss-writer")
+        self._task = asyncio.create_task(self._run(), name="perss-group-commit")
+        logger.info(f"组提交写入器已启动: 每组最多 {self.max_items} 条，最长等待 {self.max_delay * 1000:.1f}ms")
+
+    async def stop(self):
+        """处理完队列中剩余的提交后停止"""
+        if not self.running:
+            return
+        # 先标记停止，之后的 run_write 改为直接执行事务，不再进入队列
+        self._stopping = True
+        await self._queue.put(None)
+        await self._task
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self._executor, self._close_connection)
+        self._executor.shutdown(wait=True)
+        self._task = None
+        self._stopping = False
+        logger.info(f"组提交写入器已停止: {self.stats}")
+
+    async def submit(self, operation: WriteOperation) -> Any:
+        """提交一个写操作，等待所在组提交后返回操作结果"""
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((operation, future))
+        if self._queue.qsize() >= self.max_items:
+            self._full.set()
+        return await future
+
+    async def _run(self):
+        """写入任务主循环"""
+        stopping = False
+        while not stopping:
+            item = await self._queue.get()
+            if item is None:
+                break
+            batch = [item]
+
+            # 队列未满时最多再等 max_delay，让同一波提交进入同一组
+            if self._queue.qsize() < self.max_items - 1:
+                try:
+                    await asyncio.wait_for(self._full.wait(), self.max_delay)
+                except asyncio.TimeoutError:
+                    pass
+            self._full.clear()
+
+            while len(batch) < self.max_items:
+                try:
+                    item = self._queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+
+            await self._commit_batch(batch)
+
+        # 停止标记之后仍留在队列中的提交也要执行完，否则调用方会一直等待
+        leftovers = []
+        while not self._queue.empty():
+            item = self._queue.get_nowait()
+            if item is not None:
+                leftovers.append(item)
+        for start in range(0, len(leftovers), self.max_items):
+            await self._commit_batch(leftovers[start:start + self.max_items])
+
+    async def _commit_batch(self, batch: List[Tuple[WriteOperation, asyncio.Future]]):
+        """在写入线程中提交一组操作，并把结果交给各调用方"""
+        loop = asyncio.get_running_loop()
+        operations = [operation for operation, _ in batch]
+        try:
+            results = await loop.run_in_executor(self._executor, self._commit_group, operations)
+        except Exception as e:
+            # 整组提交失败，所有调用方都收到异常
+            logger.error(f"组提交失败（{len(batch)} 条）: {e}", exc_info=True)
+            results = [(False, e)] * len(batch)
+
+        for (_, future), (ok, value) in zip(batch, results):
+            if future.done():
+                continue  # 调用方已取消
+            if ok:
+                future.set_result(value)
+            else:
+                future.set_exception(value)
+
+    def _connection(self) -> sqlite3.Connection:
+        """获取写入线程专用的连接"""
+        if self._conn is None:
+            self._conn = get_db_connection()
+            self._conn.isolation_level = None  # 事务边界由写入器显式控制
+        return self._conn
+
+    def _close_connection(self):
+        """关闭写入线程的连接"""
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def _commit_group(self, operations: List[WriteOperation]) -> List[Tuple[bool, Any]]:
+        """在一个事务中执行一组写操作（运行在写入线程中）"""
+        started = time.perf_counter()
+        conn = self._connection()
+        cursor = conn.cursor()
+        results: List[Tuple[bool, Any]] = []
+        cursor.execute('BEGIN IMMEDIATE')
+        try:
+            for operation in operations:
+                cursor.execute('SAVEPOINT op')
+                try:
+                    results.append((True, operation(cursor)))
+                    cursor.execute('RELEASE op')
+                except Exception as e:
+                    cursor.execute('ROLLBACK TO op')
+                    cursor.execute('RELEASE op')
+                    self.stats["failed_operations"] += 1
+                    results.append((False, e))
+            cursor.execute('COMMIT')
+        except BaseException:
+            if conn.in_transaction:
+                cursor.execute('ROLLBACK')
+            raise
+
+        self.stats["operations"] += len(operations)
+        self.stats["commits"] += 1
+        self.stats["largest_group"] = max(self.stats["largest_group"], len(operations))
+        logger.debug(f"组提交 {len(operations)} 条，耗时 {(time.perf_counter() - started) * 1000:.1f}ms")
+        return results
+
+
+# 全局写入器，在应用启动时按配置启用
+group_writer = GroupCommitWriter()
+
+
+async def run_write(operation: WriteOperation) -> Any:
+    """执行写操作：启用组提交时进入队列，否则直接在独立事务中执行"""
+    if WRITE_BATCHING_ENABLED and group_writer.running:
+        return await group_writer.submit(operation)
+    return run_in_transaction(operation)
@@ -0,0 +1,318 @@
+"""
+微基准测试脚本
+在合成数据上测量数据访问、提示词构建、Markdown格式化和响应序列化等热点路径的单次耗时
+
+数据库使用临时目录中新建的库，AI接口替换为立即返回的桩函数，不访问网络，也不会修改正式数据库。
+结果可保存为基线文件，之后用 --compare 与基线比较，超过阈值的变慢项标记为回归并以退出码1结束。
+
+用法示例:
+    python benchmark.py --save baseline.json
+    python benchmark.py --compare baseline.json --threshold 0.15
+    python benchmark.py --users 5000 --passage-chars 8000 --filter db. --filter json.
+    python benchmark.py --users 100000 --filter stats.
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# 配置日志
+logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+                    stream=sys.stderr)
+logger = logging.getLogger("PERSS.benchmark")
+# 应用模块的INFO日志会干扰计时，只保留本脚本的进度信息
+logger.setLevel(logging.INFO)
+
+# 合成文章使用的词表
+WORDS = (
+    "reading strategy students language context author passage evidence argument research "
+    "culture science education history society economy technology environment policy public "
+    "however therefore although meanwhile furthermore specifically consequently nevertheless "
+    "analyze infer predict summarize compare describe explain suggest indicate conclude"
+).split()
+GRADES = ["大一", "大二", "大三", "大四"]
+MAJORS = ["英语", "计算机科学", "数学", "经济学", "历史", "化学"]
+# 模拟AI回复，同时作为 format_markdown 的输入
+REPLY = (
+    "# 分析报告\n\n## 当前水平\n\n你的**细节理解**较好，*推断题*仍有提升空间。\n\n"
+    "### 建议\n\n- 先读题干，标出关键词\n- 略读每段首句，判断段落主旨\n- 回到原文定位细节\n\n"
+    "坚持每天精读一篇文章，并整理生词和长难句。\n\n"
+) * 6
+
+
+def sentence(rng: random.Random, words: int) -> str:
+    text = " ".join(rng.choice(WORDS) for _ in range(words))
+    return text[0].upper() + text[1:] + "."
+
+
+def passage(rng: random.Random, chars: int) -> str:
+    parts: List[str] = []
+    length = 0
+    while length < chars:
+        parts.append(sentence(rng, rng.randint(8, 20)))
+        length += len(parts[-1]) + 1
+    return " ".join(parts)
+
+
+def wrong_id_string(rng: random.Random, exams: int, count: int) -> str:
+    """生成错题ID，混合 "1:2"、"1-2" 和 "3" 三种格式"""
+    pairs = rng.sample([(e, q) for e in range(1, exams + 1) for q in range(1, 6)], min(count, exams * 5))
+    items = []
+    for exam_id, question_num in pairs:
+        style = rng.random()
+        if style < 0.6:
+            items.append(f"{exam_id}:{question_num}")
+        elif style < 0.9:
+            items.append(f"{exam_id}-{question_num}")
+        else:
+            items.append(str(question_num))
+    return ",".join(items)
+
+
+def user_row(rng: random.Random, index: int, exams: int, wrong_ids: int) -> Dict[str, Any]:
+    return {
+        "name": f"student{index:05d}",
+        "grade": rng.choice(GRADES),
+        "major": rng.choice(MAJORS),
+        "gender": rng.choice(["男", "女"]),
+        "post_score": rng.randint(20, 100),
+        "after_score": rng.randint(20, 100),
+        "false_id": wrong_id_string(rng, exams, wrong_ids),
+        "post_strategies_score": rng.randint(15, 75),
+        "after_strategies_score": rng.randint(15, 75),
+        "exam1_score": rng.randint(0, 50),
+        "exam2_score": rng.randint(0, 50),
+        "Have you taken the CET-4 exam:": "Yes",
+        "CET-4 score": rng.randint(350, 650),
+        "CET-4 reading score": rng.randint(100, 240),
+        "Other English scores for reference": "IELTS 6.5",
+    }
+
+
+def populate(args) -> List[Dict[str, Any]]:
+    """写入合成数据，返回用户画像列表"""
+    from app.database import _insert_user_profile, get_db_connection, run_in_transaction
+
+    rng = random.Random(args.seed)
+    # 首次连接时建表并执行迁移
+    get_db_connection().close()
+
+    exams = []
+    for exam_id in range(1, args.exams + 1):
+        row = [exam_id, passage(rng, args.passage_chars)]
+        for _ in range(5):
+            row += [sentence(rng, 14) + " A. " + sentence(rng, 4) + " B. " + sentence(rng, 4), rng.choice("ABCD")]
+        exams.append(row)
+    users = [user_row(rng, i, args.exams, args.wrong_ids) for i in range(args.users)]
+    strategies = [(i, f"Strategy {i}", passage(rng, 300)) for i in range(1, 21)]
+
+    def write(cursor):
+        cursor.executemany(f"INSERT INTO exam VALUES ({', '.join('?' * 12)})", exams)
+        cursor.executemany("INSERT INTO CognitiveStrategies (id, content, detail) VALUES (?, ?, ?)", strategies)
+        for user in users:
+            _insert_user_profile(cursor, user)
+
+    run_in_transaction(write)
+    return users
+
+
+def run_sync(coro):
+    """同步执行不会挂起的协程（AI接口已替换为桩函数）"""
+    try:
+        coro.send(None)
+    except StopIteration as stop:
+        return stop.value
+    coro.close()
+    raise RuntimeError("基准中的协程不应挂起")
+
+
+def build_cases(args, users: List[Dict[str, Any]]) -> List[Tuple[str, Callable[[], Any]]]:
+    """基准项列表：(名称, 无参函数)"""
+    from fastapi.responses import ORJSONResponse
+
+    from app import ai_service, cohort_analysis, database, utils
+    from app.config import BOOTSTRAP_EXAM_IDS
+    from app.response_store import encode_json
+    from app.routers.planning import _bootstrap_payload, _exam_payload
+    from app.schemas.analysis import AnalysisResponse
+    from app.schemas.user import UserDetailResponse
+
+    async def stub_api(messages):
+        return {"success": True, "content": REPLY}
+
+    # 提示词构建只测本地耗时，AI接口立即返回
+    ai_service.call_deepseek_api = stub_api
+
+    rng = random.Random(args.seed)
+    names = [user["name"] for user in users]
+    profiles = [database.get_user_profile(name) for name in names[:50]]
+    largest = max(profiles, key=lambda p: len(p.get("false_id") or ""))
+    exam_ids = [1, 2]
+
+    def pick_name():
+        return names[rng.randrange(len(names))]
+
+    def pick_profile():
+        return profiles[rng.randrange(len(profiles))]
+
+    def update_profile():
+        database.update_user_profile({"name": pick_name(), "post_score": rng.randint(20, 100)})
+
+    # 序列化只测编码本身，响应模型预先构造
+    bootstrap = _bootstrap_payload('"bench"')
+    exam = _exam_payload(database.get_exam_by_id(1), 1)
+    user_payload = {"success": True, "user": largest}
+    return [
+        ("db.get_user_profile", lambda: database.get_user_profile(pick_name())),
+        ("db.update_user_profile", update_profile),
+        ("db.get_exam_by_id", lambda: database.get_exam_by_id(rng.randint(1, args.exams))),
+        ("db.get_introduction", database.get_introduction),
+        ("db.get_self_rate_items", database.get_self_rate_items),
+        ("db.get_strategy_items", database.get_strategy_items),
+        ("db.get_cognitive_strategies", database.get_cognitive_strategies),
+        ("db.get_bootstrap_content", lambda: database.get_bootstrap_content(BOOTSTRAP_EXAM_IDS)),
+        ("ai.parse_wrong_answer_ids", lambda: ai_service.parse_wrong_answer_ids(largest["false_id"], exam_ids)),
+        ("ai.analyze_user_profile", lambda: run_sync(ai_service.analyze_user_profile(pick_profile()))),
+        ("ai.analyze_wrong_answers", lambda: run_sync(ai_service.analyze_wrong_answers(pick_profile(), exam_ids))),
+        ("ai.suggest_reading_strategies",
+         lambda: run_sync(ai_service.suggest_reading_strategies(pick_profile()))),
+        ("ai.generate_final_summary", lambda: run_sync(ai_service.generate_final_summary(pick_profile()))),
+        ("ai.build_chat_context", lambda: ai_service.build_chat_context(pick_profile())),
+        ("ai.process_user_message",
+         lambda: run_sync(ai_service.process_user_message(pick_profile(), "略读和寻读分别适合什么题型？"))),
+        ("utils.format_markdown", lambda: utils.format_markdown(REPLY)),
+        ("stats.load_cohort", cohort_analysis.load_cohort),
+        ("stats.analyze_cohort", cohort_analysis.analyze_cohort),
+        ("json.bootstrap", lambda: encode_json(bootstrap)),
+        ("json.exam", lambda: encode_json(exam)),
+        ("json.user_detail",
+         lambda: ORJSONResponse(UserDetailResponse.model_validate(user_payload).model_dump(mode="json", by_alias=True))),
+        ("json.analysis",
+         lambda: ORJSONResponse(AnalysisResponse(analysis=REPLY).model_dump(mode="json", exclude_none=True))),
+    ]
+
+
+def measure(func: Callable[[], Any], repeat: int, min_time: float) -> Dict[str, Any]:
+    """
+    自动确定每轮调用次数，使一轮耗时不少于 min_time 秒，再测 repeat 轮
+    返回单次调用耗时（微秒）的中位数、最小值和标准差
+    """
+    timer = time.perf_counter
+    func()  # 预热
+    loops = 1
+    while True:
+        start = timer()
+        for _ in range(loops):
+            func()
+        elapsed = timer() - start
+        if elapsed >= min_time:
+            break
+        loops *= 10 if elapsed < min_time / 10 else 2
+
+    samples = [elapsed / loops * 1e6]
+    for _ in range(repeat - 1):
+        start = timer()
+        for _ in range(loops):
+            func()
+        samples.append((timer() - start) / loops * 1e6)
+    return {
+        "median_us": round(statistics.median(samples), 3),
+        "min_us": round(min(samples), 3),
+        "stdev_us": round(statistics.stdev(samples), 3) if len(samples) > 1 else 0.0,
+        "loops": loops,
+        "repeat": repeat,
+    }
+
+
+def compare(baseline: Dict[str, Any], current: Dict[str, Any], threshold: float) -> int:
+    """打印与基线的对比，返回回归项数"""
+    if baseline.get("params") != current["params"]:
+        logger.warning("基线的数据规模参数与本次不同，结果可能不可比: %s", baseline.get("params"))
+    regressions = 0
+    print(f"{'名称':<32}{'基线(µs)':>14}{'当前(µs)':>14}{'变化':>10}  状态")
+    for name, result in current["results"].items():
+        base = baseline.get("results", {}).get(name)
+        if not base:
+            print(f"{name:<32}{'-':>14}{result['median_us']:>14.2f}{'-':>10}  新增")
+            continue
+        ratio = result["median_us"] / base["median_us"] if base["median_us"] else 1.0
+        if ratio > 1 + threshold:
+            status = "回归"
+            regressions += 1
+        elif ratio < 1 - threshold:
+            status = "提升"
+        else:
+            status = "持平"
+        print(f"{name:<32}{base['median_us']:>14.2f}{result['median_us']:>14.2f}{ratio - 1:>+10.1%}  {status}")
+    return regressions
+
+
+def main(argv=None) -> int:
+    """命令行入口"""
+    parser = argparse.ArgumentParser(description="热点路径的微基准测试")
+    parser.add_argument("--users", type=int, default=1000, help="合成用户数")
+    parser.add_argument("--exams", type=int, default=4, help="合成试卷数（至少2套）")
+    parser.add_argument("--passage-chars", type=int, default=3000, help="每篇文章的字符数")
+    parser.add_argument("--wrong-ids", type=int, default=8, help="每名用户的错题数")
+    parser.add_argument("--seed", type=int, default=42, help="随机种子")
+    parser.add_argument("--repeat", type=int, default=7, help="每项测量的轮数")
+    parser.add_argument("--min-time", type=float, default=0.05, help="每轮的最短耗时（秒）")
+    parser.add_argument("--filter", action="append", default=[], help="只运行名称包含该字符串的项，可重复")
+    parser.add_argument("--save", type=Path, help="把结果保存为基线文件")
+    parser.add_argument("--compare", type=Path, help="与该基线文件比较")
+    parser.add_argument("--threshold", type=float, default=0.2, help="判定回归的变慢比例")
+    args = parser.parse_args(argv)
+    if args.exams < 2 or args.users < 1 or args.repeat < 1:
+        parser.error("--exams 至少为2，--users 和 --repeat 至少为1")
+
+    baseline: Optional[Dict[str, Any]] = None
+    if args.compare:
+        baseline = json.loads(args.compare.read_text(encoding="utf-8"))
+
+    with tempfile.TemporaryDirectory(prefix="perss-bench-") as workdir:
+        # 必须在导入 app 模块之前设置，数据库路径在导入配置时确定
+        os.environ["PERSS_DATABASE_PATH"] = str(Path(workdir) / "PERSS_DB.sqlite")
+        started = time.perf_counter()
+        users = populate(args)
+        cases = build_cases(args, users)
+        logger.info("合成数据已就绪: %d 名用户，%d 套试卷，耗时 %.1fs",
+                       args.users, args.exams, time.perf_counter() - started)
+
+        results: Dict[str, Any] = {}
+        for name, func in cases:
+            if args.filter and not any(pattern in name for pattern in args.filter):
+                continue
+            results[name] = measure(func, args.repeat, args.min_time)
+            if not baseline:
+                r = results[name]
+                print(f"{name:<32}{r['median_us']:>12.2f} µs  (min {r['min_us']:.2f}, "
+                      f"stdev {r['stdev_us']:.2f}, {r['loops']} x {r['repeat']})")
+
+    current = {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "params": {key: getattr(args, key) for key in ("users", "exams", "passage_chars", "wrong_ids", "seed")},
+        "results": results,
+    }
+    if args.save:
+        args.save.write_text(json.dumps(current, ensure_ascii=False, indent=2, sort_keys=True), encoding="utf-8")
+        logger.info("基线已保存到 %s", args.save)
+    if baseline:
+        regressions = compare(baseline, current, args.threshold)
+        if regressions:
+            logger.warning("%d 项变慢超过 %.0f%%", regressions, args.threshold * 100)
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
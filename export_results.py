@@ -0,0 +1,55 @@
+"""
+学习结果导出脚本
+将全部学生的画像、前后测成绩、策略得分和错题流式导出为CSV或NDJSON
+
+用法示例:
+    python export_results.py -o results.csv
+    python export_results.py --format ndjson --grade 大三 --since 2025-03-01 > results.ndjson
+"""
+import argparse
+import logging
+import sys
+import time
+
+from app.export import EXPORT_FORMATS, encode_csv, encode_ndjson, iter_profile_rows
+
+# 配置日志
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+                    stream=sys.stderr)
+logger = logging.getLogger("PERSS.export")
+
+
+def main(argv=None) -> int:
+    """命令行入口"""
+    parser = argparse.ArgumentParser(description="导出学生学习结果")
+    parser.add_argument("--format", choices=sorted(EXPORT_FORMATS), default="csv", help="导出格式")
+    parser.add_argument("-o", "--output", help="输出文件（默认输出到标准输出）")
+    parser.add_argument("--grade", help="按年级筛选")
+    parser.add_argument("--major", help="按专业筛选")
+    parser.add_argument("--since", help="创建时间下界（UTC），YYYY-MM-DD")
+    parser.add_argument("--until", help="创建时间上界（UTC，含当天），YYYY-MM-DD")
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    out = open(args.output, "w", encoding="utf-8", newline="") if args.output else sys.stdout
+    try:
+        rows = iter_profile_rows(grade=args.grade, major=args.major, since=args.since, until=args.until)
+        if args.format == "csv":
+            # 写文件时带BOM方便Excel打开；标准输出通常接管道，不加BOM
+            chunks = encode_csv(rows, with_bom=bool(args.output))
+        else:
+            chunks = encode_ndjson(rows)
+        for chunk in chunks:
+            out.write(chunk)
+    except ValueError as e:
+        logger.error(str(e))
+        return 2
+    finally:
+        if args.output:
+            out.close()
+    logger.info(f"导出完成，耗时 {time.perf_counter() - started:.2f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,159 @@
+import { API_BASE_URL } from './index';
+
+// AI对话的WebSocket连接
+// 每个学生保持一个长连接，服务器只在连接时加载一次画像；回复逐段推送，可以中途取消。
+// 连接断开后在下一次发送时重新连接，浏览器不支持或连接失败时由调用方改用HTTP接口。
+
+const CONNECT_TIMEOUT = 5000; // 等待服务器就绪的最长时间
+const SERVER_SILENCE_TIMEOUT = 50000; // 服务器每20秒发送心跳，超过该时间没有任何消息视为连接已失效
+
+export const isChatSocketSupported = typeof WebSocket !== 'undefined';
+
+const socketUrl = (name) => {
+  const url = new URL(API_BASE_URL, window.location.href);
+  url.protocol = url.protocol === 'https:' ? 'wss:' : 'ws:';
+  return `${url.href.replace(/\/$/, '')}/ws/chat/${encodeURIComponent(name)}`;
+};
+
+class ChatSocket {
+  constructor() {
+    this.socket = null;
+    this.name = null;
+    this.ready = null;
+    this.pending = new Map();
+    this.currentId = null;
+    this.nextId = 1;
+    this.watchdog = null;
+  }
+
+  // 建立连接，已连接同一学生时直接复用；返回收到 ready 后完成的 Promise
+  connect(name) {
+    if (this.socket && this.name === name && this.ready) {
+      return this.ready;
+    }
+    this.close();
+    this.name = name;
+
+    const socket = new WebSocket(socketUrl(name));
+    this.socket = socket;
+    this.ready = new Promise((resolve, reject) => {
+      const timer = setTimeout(() => {
+        reject(new Error('连接AI对话服务超时'));
+        socket.close();
+      }, CONNECT_TIMEOUT);
+
+      socket.onmessage = (event) => {
+        this.resetWatchdog(socket);
+        let frame;
+        try {
+          frame = JSON.parse(event.data);
+        } catch (error) {
+          return;
+        }
+        if (frame.type === 'ready') {
+          clearTimeout(timer);
+          resolve();
+        } else {
+          this.handleFrame(frame);
+        }
+      };
+
+      socket.onclose = () => {
+        clearTimeout(timer);
+        reject(new Error('AI对话连接已断开'));
+        this.handleClose(socket);
+      };
+    });
+    // 预先连接时可能没有人等待结果，避免未处理的 rejection
+    this.ready.catch(() => {});
+    return this.ready;
+  }
+
+  // 发送一条消息，onDelta 接收逐段推送的内容；完成时返回 { content, cancelled }
+  async send(name, text, onDelta) {
+    await this.connect(name);
+    const id = String(this.nextId++);
+    return new Promise((resolve, reject) => {
+      this.pending.set(id, { onDelta, resolve, reject, content: '' });
+      this.currentId = id;
+      this.sendFrame({ type: 'message', id, text });
+    });
+  }
+
+  // 取消正在生成的回复，已收到的内容保留
+  cancel() {
+    if (this.currentId && this.pending.has(this.currentId)) {
+      this.sendFrame({ type: 'cancel', id: this.currentId });
+    }
+  }
+
+  close() {
+    if (this.socket) {
+      const socket = this.socket;
+      this.handleClose(socket);
+      socket.close();
+    }
+  }
+
+  sendFrame(frame) {
+    if (this.socket && this.socket.readyState === WebSocket.OPEN) {
+      this.socket.send(JSON.stringify(frame));
+    }
+  }
+
+  handleFrame(frame) {
+    if (frame.type === 'ping') {
+      this.sendFrame({ type: 'pong' });
+      return;
+    }
+    const request = this.pending.get(frame.id);
+    if (!request) {
+      if (frame.type === 'error') {
+        console.warn('AI对话服务返回错误:', frame.message);
+      }
+      return;
+    }
+
+    if (frame.type === 'delta') {
+      request.content += frame.text;
+      if (request.onDelta) request.onDelta(frame.text);
+    } else if (frame.type === 'done') {
+      this.finish(frame.id);
+      request.resolve({ content: frame.text, cancelled: false });
+    } else if (frame.type === 'cancelled') {
+      this.finish(frame.id);
+      request.resolve({ content: request.content, cancelled: true });
+    } else if (frame.type === 'error') {
+      this.finish(frame.id);
+      const error = new Error(frame.message || 'AI服务出现错误');
+      error.retryAfter = frame.retry_after;
+      request.reject(error);
+    }
+  }
+
+  finish(id) {
+    this.pending.delete(id);
+    if (this.currentId === id) this.currentId = null;
+  }
+
+  // 一段时间收不到服务器的任何消息（包括心跳）时主动断开，下次发送时重连
+  resetWatchdog(socket) {
+    clearTimeout(this.watchdog);
+    this.watchdog = setTimeout(() => socket.close(), SERVER_SILENCE_TIMEOUT);
+  }
+
+  handleClose(socket) {
+    if (socket !== this.socket) return;
+    clearTimeout(this.watchdog);
+    this.socket = null;
+    this.ready = null;
+    this.currentId = null;
+    // 进行中的回复无法继续
+    for (const request of this.pending.values()) {
+      request.reject(new Error('AI对话连接已断开'));
+    }
+    this.pending.clear();
+  }
+}
+
+export const chatSocket = new ChatSocket();
@@ -0,0 +1,109 @@
+import { API_BASE_URL } from './index';
+
+// 学习行为事件上报
+// 事件先放入队列，每隔几秒或攒够一批后以NDJSON一次性发送，页面隐藏或关闭时用 sendBeacon 发出剩余事件
+
+const EVENTS_URL = `${API_BASE_URL}/events`;
+const FLUSH_INTERVAL = 5000; // 5秒发送一次
+const MAX_BATCH = 50; // 攒够50条立即发送
+const MAX_QUEUE = 1000; // 发送失败时最多保留的事件数
+const MAX_SERVER_ERRORS = 3; // 同一事件遇到服务器错误（5xx）的最多次数，超过后丢弃
+const GZIP_MIN_BYTES = 2048; // 超过该大小才压缩
+
+// 每次打开页面生成一个会话ID，用于区分同一用户的多次访问
+const sessionId = `${Date.now().toString(36)}-${Math.random().toString(36).slice(2, 10)}`;
+
+let queue = [];
+let timer = null;
+// 每条事件遇到服务器错误的次数，网络错误不计入
+const serverErrors = new WeakMap();
+
+class ServerError extends Error {}
+
+const scheduleFlush = () => {
+  if (!timer) {
+    timer = setTimeout(() => flushEvents(), FLUSH_INTERVAL);
+  }
+};
+
+// 记录一条事件，fields 可包含 page、item、value、data
+export const trackEvent = (type, fields = {}) => {
+  queue.push({
+    type,
+    ts: Date.now(),
+    name: localStorage.getItem('userName') || undefined,
+    session: sessionId,
+    ...fields
+  });
+
+  if (queue.length >= MAX_BATCH) {
+    flushEvents();
+  } else {
+    scheduleFlush();
+  }
+};
+
+// 浏览器支持时用gzip压缩请求体
+const encodeBody = async (text) => {
+  if (typeof CompressionStream === 'undefined' || text.length < GZIP_MIN_BYTES) {
+    return { body: text, gzip: false };
+  }
+  const stream = new Blob([text]).stream().pipeThrough(new CompressionStream('gzip'));
+  return { body: await new Response(stream).blob(), gzip: true };
+};
+
+// 发送队列中的事件；beacon 为 true 时用于页面卸载，不等待结果
+export const flushEvents = async ({ beacon = false } = {}) => {
+  clearTimeout(timer);
+  timer = null;
+  if (queue.length === 0) return;
+
+  const batch = queue;
+  queue = [];
+  const text = batch.map(event => JSON.stringify(event)).join('\n') + '\n';
+
+  // 页面卸载时来不及异步压缩，直接发送；text/plain 不会触发跨域预检
+  if (beacon && navigator.sendBeacon &&
+      navigator.sendBeacon(EVENTS_URL, new Blob([text], { type: 'text/plain' }))) {
+    return;
+  }
+
+  try {
+    const { body, gzip } = await encodeBody(text);
+    const headers = { 'Content-Type': 'application/x-ndjson' };
+    if (gzip) headers['Content-Encoding'] = 'gzip';
+    const response = await fetch(EVENTS_URL, { method: 'POST', body, headers, keepalive: true });
+    if (!response.ok && response.status >= 500) {
+      throw new ServerError(`HTTP ${response.status}`);
+    }
+  } catch (error) {
+    // 网络或服务器错误时放回队列稍后重试，超过上限丢弃最旧的事件；
+    // 多次遇到服务器错误的事件不再重试，避免一条坏事件让整批无限重发
+    let retry = batch;
+    if (error instanceof ServerError) {
+      retry = batch.filter(event => {
+        const count = (serverErrors.get(event) || 0) + 1;
+        serverErrors.set(event, count);
+        return count < MAX_SERVER_ERRORS;
+      });
+    }
+    console.warn('事件上报失败，稍后重试:', error.message);
+    queue = retry.concat(queue).slice(-MAX_QUEUE);
+    if (queue.length > 0) scheduleFlush();
+  }
+};
+
+// 页面隐藏（切换标签页、关闭、刷新）时发送剩余事件
+if (typeof window !== 'undefined') {
+  document.addEventListener('visibilitychange', () => {
+    if (document.visibilityState === 'hidden') {
+      flushEvents({ beacon: true });
+    }
+  });
+  window.addEventListener('pagehide', () => flushEvents({ beacon: true }));
+}
+
+export default {
+  track: trackEvent,
+  flush: flushEvents
+};
@@ -1,13 +1,12 @@
 import axios from 'axios';
 
-// 确定当前环境
-const isDevelopment = process.env.NODE_ENV === 'development';
+// 开发环境由Vue代理转发 /api，生产环境前端由后端直接提供，同源访问，不需要CORS预检
+// 前后端分开部署时可通过 VUE_APP_API_BASE_URL 指定完整地址
+export const API_BASE_URL = process.env.VUE_APP_API_BASE_URL || '/api';
 
 // 创建axios实例
 const api = axios.create({
-  // 在开发环境中使用相对路径，让Vue代理处理
-  // 在生产环境中使用完整URL
-  baseURL: isDevelopment ? '/api' : 'http://localhost:8000/api',
+  baseURL: API_BASE_URL,
   headers: {
     'Content-Type': 'application/json'
   },
@@ -16,7 +15,7 @@ const api = axios.create({
 
 // 创建具有更长超时时间的axios实例，用于AI相关操作
 const aiApi = axios.create({
-  baseURL: isDevelopment ? '/api' : 'http://localhost:8000/api',
+  baseURL: API_BASE_URL,
   headers: {
     'Content-Type': 'application/json'
   },
@@ -81,6 +80,10 @@ aiApi.interceptors.response.use(
       // 服务器返回了错误响应
       console.error(`AI API错误: ${error.response.status} - ${error.response.statusText}`);
       console.error('完整错误对象:', error);
+      // 请求过于频繁时显示服务器给出的等待时间
+      if (error.response.status === 429 && error.response.data && error.response.data.detail) {
+        error.message = error.response.data.detail;
+      }
     } else if (error.request) {
       // 请求已发送但没有收到响应
       console.error('AI API错误: 没有收到服务器响应，请检查后端服务是否运行');
@@ -93,8 +96,41 @@ aiApi.interceptors.response.use(
   }
 );
 
+// 提交类请求的幂等键：一次提交生成一个键，网络重试时沿用，服务器对同一个键只处理一次
+const SUBMIT_RETRIES = 2; // 没有收到响应时的重试次数
+const SUBMIT_RETRY_DELAY = 1000; // 第一次重试前的等待时间（毫秒），之后加倍
+
+const newIdempotencyKey = () => {
+  if (typeof crypto !== 'undefined' && crypto.randomUUID) {
+    return crypto.randomUUID();
+  }
+  return `${Date.now().toString(36)}-${Math.random().toString(36).slice(2)}-${Math.random().toString(36).slice(2)}`;
+};
+
+// 发送提交请求，请求发出后没有收到响应（超时、断网）时带同一个幂等键重试
+const postIdempotent = async (url, data) => {
+  const headers = { 'Idempotency-Key': newIdempotencyKey() };
+  for (let attempt = 0; ; attempt++) {
+    try {
+      return await api.post(url, data, { headers });
+    } catch (error) {
+      if (error.response || attempt >= SUBMIT_RETRIES) {
+        throw error;
+      }
+      console.warn(`提交 ${url} 没有收到响应，第${attempt + 1}次重试`);
+      await new Promise(resolve => setTimeout(resolve, SUBMIT_RETRY_DELAY * 2 ** attempt));
+    }
+  }
+};
+
 // 计划阶段API
 const planningApi = {
+  // 一次获取计划阶段的全部静态内容；内容未变化时服务器返回304，响应体为空
+  getBootstrap: (etag) => api.get('/bootstrap', {
+    headers: etag ? { 'If-None-Match': etag } : {},
+    validateStatus: status => (status >= 200 && status < 300) || status === 304
+  }),
+
   // 获取系统介绍
   getIntroduction: () => api.get('/introduction'),
 
@@ -104,7 +140,7 @@ const planningApi = {
   // 创建用户画像
   createUserProfile: (userData) => {
     console.log('准备发送的用户画像数据:', userData);
-    return api.post('/user-profile', userData);
+    return postIdempotent('/user-profile', userData);
   },
 
   // 获取试卷
@@ -113,11 +149,11 @@ const planningApi = {
   // 获取策略列表
   getStrategies: () => api.get('/strategies'),
 
-  // 提交试卷结果
-  submitExamResult: (result) => api.post('/exam-result', result),
+  // 提交作答，由服务器阅卷并记录成绩
+  submitExamAnswers: (submission) => postIdempotent('/exam-submission', submission),
 
   // 提交策略问卷结果
-  submitStrategyResult: (result) => api.post('/strategy-result', result),
+  submitStrategyResult: (result) => postIdempotent('/strategy-result', result),
 };
 
 // 执行阶段API
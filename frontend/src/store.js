@@ -1,5 +1,10 @@
 import { createStore } from 'vuex';
 import api from './api';
+import { chatSocket, isChatSocketSupported } from './api/chatSocket';
+
+// 启动内容在本地的缓存键，以及正在进行的启动请求（避免重复请求）
+const BOOTSTRAP_CACHE_KEY = 'bootstrapContent';
+let bootstrapRequest = null;
 
 export default createStore({
   state: {
@@ -12,12 +17,14 @@ export default createStore({
     selfRateItems: [],
     examData: {},
     strategyItems: [],
+    contentVersion: null,
 
     // 执行阶段
     profileAnalysis: '',
     wrongAnswersAnalysis: '',
     strategySuggestions: '',
     chatHistory: [],
+    chatStreaming: false,
 
     // 反馈阶段
     finalSummary: '',
@@ -104,10 +111,32 @@ export default createStore({
       state.chatHistory.push(message);
     },
 
+    // 流式回复：把推送的内容追加到最后一条（AI）消息
+    APPEND_CHAT_DELTA(state, delta) {
+      const last = state.chatHistory[state.chatHistory.length - 1];
+      if (last) last.content += delta;
+    },
+
+    FINISH_CHAT_MESSAGE(state, fields) {
+      const last = state.chatHistory[state.chatHistory.length - 1];
+      if (last) Object.assign(last, fields, { streaming: false });
+    },
+
+    SET_CHAT_STREAMING(state, streaming) {
+      state.chatStreaming = streaming;
+    },
+
     SET_FINAL_SUMMARY(state, summary) {
       state.finalSummary = summary;
     },
 
+    SET_BOOTSTRAP(state, content) {
+      state.contentVersion = content.content_version;
+      state.introduction = content.introduction;
+      state.selfRateItems = content.self_rate_items;
+      state.strategyItems = content.strategies;
+    },
+
     SET_CURRENT_PHASE(state, phase) {
       state.currentPhase = phase;
       localStorage.setItem('currentPhase', phase);
@@ -116,7 +145,40 @@ export default createStore({
 
   actions: {
     // 计划阶段
-    async fetchIntroduction({ commit }) {
+    // 加载启动内容：本地有缓存时带ETag请求，服务器返回304则直接使用缓存
+    fetchBootstrap({ commit }) {
+      if (bootstrapRequest) return bootstrapRequest;
+
+      bootstrapRequest = (async () => {
+        let cached = null;
+        try {
+          cached = JSON.parse(localStorage.getItem(BOOTSTRAP_CACHE_KEY));
+        } catch (e) {
+          cached = null;
+        }
+
+        try {
+          const response = await api.planning.getBootstrap(cached && cached.etag);
+          const content = response && response.content_version ? response : cached;
+          if (!content) return false;
+
+          if (content !== cached) {
+            localStorage.setItem(BOOTSTRAP_CACHE_KEY, JSON.stringify(content));
+          }
+          commit('SET_BOOTSTRAP', content);
+          return true;
+        } catch (error) {
+          console.error('获取启动内容出错，改用单独接口:', error);
+          bootstrapRequest = null;
+          return false;
+        }
+      })();
+      return bootstrapRequest;
+    },
+
+    async fetchIntroduction({ commit, dispatch, state }) {
+      if (await dispatch('fetchBootstrap') && state.introduction) return;
+
       commit('SET_LOADING', true);
       try {
         const response = await api.planning.getIntroduction();
@@ -150,7 +212,9 @@ export default createStore({
       }
     },
 
-    async fetchSelfRateItems({ commit }) {
+    async fetchSelfRateItems({ commit, dispatch, state }) {
+      if (await dispatch('fetchBootstrap') && state.selfRateItems.length) return;
+
       commit('SET_LOADING', true);
       try {
         const response = await api.planning.getSelfRateItems();
@@ -244,7 +308,9 @@ export default createStore({
       }
     },
 
-    async fetchStrategies({ commit }) {
+    async fetchStrategies({ commit, dispatch, state }) {
+      if (await dispatch('fetchBootstrap') && state.strategyItems.length) return;
+
       commit('SET_LOADING', true);
       try {
         const response = await api.planning.getStrategies();
@@ -272,27 +338,21 @@ export default createStore({
       }
     },
 
-    async submitExamResult({ commit, state }, { examId, score, wrongQuestions }) {
+    // 提交作答由服务器阅卷，返回得分、错题和逐题结果，失败时返回 null
+    async submitExamAnswers({ commit, state }, { examId, answers }) {
       commit('SET_LOADING', true);
       try {
-        const result = {
+        const response = await api.planning.submitExamAnswers({
           name: state.userName,
           exam_id: examId,
-          score: score,
-          wrong_questions: wrongQuestions
-        };
-
-        const response = await api.planning.submitExamResult(result);
-        console.log('提交试卷结果响应:', response);
-
-        // 处理不同格式的响应
-        return response.success === true ||
-               (response.message && response.message.includes('成功')) ||
-               !response.error;
+          answers
+        });
+        console.log('阅卷结果:', response);
+        return response && response.success ? response : null;
       } catch (error) {
-        console.error('提交试卷结果错误:', error);
-        commit('SET_ERROR', error.message || '提交试卷结果失败');
-        return false;
+        console.error('提交作答错误:', error);
+        commit('SET_ERROR', error.message || '提交作答失败');
+        return null;
       } finally {
         commit('SET_LOADING', false);
       }
@@ -557,7 +617,55 @@ export default createStore({
       }
     },
 
-    async sendChatMessage({ commit, state }, message) {
+    // 优先通过WebSocket发送，回复逐段显示；WebSocket不可用时改用HTTP接口
+    async sendChatMessage({ commit, dispatch, state }, message) {
+      if (!state.userName) return null;
+      if (!isChatSocketSupported) return dispatch('sendChatMessageHttp', message);
+
+      try {
+        await chatSocket.connect(state.userName);
+      } catch (error) {
+        console.warn('WebSocket连接失败，改用HTTP接口:', error);
+        return dispatch('sendChatMessageHttp', message);
+      }
+
+      commit('ADD_CHAT_MESSAGE', {
+        role: 'user',
+        content: message,
+        timestamp: new Date().toISOString()
+      });
+      commit('ADD_CHAT_MESSAGE', {
+        role: 'assistant',
+        content: '',
+        streaming: true,
+        timestamp: new Date().toISOString()
+      });
+      commit('SET_CHAT_STREAMING', true);
+      try {
+        const result = await chatSocket.send(state.userName, message, (delta) => commit('APPEND_CHAT_DELTA', delta));
+        commit('FINISH_CHAT_MESSAGE', {
+          content: result.content,
+          cancelled: result.cancelled,
+          timestamp: new Date().toISOString()
+        });
+        return state.chatHistory[state.chatHistory.length - 1];
+      } catch (error) {
+        console.error('发送消息错误:', error);
+        const last = state.chatHistory[state.chatHistory.length - 1];
+        commit('FINISH_CHAT_MESSAGE', { content: last.content || `抱歉，${error.message}` });
+        commit('SET_ERROR', error.message || '发送消息失败');
+        return null;
+      } finally {
+        commit('SET_CHAT_STREAMING', false);
+      }
+    },
+
+    // 取消正在生成的回复
+    cancelChatMessage() {
+      chatSocket.cancel();
+    },
+
+    async sendChatMessageHttp({ commit, state }, message) {
       if (!state.userName) return null;
 
       // 添加用户消息到历史
@@ -0,0 +1,87 @@
+"""
+批量阅卷脚本
+纸质前测录入后，一次批改全班答卷并在一个事务中记录成绩，输出每个学生的得分和错题
+
+用法示例:
+    python grade_batch.py answers.csv
+    python grade_batch.py answers.json --dry-run -o report.csv
+
+CSV首行为列名：name, exam_id, a1, ..., a5
+JSON为答卷数组：[{"name": "张三", "exam_id": 1, "answers": ["B", "D", "A", "C", "B"]}, ...]
+"""
+import argparse
+import csv
+import json
+import logging
+import sys
+import time
+from functools import partial
+from pathlib import Path
+
+from app.database import apply_exam_results, migrate_database, run_in_transaction
+from app.grading import grade_batch, parse_batch_csv, parse_batch_json
+
+# 配置日志
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+                    stream=sys.stderr)
+logger = logging.getLogger("PERSS.grade")
+
+REPORT_COLUMNS = ["name", "exam_id", "success", "score", "max_score", "wrong_questions", "error"]
+
+
+def load_rows(path: Path, fmt: str):
+    """读取答卷文件"""
+    text = path.read_text(encoding="utf-8-sig")
+    if fmt == "csv":
+        return parse_batch_csv(text)
+    return parse_batch_json(json.loads(text))
+
+
+def write_report(reports, out):
+    """以CSV输出每份答卷的阅卷结果"""
+    writer = csv.writer(out)
+    writer.writerow(REPORT_COLUMNS)
+    for report in reports:
+        row = dict(report, wrong_questions=",".join(report.get("wrong_questions", [])))
+        writer.writerow([row.get(column, "") for column in REPORT_COLUMNS])
+
+
+def main(argv=None) -> int:
+    """命令行入口"""
+    parser = argparse.ArgumentParser(description="批量批改前测答卷并记录成绩")
+    parser.add_argument("file", help="答卷文件（CSV或JSON）")
+    parser.add_argument("--format", choices=["csv", "json"], help="文件格式（默认按扩展名判断）")
+    parser.add_argument("-o", "--output", help="阅卷报告CSV（默认输出到标准输出）")
+    parser.add_argument("--dry-run", action="store_true", help="只阅卷，不写入数据库")
+    args = parser.parse_args(argv)
+
+    path = Path(args.file)
+    fmt = args.format or ("csv" if path.suffix.lower() == ".csv" else "json")
+    started = time.perf_counter()
+    try:
+        migrate_database()
+        reports = grade_batch(load_rows(path, fmt))
+    except (OSError, ValueError) as e:
+        # GradingError 和 JSONDecodeError 都是 ValueError
+        logger.error(str(e))
+        return 2
+
+    recorded = 0
+    if not args.dry_run:
+        recorded = run_in_transaction(partial(apply_exam_results, results=reports))
+
+    out = open(args.output, "w", encoding="utf-8-sig", newline="") if args.output else sys.stdout
+    try:
+        write_report(reports, out)
+    finally:
+        if args.output:
+            out.close()
+
+    failed = sum(1 for report in reports if not report["success"])
+    logger.info(f"阅卷完成: {len(reports)} 份答卷，失败 {failed} 份，记录 {recorded} 份，"
+                f"耗时 {time.perf_counter() - started:.2f}s")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,268 @@
+"""
+内容批量导入脚本
+从JSONL或CSV文件流式导入试卷（文章、题目、答案）、阅读策略、认知策略和自评量表
+
+用法示例:
+    python import_content.py exam exams.jsonl
+    python import_content.py strategy strategies.csv --batch-size 2000
+    python import_content.py self-rate items.jsonl --dry-run
+
+JSONL每行一个对象，CSV首行为列名：
+    exam       id, content, t1, a1, ..., t5, a5
+               （JSONL也可使用 "questions": [{"question": ..., "answer": ...}]）
+    strategy   id, content
+    cognitive  id, content, detail
+    self-rate  id, content
+"""
+import argparse
+import csv
+import json
+import logging
+import sqlite3
+import sys
+import time
+from itertools import islice
+from pathlib import Path
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+from app.config import DATABASE_PATH
+from app.database import ensure_content_tables
+
+# 配置日志
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger("PERSS.import")
+
+# 每套试卷最多5道题
+MAX_QUESTIONS = 5
+
+# 每种内容对应的表、列和插入语句（按id覆盖已有记录，便于重复导入）
+EXAM_COLUMNS = ["id", "content"] + [f"{p}{i}" for i in range(1, MAX_QUESTIONS + 1) for p in ("t", "a")]
+CONTENT_KINDS = {
+    "exam": ("exam", EXAM_COLUMNS),
+    "strategy": ("Strategies", ["id", "content"]),
+    "cognitive": ("CognitiveStrategies", ["id", "content", "detail"]),
+    "self-rate": ("self_rate", ["id", "content"]),
+}
+
+# 错误行最多打印的条数，避免大文件刷屏
+MAX_LOGGED_ERRORS = 20
+
+
+class RowError(ValueError):
+    """导入行校验失败"""
+
+
+def build_upsert_sql(table: str, columns: list) -> str:
+    """构造按id覆盖的插入语句"""
+    column_sql = ", ".join(f'"{c}"' for c in columns)
+    placeholders = ", ".join("?" for _ in columns)
+    updates = ", ".join(f'"{c}" = excluded."{c}"' for c in columns if c != "id")
+    return (f'INSERT INTO "{table}" ({column_sql}) VALUES ({placeholders}) '
+            f'ON CONFLICT(id) DO UPDATE SET {updates}')
+
+
+def _text(value: Any) -> Optional[str]:
+    """去除首尾空白，空字符串视为缺失"""
+    if value is None:
+        return None
+    value = str(value).strip()
+    return value or None
+
+
+def _row_id(row: Dict[str, Any]) -> int:
+    """校验并返回正整数id"""
+    try:
+        row_id = int(str(row.get("id", "")).strip())
+    except ValueError:
+        raise RowError(f"id无效: {row.get('id')!r}")
+    if row_id <= 0:
+        raise RowError(f"id必须是正整数: {row_id}")
+    return row_id
+
+
+def validate_exam(row: Dict[str, Any]) -> Tuple:
+    """校验试卷行，返回与EXAM_COLUMNS对应的元组"""
+    row_id = _row_id(row)
+    content = _text(row.get("content"))
+    if not content:
+        raise RowError("content不能为空")
+
+    # 支持 questions 列表写法，转换为 t1/a1 ... 列
+    questions = row.get("questions")
+    if questions is not None:
+        if not isinstance(questions, list) or len(questions) > MAX_QUESTIONS:
+            raise RowError(f"questions必须是不超过{MAX_QUESTIONS}项的列表")
+        row = dict(row)
+        for i, q in enumerate(questions, 1):
+            if not isinstance(q, dict):
+                raise RowError(f"第{i}题格式错误")
+            row[f"t{i}"] = q.get("question")
+            row[f"a{i}"] = q.get("answer")
+
+    values = [row_id, content]
+    question_count = 0
+    for i in range(1, MAX_QUESTIONS + 1):
+        question, answer = _text(row.get(f"t{i}")), _text(row.get(f"a{i}"))
+        if bool(question) != bool(answer):
+            raise RowError(f"第{i}题的题目和答案必须同时提供")
+        if question:
+            question_count += 1
+        values.extend([question, answer])
+    if question_count == 0:
+        raise RowError("试卷至少需要一道题")
+    return tuple(values)
+
+
+def validate_strategy(row: Dict[str, Any]) -> Tuple:
+    """校验策略量表/自评量表行"""
+    row_id = _row_id(row)
+    content = _text(row.get("content") or row.get("内容"))
+    if not content:
+        raise RowError("content不能为空")
+    return row_id, content
+
+
+def validate_cognitive(row: Dict[str, Any]) -> Tuple:
+    """校验认知策略行"""
+    row_id, content = validate_strategy(row)
+    return row_id, content, _text(row.get("detail"))
+
+
+VALIDATORS = {
+    "exam": validate_exam,
+    "strategy": validate_strategy,
+    "cognitive": validate_cognitive,
+    "self-rate": validate_strategy,
+}
+
+
+def iter_records(path: Path, fmt: str) -> Iterator[Tuple[int, Any]]:
+    """逐行读取文件，返回 (行号, 记录)，不把整个文件读入内存"""
+    with open(path, "r", encoding="utf-8-sig", newline="") as f:
+        if fmt == "csv":
+            # 首行为列名，数据从第2行开始
+            for line_no, record in enumerate(csv.DictReader(f), 2):
+                yield line_no, record
+        else:
+            for line_no, line in enumerate(f, 1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    yield line_no, json.loads(line)
+                except json.JSONDecodeError as e:
+                    yield line_no, RowError(f"JSON解析失败: {e}")
+
+
+def iter_valid_rows(path: Path, fmt: str, kind: str, stats: Dict[str, int], strict: bool) -> Iterator[Tuple]:
+    """校验记录，跳过（或在strict模式下中止于）无效行"""
+    validate = VALIDATORS[kind]
+    for line_no, record in iter_records(path, fmt):
+        stats["read"] += 1
+        try:
+            if isinstance(record, Exception):
+                raise record
+            if not isinstance(record, dict):
+                raise RowError("每行必须是一个对象")
+            yield validate(record)
+        except RowError as e:
+            stats["invalid"] += 1
+            if strict:
+                raise RowError(f"第{line_no}行: {e}")
+            if stats["invalid"] <= MAX_LOGGED_ERRORS:
+                logger.warning(f"跳过第{line_no}行: {e}")
+
+
+def detect_format(path: Path, fmt: Optional[str]) -> str:
+    """根据参数或扩展名确定文件格式"""
+    if fmt:
+        return fmt
+    return "csv" if path.suffix.lower() == ".csv" else "jsonl"
+
+
+def import_file(path: Path, kind: str, db_path: str, fmt: Optional[str] = None,
+                batch_size: int = 5000, strict: bool = False, dry_run: bool = False) -> Dict[str, Any]:
+    """
+    流式导入一个文件
+
+    所有批次在同一个事务中用 executemany 写入，导入期间放宽同步设置；
+    任一批次失败则整体回滚，数据库保持导入前的状态。
+    """
+    fmt = detect_format(path, fmt)
+    table, columns = CONTENT_KINDS[kind]
+    sql = build_upsert_sql(table, columns)
+    stats = {"read": 0, "invalid": 0, "written": 0}
+    rows = iter_valid_rows(path, fmt, kind, stats, strict)
+
+    started = time.perf_counter()
+    if dry_run:
+        for _ in rows:
+            pass
+    else:
+        # isolation_level=None: 由脚本显式控制事务边界
+        conn = sqlite3.connect(db_path, isolation_level=None)
+        try:
+            ensure_content_tables(conn)
+            # 以下设置仅对当前连接生效，连接关闭后自动恢复
+            conn.execute("PRAGMA synchronous = OFF")
+            conn.execute("PRAGMA temp_store = MEMORY")
+            conn.execute("PRAGMA cache_size = -65536")  # 64MB
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                while True:
+                    batch = list(islice(rows, batch_size))
+                    if not batch:
+                        break
+                    conn.executemany(sql, batch)
+                    stats["written"] += len(batch)
+                    logger.info(f"已写入 {stats['written']} 行")
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        finally:
+            conn.close()
+
+    elapsed = time.perf_counter() - started
+    stats.update({
+        "file": str(path),
+        "kind": kind,
+        "format": fmt,
+        "seconds": round(elapsed, 3),
+        "rows_per_second": round((stats["written"] or stats["read"]) / elapsed, 1) if elapsed > 0 else 0.0,
+    })
+    return stats
+
+
+def main(argv=None) -> int:
+    """命令行入口"""
+    parser = argparse.ArgumentParser(description="从JSONL/CSV批量导入试卷和量表内容")
+    parser.add_argument("kind", choices=sorted(CONTENT_KINDS), help="内容类型")
+    parser.add_argument("files", nargs="+", type=Path, help="JSONL或CSV文件")
+    parser.add_argument("--format", choices=["jsonl", "csv"], help="文件格式（默认按扩展名判断）")
+    parser.add_argument("--db", default=DATABASE_PATH, help="数据库路径")
+    parser.add_argument("--batch-size", type=int, default=5000, help="每批写入行数")
+    parser.add_argument("--strict", action="store_true", help="遇到无效行时中止并回滚")
+    parser.add_argument("--dry-run", action="store_true", help="只校验，不写入数据库")
+    args = parser.parse_args(argv)
+
+    exit_code = 0
+    for path in args.files:
+        try:
+            stats = import_file(path, args.kind, args.db, fmt=args.format, batch_size=args.batch_size,
+                                strict=args.strict, dry_run=args.dry_run)
+        except (OSError, RowError, sqlite3.Error) as e:
+            logger.error(f"导入 {path} 失败: {e}")
+            exit_code = 1
+            continue
+        logger.info(
+            f"{path}: 读取 {stats['read']} 行，写入 {stats['written']} 行，跳过 {stats['invalid']} 行，"
+            f"耗时 {stats['seconds']}s，{stats['rows_per_second']} 行/秒"
+        )
+        if stats["invalid"]:
+            exit_code = 1
+    return exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
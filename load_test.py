@@ -0,0 +1,525 @@
+"""
+班级压测脚本
+模拟多名学生按 计划 -> 执行 -> 反馈 的顺序完成整个学习流程，统计每个接口的吞吐量、延迟分位数和错误率
+AI对话与前端一样走WebSocket，另外统计首段回复和完整回复的耗时（ws_chat）
+
+默认在临时目录中复制一份数据库，启动本地模拟AI服务（mock_ai_server.py）和后端，
+压测结束后全部清理，不会修改正式数据库。相同参数和随机种子下，每个学生的行为序列相同，结果可在多次运行之间比较。
+
+用法示例:
+    python load_test.py --students 300 --ramp 60
+    python load_test.py --students 50 --think-scale 0.05 -o before.json
+    python load_test.py --url http://localhost:8000 --students 20
+"""
+import argparse
+import asyncio
+import gzip
+import json
+import logging
+import math
+import os
+import platform
+import random
+import shutil
+import socket
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import httpx
+
+try:
+    import websockets
+except ImportError:
+    websockets = None
+
+# 配置日志
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+                    stream=sys.stderr)
+logger = logging.getLogger("PERSS.loadtest")
+# 不逐条记录压测请求
+logging.getLogger("httpx").setLevel(logging.WARNING)
+
+ROOT_DIR = Path(__file__).resolve().parent
+DATABASE_FILE = ROOT_DIR / "PERSS_DB.sqlite"
+
+# 各步骤前的思考时间（秒）：(最短, 最长)，乘以 --think-scale
+THINK_TIMES = {
+    "introduction": (20, 60),
+    "self_rate": (60, 180),
+    "profile": (30, 90),
+    "exam": (240, 600),
+    "strategy": (60, 180),
+    "analysis": (20, 60),
+    "chat": (15, 60),
+    "summary": (30, 90),
+}
+# 每名学生在执行阶段发送的对话消息数
+CHAT_MESSAGES = (1, 3)
+CHAT_PROMPTS = [
+    "How can I read faster without missing details?",
+    "我总是看不懂长难句，应该怎么办？",
+    "略读和寻读分别适合什么题型？",
+    "What should I do when I meet many new words?",
+]
+PRE_TEST_EXAMS = (1, 2)
+POST_TEST_EXAMS = (3, 4)
+# 作答时选对的概率，前测和后测
+ANSWER_ACCURACY = {"pre": 0.55, "post": 0.7}
+LATENCY_PERCENTILES = (50, 90, 95, 99)
+REQUEST_TIMEOUT = 130.0
+# WebSocket对话在统计中的接口名：建立连接（握手到收到 ready）和一条消息的完整回复
+WS_CHAT_CONNECT = "WS /api/ws/chat/{name}"
+WS_CHAT_REPLY = "WS chat reply"
+
+
+class Recorder:
+    """按接口记录每次请求的耗时和结果"""
+
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.statuses: Dict[str, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+        self.errors: Dict[str, int] = defaultdict(int)
+        # WebSocket对话从发送消息到收到第一段回复的耗时
+        self.first_deltas: List[float] = []
+
+    def record(self, endpoint: str, seconds: float, status: str, ok: bool):
+        self.latencies[endpoint].append(seconds)
+        self.statuses[endpoint][status] += 1
+        if not ok:
+            self.errors[endpoint] += 1
+
+    def summary(self, duration: float) -> Dict[str, dict]:
+        endpoints = {endpoint: _stats(self.latencies[endpoint], self.errors[endpoint],
+                                      self.statuses[endpoint], duration)
+                     for endpoint in sorted(self.latencies)}
+        all_latencies = [value for values in self.latencies.values() for value in values]
+        all_statuses: Dict[str, int] = defaultdict(int)
+        for statuses in self.statuses.values():
+            for status, count in statuses.items():
+                all_statuses[status] += count
+        total = _stats(all_latencies, sum(self.errors.values()), all_statuses, duration)
+        ws_chat = {
+            "messages": len(self.latencies.get(WS_CHAT_REPLY, [])),
+            "first_delta_ms": _latency_summary(sorted(self.first_deltas)),
+            "reply_ms": _latency_summary(sorted(self.latencies.get(WS_CHAT_REPLY, []))),
+        }
+        return {"endpoints": endpoints, "total": total, "ws_chat": ws_chat}
+
+
+def _percentile(sorted_values: List[float], percentile: float) -> float:
+    """最近秩法分位数"""
+    rank = math.ceil(percentile / 100 * len(sorted_values))
+    return sorted_values[max(0, min(len(sorted_values), rank) - 1)]
+
+
+def _latency_summary(values: List[float]) -> dict:
+    """已排序耗时（秒）的均值、最大值和分位数（毫秒）"""
+    if not values:
+        return {}
+    latency = {"mean": round(sum(values) / len(values) * 1000, 2), "max": round(values[-1] * 1000, 2)}
+    for percentile in LATENCY_PERCENTILES:
+        latency[f"p{percentile}"] = round(_percentile(values, percentile) * 1000, 2)
+    return latency
+
+
+def _stats(latencies: List[float], errors: int, statuses: Dict[str, int], duration: float) -> dict:
+    values = sorted(latencies)
+    count = len(values)
+    return {
+        "requests": count,
+        "errors": errors,
+        "error_rate": round(errors / count, 4) if count else 0.0,
+        "throughput_rps": round(count / duration, 3) if duration > 0 else 0.0,
+        "latency_ms": _latency_summary(values),
+        "status": dict(sorted(statuses.items())),
+    }
+
+
+class VirtualStudent:
+    """一名虚拟学生，随机数只来自自己的种子，保证多次运行行为一致"""
+
+    def __init__(self, index: int, client: httpx.AsyncClient, recorder: Recorder, seed: int, think_scale: float,
+                 answer_keys: Dict[int, List[str]]):
+        self.name = f"loadtest-{seed}-{index:04d}"
+        self.client = client
+        # https -> wss, http -> ws
+        self.ws_url = "ws" + str(client.base_url).rstrip("/")[4:]
+        self.recorder = recorder
+        self.answer_keys = answer_keys
+        self.random = random.Random(f"{seed}:{index}")
+        self.think_scale = think_scale
+        self.events: List[dict] = []
+
+    async def request(self, endpoint: str, method: str, url: str, **kwargs) -> Optional[httpx.Response]:
+        """发送请求并记录，endpoint 为统计用的接口名（路径模板）"""
+        started = time.perf_counter()
+        try:
+            response = await self.client.request(method, url, **kwargs)
+        except httpx.HTTPError as e:
+            self.recorder.record(endpoint, time.perf_counter() - started, type(e).__name__, False)
+            return None
+        self.recorder.record(endpoint, time.perf_counter() - started, str(response.status_code),
+                             response.status_code < 400)
+        return response
+
+    async def think(self, step: str):
+        low, high = THINK_TIMES[step]
+        self.track("page.enter", step)
+        await asyncio.sleep(self.random.uniform(low, high) * self.think_scale)
+
+    def track(self, event_type: str, page: str, **fields):
+        self.events.append({"type": event_type, "ts": int(time.time() * 1000), "name": self.name,
+                            "page": page, **fields})
+
+    async def flush_events(self):
+        """与前端一样以NDJSON批量上报学习行为事件"""
+        if not self.events:
+            return
+        body = "\n".join(json.dumps(event, ensure_ascii=False) for event in self.events).encode("utf-8")
+        self.events = []
+        await self.request("POST /api/events", "POST", "/api/events", content=gzip.compress(body),
+                           headers={"Content-Type": "application/x-ndjson", "Content-Encoding": "gzip"})
+
+    def answers_for(self, exam_id: int, exam: dict, stage: str) -> List[str]:
+        """按正确率作答，答错时随机选另一个选项；试卷接口不返回参考答案，答案取自数据库副本"""
+        answers = []
+        keys = self.answer_keys.get(exam_id, [])
+        for number, question in enumerate(exam.get("questions", [])):
+            key = keys[number] if number < len(keys) else ""
+            if self.random.random() < ANSWER_ACCURACY[stage] or key not in "ABCD" or not key:
+                answers.append(key)
+            else:
+                answers.append(self.random.choice([option for option in "ABCD" if option != key]))
+        return answers
+
+    async def take_exam(self, exam_id: int, stage: str):
+        response = await self.request("GET /api/exam/{exam_id}", "GET", f"/api/exam/{exam_id}")
+        exam = response.json() if response is not None and response.status_code == 200 else {}
+        await self.think("exam")
+        await self.request("POST /api/exam-submission", "POST", "/api/exam-submission",
+                           json={"name": self.name, "exam_id": exam_id, "answers": self.answers_for(exam_id, exam, stage)})
+
+    async def planning(self):
+        await self.request("GET /api/bootstrap", "GET", "/api/bootstrap")
+        await self.think("introduction")
+        await self.think("self_rate")
+        await self.think("profile")
+        await self.request("POST /api/user-profile", "POST", "/api/user-profile", json={
+            "name": self.name,
+            "grade": self.random.choice(["大一", "大二", "大三", "大四"]),
+            "major": self.random.choice(["英语", "计算机科学", "机械工程", "法学"]),
+            "gender": self.random.choice(["男", "女"]),
+            "Have you taken the CET-4 exam:": "是",
+            "CET-4 score": str(self.random.randint(380, 620)),
+            "CET-4 reading score": str(self.random.randint(120, 220)),
+        })
+        for exam_id in PRE_TEST_EXAMS:
+            await self.take_exam(exam_id, "pre")
+        await self.think("strategy")
+        await self.request("POST /api/strategy-result", "POST", "/api/strategy-result",
+                           json={"name": self.name, "score": self.random.randint(30, 70), "is_pre_test": True})
+        await self.flush_events()
+
+    async def execution(self):
+        await self.request("GET /api/user/{name}", "GET", f"/api/user/{self.name}")
+        for endpoint in ("analyze-profile", "analyze-wrong-answers", "suggest-strategies"):
+            await self.request(f"GET /api/{endpoint}/{{name}}", "GET", f"/api/{endpoint}/{self.name}")
+            await self.think("analysis")
+        await self.chat(self.random.randint(*CHAT_MESSAGES))
+        await self.flush_events()
+
+    async def chat(self, messages: int):
+        """与前端一样通过WebSocket对话并逐段接收回复，无法建立连接时改用 POST /api/chat"""
+        socket = await self.connect_chat() if websockets is not None else None
+        if socket is None:
+            for _ in range(messages):
+                await self.think("chat")
+                await self.request("POST /api/chat", "POST", "/api/chat",
+                                   json={"name": self.name, "message": self.random.choice(CHAT_PROMPTS)})
+            return
+
+        # 思考期间也要回复服务器的心跳，由后台任务接收所有帧
+        frames: asyncio.Queue = asyncio.Queue()
+        reader = asyncio.create_task(self._read_frames(socket, frames))
+        try:
+            for index in range(messages):
+                await self.think("chat")
+                if not await self.chat_message(socket, frames, str(index), self.random.choice(CHAT_PROMPTS)):
+                    break
+        finally:
+            reader.cancel()
+            await socket.close()
+
+    async def connect_chat(self):
+        """建立对话连接并等待 ready 帧，失败时返回 None"""
+        started = time.perf_counter()
+        try:
+            socket = await websockets.connect(f"{self.ws_url}/api/ws/chat/{self.name}", open_timeout=REQUEST_TIMEOUT)
+        except (OSError, asyncio.TimeoutError, websockets.WebSocketException) as e:
+            self.recorder.record(WS_CHAT_CONNECT, time.perf_counter() - started, type(e).__name__, False)
+            return None
+        try:
+            frame = json.loads(await asyncio.wait_for(socket.recv(), REQUEST_TIMEOUT))
+        except (asyncio.TimeoutError, ValueError, websockets.WebSocketException) as e:
+            self.recorder.record(WS_CHAT_CONNECT, time.perf_counter() - started, type(e).__name__, False)
+            await socket.close()
+            return None
+        ok = frame.get("type") == "ready"
+        self.recorder.record(WS_CHAT_CONNECT, time.perf_counter() - started, str(frame.get("type")), ok)
+        if not ok:
+            await socket.close()
+            return None
+        return socket
+
+    @staticmethod
+    async def _read_frames(socket, frames: asyncio.Queue):
+        """接收对话帧：心跳直接回复，其余放入队列，连接关闭时放入 None"""
+        try:
+            async for text in socket:
+                try:
+                    frame = json.loads(text)
+                except ValueError:
+                    continue
+                if frame.get("type") == "ping":
+                    await socket.send(json.dumps({"type": "pong"}))
+                else:
+                    await frames.put(frame)
+        except websockets.ConnectionClosed:
+            pass
+        finally:
+            frames.put_nowait(None)
+
+    async def chat_message(self, socket, frames: asyncio.Queue, message_id: str, text: str) -> bool:
+        """发送一条消息并等待回复完成，记录首段回复和完整回复的耗时，连接已断开时返回 False"""
+        started = time.perf_counter()
+        try:
+            await socket.send(json.dumps({"type": "message", "id": message_id, "text": text}, ensure_ascii=False))
+        except websockets.ConnectionClosed as e:
+            self.recorder.record(WS_CHAT_REPLY, time.perf_counter() - started, type(e).__name__, False)
+            return False
+        first_delta = None
+        deadline = started + REQUEST_TIMEOUT
+        while True:
+            try:
+                frame = await asyncio.wait_for(frames.get(), max(0.0, deadline - time.perf_counter()))
+            except asyncio.TimeoutError:
+                self.recorder.record(WS_CHAT_REPLY, time.perf_counter() - started, "TimeoutError", False)
+                return False
+            if frame is None:
+                self.recorder.record(WS_CHAT_REPLY, time.perf_counter() - started, "closed", False)
+                return False
+            if frame.get("id") != message_id:
+                continue
+            if frame.get("type") == "delta" and first_delta is None:
+                first_delta = time.perf_counter() - started
+                self.recorder.first_deltas.append(first_delta)
+            elif frame.get("type") in ("done", "error", "cancelled"):
+                self.recorder.record(WS_CHAT_REPLY, time.perf_counter() - started, frame["type"],
+                                     frame["type"] == "done")
+                return True
+
+    async def feedback(self):
+        for exam_id in POST_TEST_EXAMS:
+            await self.take_exam(exam_id, "post")
+        await self.think("strategy")
+        await self.request("POST /api/strategy-result", "POST", "/api/strategy-result",
+                           json={"name": self.name, "score": self.random.randint(40, 75), "is_pre_test": False})
+        await self.think("summary")
+        await self.request("GET /api/final-summary/{name}", "GET", f"/api/final-summary/{self.name}")
+        await self.flush_events()
+
+    async def run(self, delay: float) -> bool:
+        await asyncio.sleep(delay)
+        try:
+            await self.planning()
+            await self.execution()
+            await self.feedback()
+            return True
+        except Exception as e:
+            logger.error(f"{self.name} 中途失败: {type(e).__name__}: {e}")
+            return False
+
+
+async def run_cohort(base_url: str, students: int, ramp: float, think_scale: float, seed: int,
+                     answer_keys: Dict[int, List[str]]) -> dict:
+    """运行一轮压测，学生在 ramp 秒内均匀到达"""
+    recorder = Recorder()
+    limits = httpx.Limits(max_connections=students * 2, max_keepalive_connections=students)
+    async with httpx.AsyncClient(base_url=base_url, timeout=REQUEST_TIMEOUT, limits=limits) as client:
+        cohort = [VirtualStudent(i, client, recorder, seed, think_scale, answer_keys) for i in range(students)]
+        started = time.perf_counter()
+        results = await asyncio.gather(*(student.run(ramp * i / max(1, students))
+                                         for i, student in enumerate(cohort)))
+        duration = time.perf_counter() - started
+
+    report = recorder.summary(duration)
+    report["duration_seconds"] = round(duration, 3)
+    report["students"] = {"started": students, "completed": sum(results), "failed": students - sum(results)}
+    return report
+
+
+def copy_database(directory: Path) -> Path:
+    """把数据库文件复制到 directory（不打开正式数据库，避免改动其共享内存文件），返回副本路径"""
+    database = directory / DATABASE_FILE.name
+    for suffix in ("", "-wal"):
+        source = Path(str(DATABASE_FILE) + suffix)
+        if source.exists():
+            shutil.copyfile(source, str(database) + suffix)
+    return database
+
+
+def read_answer_keys(database: Path) -> Dict[int, List[str]]:
+    """从数据库副本读取压测用到的试卷的参考答案：试卷ID -> 按题号排列的答案"""
+    exam_ids = PRE_TEST_EXAMS + POST_TEST_EXAMS
+    conn = sqlite3.connect(str(database))
+    try:
+        rows = conn.execute(f"SELECT id, a1, a2, a3, a4, a5 FROM exam WHERE id IN ({','.join('?' * len(exam_ids))})",
+                            exam_ids).fetchall()
+    finally:
+        conn.close()
+    return {row[0]: [str(answer or "").strip() for answer in row[1:]] for row in rows}
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _wait_until_ready(url: str, process: subprocess.Popen, timeout: float = 30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"进程已退出，退出码 {process.returncode}: {url}")
+        try:
+            httpx.get(url, timeout=1.0)
+            return
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    raise RuntimeError(f"等待服务启动超时: {url}")
+
+
+class LocalStack:
+    """临时数据库 + 模拟AI服务 + 后端，退出时全部清理"""
+
+    def __init__(self, workers: int, ai_latency: float, keep: bool = False):
+        self.workers = workers
+        self.ai_latency = ai_latency
+        self.keep = keep
+        self.directory = Path(tempfile.mkdtemp(prefix="perss-loadtest-"))
+        self.processes: List[subprocess.Popen] = []
+        self.base_url = ""
+        self.answer_keys: Dict[int, List[str]] = {}
+
+    def __enter__(self) -> "LocalStack":
+        database = copy_database(self.directory)
+        self.answer_keys = read_answer_keys(database)
+
+        ai_port, app_port = _free_port(), _free_port()
+        log_file = open(self.directory / "server.log", "wb")
+        mock = subprocess.Popen(
+            [sys.executable, str(ROOT_DIR / "mock_ai_server.py"), "--port", str(ai_port),
+             "--latency", str(self.ai_latency)],
+            stdout=log_file, stderr=subprocess.STDOUT)
+        self.processes.append(mock)
+
+        env = dict(
+            os.environ,
+            PERSS_DATABASE_PATH=str(database),
+            PERSS_DEEPSEEK_API_URL=f"http://127.0.0.1:{ai_port}/v1/chat/completions",
+            PERSS_RATE_LIMIT_DB=str(self.directory / "rate_limit.sqlite"),
+            # 所有虚拟学生来自同一个IP，关闭限流以测量服务本身的容量
+            PERSS_RATE_LIMIT="0",
+            PERSS_SERVE_FRONTEND="0",
+            PERSS_LOG_LEVEL="WARNING",
+        )
+        server = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(app_port),
+             "--workers", str(self.workers), "--log-level", "warning", "--no-access-log"],
+            cwd=ROOT_DIR, env=env, stdout=log_file, stderr=subprocess.STDOUT)
+        self.processes.append(server)
+        log_file.close()
+
+        try:
+            _wait_until_ready(f"http://127.0.0.1:{ai_port}/", mock)
+            _wait_until_ready(f"http://127.0.0.1:{app_port}/healthcheck", server)
+        except RuntimeError:
+            self.__exit__(None, None, None)
+            raise
+        self.base_url = f"http://127.0.0.1:{app_port}"
+        logger.info(f"临时环境已启动: 后端 {self.base_url}，模拟AI 127.0.0.1:{ai_port}，目录 {self.directory}")
+        return self
+
+    def __exit__(self, *exc):
+        for process in reversed(self.processes):
+            if process.poll() is None:
+                process.terminate()
+                try:
+                    process.wait(timeout=15)
+                except subprocess.TimeoutExpired:
+                    process.kill()
+        if self.keep:
+            logger.info(f"保留临时目录: {self.directory}")
+        else:
+            shutil.rmtree(self.directory, ignore_errors=True)
+
+
+def main(argv=None) -> int:
+    """命令行入口"""
+    parser = argparse.ArgumentParser(description="模拟一个班级完成学习流程的压测")
+    parser.add_argument("--students", type=int, default=100, help="虚拟学生人数")
+    parser.add_argument("--ramp", type=float, default=60.0, help="所有学生在多少秒内陆续开始")
+    parser.add_argument("--think-scale", type=float, default=1.0, help="思考时间的缩放比例，0.05 可快速跑完一轮")
+    parser.add_argument("--seed", type=int, default=1, help="随机种子，相同种子下学生行为相同")
+    parser.add_argument("--workers", type=int, default=1, help="后端worker进程数")
+    parser.add_argument("--ai-latency", type=float, default=2.0, help="模拟AI服务的平均响应时间（秒）")
+    parser.add_argument("--url", help="对已运行的后端压测（不启动临时环境，AI接口按该后端的配置调用）")
+    parser.add_argument("--keep", action="store_true", help="保留临时目录（数据库和服务日志）")
+    parser.add_argument("-o", "--output", help="结果JSON文件（默认输出到标准输出）")
+    args = parser.parse_args(argv)
+
+    config = {
+        "students": args.students,
+        "ramp_seconds": args.ramp,
+        "think_scale": args.think_scale,
+        "seed": args.seed,
+        "workers": args.workers if not args.url else None,
+        "ai_latency_seconds": args.ai_latency if not args.url else None,
+        "target": args.url or "local",
+        "python": platform.python_version(),
+        "cpu_count": os.cpu_count(),
+    }
+    logger.info(f"开始压测: {args.students} 名学生，{args.ramp:.0f} 秒内到达，思考时间 x{args.think_scale}")
+
+    if args.url:
+        # 远程后端的参考答案按本地数据库估计，只影响得分分布
+        with tempfile.TemporaryDirectory(prefix="perss-loadtest-") as directory:
+            answer_keys = read_answer_keys(copy_database(Path(directory)))
+        report = asyncio.run(run_cohort(args.url.rstrip("/"), args.students, args.ramp, args.think_scale, args.seed,
+                                        answer_keys))
+    else:
+        with LocalStack(args.workers, args.ai_latency, keep=args.keep) as stack:
+            report = asyncio.run(run_cohort(stack.base_url, args.students, args.ramp, args.think_scale, args.seed,
+                                            stack.answer_keys))
+    report = {"config": config, **report}
+
+    text = json.dumps(report, ensure_ascii=False, indent=2, sort_keys=True)
+    if args.output:
+        Path(args.output).write_text(text + "\n", encoding="utf-8")
+    else:
+        print(text)
+
+    total = report["total"]
+    logger.info(f"压测完成: {total['requests']} 个请求，错误率 {total['error_rate']:.2%}，"
+                f"p95 {total['latency_ms'].get('p95', 0)}ms，耗时 {report['duration_seconds']}s")
+    return 1 if total["errors"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,84 @@
+"""
+模拟DeepSeek接口的本地服务
+压测和离线开发时代替真实AI服务，按设定的延迟返回固定格式的回复，支持流式（stream=true）
+
+用法示例:
+    python mock_ai_server.py --port 8900 --latency 2.0
+    PERSS_DEEPSEEK_API_URL=http://127.0.0.1:8900/v1/chat/completions python run.py
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+
+import uvicorn
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Route
+
+# 模拟回复，长度与真实分析结果相近
+REPLY = (
+    "## 分析结果\n\n"
+    "根据你的画像和前测情况，建议先用**略读**把握文章结构，再用**寻读**定位题干中的关键词。"
+    "遇到生词时结合上下文推断词义，不要逐词翻译。\n\n"
+    "1. 先读题干，标出关键词；\n2. 略读每段首句，判断段落主旨；\n3. 回到原文定位细节，比较选项差异。\n\n"
+) * 4
+# 流式回复每段的字符数
+STREAM_CHUNK_CHARS = 8
+
+
+def create_app(latency: float, jitter: float, first_token: float) -> Starlette:
+    """创建模拟服务，latency 为完整回复的平均耗时（秒），jitter 为随机波动比例"""
+
+    def total_delay() -> float:
+        return max(0.0, random.uniform(latency * (1 - jitter), latency * (1 + jitter)))
+
+    async def completions(request: Request):
+        payload = await request.json()
+        created = int(time.time())
+        if not payload.get("stream"):
+            await asyncio.sleep(total_delay())
+            return JSONResponse({
+                "id": "mock",
+                "object": "chat.completion",
+                "created": created,
+                "model": payload.get("model", "mock"),
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": REPLY},
+                             "finish_reason": "stop"}],
+            })
+
+        chunks = [REPLY[i:i + STREAM_CHUNK_CHARS] for i in range(0, len(REPLY), STREAM_CHUNK_CHARS)]
+        interval = max(0.0, total_delay() - first_token) / len(chunks)
+
+        async def events():
+            await asyncio.sleep(first_token)
+            for chunk in chunks:
+                data = {"id": "mock", "object": "chat.completion.chunk", "created": created,
+                        "choices": [{"index": 0, "delta": {"content": chunk}, "finish_reason": None}]}
+                yield f"data: {json.dumps(data, ensure_ascii=False)}\n\n"
+                await asyncio.sleep(interval)
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    return Starlette(routes=[Route("/v1/chat/completions", completions, methods=["POST"])])
+
+
+def main(argv=None):
+    """命令行入口"""
+    parser = argparse.ArgumentParser(description="模拟DeepSeek接口的本地服务")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--latency", type=float, default=2.0, help="完整回复的平均耗时（秒）")
+    parser.add_argument("--jitter", type=float, default=0.3, help="耗时的随机波动比例")
+    parser.add_argument("--first-token", type=float, default=0.3, help="流式回复首段的延迟（秒）")
+    args = parser.parse_args(argv)
+
+    app = create_app(args.latency, args.jitter, args.first_token)
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""
+班级汇总表修复脚本
+班级汇总（cohort_stats、cohort_histogram、cohort_misses）平时由触发器在提交时增量更新；
+直接改过数据库文件或怀疑汇总不一致时，用本脚本检查或由原表全量重算
+
+用法示例:
+    python rebuild_cohort_stats.py            # 全量重算
+    python rebuild_cohort_stats.py --check    # 只检查，不一致时退出码为1
+"""
+import argparse
+import logging
+import sys
+import time
+
+from app.database import check_cohort_stats, get_db_connection, migrate_database, rebuild_cohort_stats, \
+    run_in_transaction
+
+# 配置日志
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+                    stream=sys.stderr)
+logger = logging.getLogger("PERSS.cohort")
+
+
+def main(argv=None) -> int:
+    """命令行入口"""
+    parser = argparse.ArgumentParser(description="检查或全量重算班级汇总表")
+    parser.add_argument("--check", action="store_true", help="只比较汇总表与原表，不写入数据库")
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    migrate_database()
+    if args.check:
+        conn = get_db_connection()
+        try:
+            # 在一个读事务中比较，各查询看到同一份快照
+            cursor = conn.cursor()
+            cursor.execute('BEGIN')
+            drift = check_cohort_stats(cursor)
+            conn.rollback()
+        finally:
+            conn.close()
+        for table, rows in drift.items():
+            logger.info(f"{table}: {rows} 行不一致")
+        if any(drift.values()):
+            logger.warning("班级汇总与原表不一致，请运行 python rebuild_cohort_stats.py 重算")
+            return 1
+        logger.info(f"班级汇总与原表一致，耗时 {time.perf_counter() - started:.2f}s")
+        return 0
+
+    classes = run_in_transaction(rebuild_cohort_stats)
+    logger.info(f"班级汇总已重算: {classes} 个班级，耗时 {time.perf_counter() - started:.2f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
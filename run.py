@@ -1,7 +1,15 @@
 """
 PERSS系统启动脚本
-启动FastAPI后端和Vue.js前端
+开发模式：启动FastAPI后端（自动重载）和Vue.js开发服务器
+生产模式：多worker进程运行后端，并由后端直接提供构建好的前端
+
+用法示例:
+    python run.py
+    python run.py --prod
+    python run.py --prod --workers 4 --build
 """
+import argparse
+import importlib.util
 import os
 import subprocess
 import threading
@@ -164,8 +172,97 @@ def open_browser():
     except Exception as e:
         logger.error(f"打开浏览器失败: {e}")
 
+def build_frontend():
+    """执行 npm run build 生成 frontend/dist"""
+    frontend_dir = ROOT_DIR / "frontend"
+    if not shutil.which("npm"):
+        logger.error("未找到npm命令，无法构建前端")
+        return False
+    logger.info("正在构建前端...")
+    result = subprocess.run(["npm", "run", "build"], cwd=frontend_dir)
+    if result.returncode != 0:
+        logger.error(f"前端构建失败，退出码 {result.returncode}")
+        return False
+    # 生成 .gz/.br 预压缩文件，后端直接返回，不再逐次压缩
+    from app.frontend import precompress_directory
+    from app.config import FRONTEND_DIST_DIR
+    precompress_directory(FRONTEND_DIST_DIR)
+    return True
+
+def _available(module_name):
+    """检查可选依赖是否已安装"""
+    return importlib.util.find_spec(module_name) is not None
+
+def run_production(workers=None, build=False):
+    """生产模式：迁移数据库后启动多个worker进程，由后端提供前端页面"""
+    from app.config import (
+        SERVER_HOST, SERVER_PORT, SERVER_WORKERS, SHUTDOWN_TIMEOUT_SECONDS, FRONTEND_DIST_DIR,
+    )
+    import uvicorn
+    from uvicorn.supervisors import Multiprocess
+    from app.server import GracefulServer
+
+    # 在创建worker之前完成迁移，避免多个进程同时检查和修改表结构
+    if not initialize_database():
+        logger.error("无法初始化数据库，系统启动失败")
+        return 1
+
+    dist_index = Path(FRONTEND_DIST_DIR) / "index.html"
+    if build or not dist_index.exists():
+        if not build_frontend() and not dist_index.exists():
+            logger.warning("没有可用的前端构建，只提供API服务")
+
+    workers = workers or SERVER_WORKERS
+    if workers > 1 and "PERSS_RATE_LIMIT_BACKEND" not in os.environ:
+        # 多个进程时限流计数需要共享
+        os.environ["PERSS_RATE_LIMIT_BACKEND"] = "sqlite"
+
+    loop = "uvloop" if _available("uvloop") else "asyncio"
+    http = "httptools" if _available("httptools") else "h11"
+    if loop != "uvloop" or http != "httptools":
+        logger.warning(f"未安装uvloop或httptools，使用 loop={loop} http={http}")
+
+    logger.info(f"生产模式启动: http://{SERVER_HOST}:{SERVER_PORT}，{workers} 个worker，"
+                f"停止时最多等待 {SHUTDOWN_TIMEOUT_SECONDS:.0f} 秒")
+    os.chdir(ROOT_DIR)
+    config = uvicorn.Config(
+        "app.main:app",
+        host=SERVER_HOST,
+        port=SERVER_PORT,
+        workers=workers,
+        loop=loop,
+        http=http,
+        # 使用应用自己的日志配置
+        log_config=None,
+        # 收到停止信号后不再接受新连接，等待进行中的请求（如AI分析）完成，超时后取消
+        timeout_graceful_shutdown=SHUTDOWN_TIMEOUT_SECONDS,
+        proxy_headers=True,
+    )
+    # 停止时先等待进行中的AI对话回复推送完，再关闭WebSocket
+    server = GracefulServer(config)
+    if config.workers > 1:
+        Multiprocess(config, target=server.run, sockets=[config.bind_socket()]).run()
+    else:
+        server.run()
+        if not server.started:
+            logger.error("后端启动失败")
+            return 1
+    logger.info("服务已关闭")
+    return 0
+
 def main():
     """主函数，启动所有服务"""
+    parser = argparse.ArgumentParser(description="启动PERSS系统")
+    parser.add_argument("--prod", action="store_true",
+                        default=os.getenv("PERSS_ENV", "").lower() == "production",
+                        help="生产模式（也可设置环境变量 PERSS_ENV=production）")
+    parser.add_argument("--workers", type=int, help="worker进程数（默认为CPU核数，或 PERSS_WORKERS）")
+    parser.add_argument("--build", action="store_true", help="生产模式启动前重新构建前端")
+    args = parser.parse_args()
+
+    if args.prod:
+        sys.exit(run_production(workers=args.workers, build=args.build))
+
     try:
         # 初始化数据库
         if not initialize_database():